@@ -19,7 +19,7 @@ import os
 from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import pandas as pd
+from item_names import item_key_sql, normalize_item_name
 
 logger = logging.getLogger(__name__)
 
@@ -302,29 +302,33 @@ class BasketIntelligenceAPI:
             raise
     
     async def _get_price_summary(self, item_name: str, store_id: Optional[str], days: int) -> Dict:
-        """Get price intelligence summary for an item"""
+        """Get price intelligence summary for an item, from its daily rollups"""
         try:
             conn = psycopg2.connect(self.db_url)
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             
-            query = """
+            # Price volatility is the sample standard deviation (as STDDEV), derived from the summed daily moments
+            query = f"""
                 SELECT 
                     s.name as store_name,
-                    AVG(ph.price) as avg_price,
-                    MIN(ph.price) as min_price,
-                    MAX(ph.price) as max_price,
-                    COUNT(*) as price_points,
-                    STDDEV(ph.price) as price_volatility
-                FROM price_history ph
-                JOIN stores s ON ph.store_id = s.id
-                WHERE ph.item_name ILIKE %s
-                AND ph.date >= CURRENT_DATE - INTERVAL '%s days'
+                    SUM(r.price_sum) / SUM(r.price_count) as avg_price,
+                    MIN(r.min_price) as min_price,
+                    MAX(r.max_price) as max_price,
+                    SUM(r.price_count)::bigint as price_points,
+                    SQRT(
+                        GREATEST(SUM(r.price_sum_squares) - SUM(r.price_sum) ^ 2 / SUM(r.price_count), 0)
+                        / NULLIF(SUM(r.price_count) - 1, 0)
+                    ) as price_volatility
+                FROM price_daily_rollup r
+                JOIN stores s ON r.store_id = s.id
+                WHERE r.normalized_name = (SELECT item_key FROM {item_key_sql('%(item_key)s', percent='%%')} AS item)
+                AND r.date >= CURRENT_DATE - INTERVAL '%(days)s days'
             """
-            params = [f'%{item_name}%', days]
+            params = {'item_key': normalize_item_name(item_name), 'days': days}
             
             if store_id:
-                query += " AND ph.store_id = %s"
-                params.append(store_id)
+                query += " AND r.store_id = %(store_id)s"
+                params['store_id'] = store_id
             
             query += " GROUP BY s.name ORDER BY avg_price"
             
@@ -361,7 +365,7 @@ class BasketIntelligenceAPI:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             
             # Get current prices across stores
-            query = """
+            query = f"""
                 SELECT 
                     s.name as store_name,
                     ph.price,
@@ -369,12 +373,12 @@ class BasketIntelligenceAPI:
                     ph.confidence_score
                 FROM price_history ph
                 JOIN stores s ON ph.store_id = s.id
-                WHERE ph.item_name ILIKE %s
+                WHERE ph.normalized_name = (SELECT item_key FROM {item_key_sql('%(item_key)s', percent='%%')} AS item)
                 AND ph.date >= CURRENT_DATE - INTERVAL '7 days'
                 ORDER BY ph.price ASC
             """
             
-            cursor.execute(query, [f'%{item_name}%'])
+            cursor.execute(query, {'item_key': normalize_item_name(item_name)})
             results = cursor.fetchall()
             
             # Group by store and get latest price
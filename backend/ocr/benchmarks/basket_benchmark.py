@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Basket Benchmark
+Times PriceIntelligenceService.analyze_basket_savings against the per-item
+queries it replaced (three per item), on baskets drawn from price_history,
+with and without the best price index, and checks that every path returns
+the same analysis
+
+Usage: python benchmarks/basket_benchmark.py --db-url postgresql://... --output basket.json
+       python benchmarks/basket_benchmark.py --db-url postgresql://... --compare basket.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from dataclasses import asdict
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import asyncpg
+
+from best_price_index import BestPriceIndex
+from service_benchmark import git_revision
+from item_names import item_key_sql
+from price_intelligence import BasketAnalysis, PriceIntelligenceService, SavingsOpportunity
+from receipt_parser import ReceiptItem
+
+BASKET_SIZES = [10, 50, 100]
+
+class CountingPool:
+    """Wraps an asyncpg pool and counts the queries sent through it"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.queries = 0
+
+    def acquire(self):
+        return _CountingAcquire(self)
+
+class _CountingAcquire:
+    def __init__(self, counting: CountingPool):
+        self.counting = counting
+        self.acquire = counting.pool.acquire()
+
+    async def __aenter__(self):
+        return _CountingConnection(await self.acquire.__aenter__(), self.counting)
+
+    async def __aexit__(self, *exc):
+        return await self.acquire.__aexit__(*exc)
+
+class _CountingConnection:
+    def __init__(self, conn, counting: CountingPool):
+        self.conn = conn
+        self.counting = counting
+
+    async def fetch(self, *args):
+        self.counting.queries += 1
+        return await self.conn.fetch(*args)
+
+    async def fetchrow(self, *args):
+        self.counting.queries += 1
+        return await self.conn.fetchrow(*args)
+
+async def per_item_analysis(service: PriceIntelligenceService, items: List[ReceiptItem], store_id: str) -> BasketAnalysis:
+    """The previous analyze_basket_savings: one best-price, one recommendation and one cashback query per item.
+
+    Item names are matched the way the service matches them now, so only the query shape differs.
+    """
+    async with service._pool.acquire() as conn:
+        best_price_query = f"""
+            SELECT s.name as store_name, ph.price, ph.confidence_score, COUNT(*) OVER () as price_history_points
+            FROM price_history ph JOIN stores s ON ph.store_id = s.id
+            WHERE ph.normalized_name = (SELECT item_key FROM {item_key_sql('$1')} AS item)
+            AND ph.date >= CURRENT_DATE - INTERVAL '30 days' AND s.is_active = true
+            ORDER BY ph.price ASC LIMIT 1
+        """
+
+        async def best_price(item):
+            name = service._normalize_item_name(item.name)
+            return await conn.fetchrow(best_price_query, name) if name else None
+
+        opportunities, total_savings = [], Decimal("0.00")
+        for item in items:
+            price = service._item_price(item)
+            result = await best_price(item)
+            if result and result["price"] < price:
+                savings = price - result["price"]
+                opportunities.append(SavingsOpportunity(
+                    item_name=item.name, current_price=price, best_price=result["price"], savings=savings,
+                    store_name=result["store_name"], confidence=result["confidence_score"],
+                    price_history_points=result["price_history_points"],
+                ))
+                total_savings += savings
+
+        savings_by_store = {}
+        for item in items:
+            price = service._item_price(item)
+            result = await best_price(item)
+            if result and result["price"] < price:
+                savings_by_store[result["store_name"]] = savings_by_store.get(result["store_name"], Decimal("0.0")) + price - result["price"]
+        recommendation = max(savings_by_store, key=savings_by_store.get) if savings_by_store else None
+
+        cashback = Decimal("0.00")
+        for item in items:
+            price = service._item_price(item)
+            result = await conn.fetchrow(
+                """
+                SELECT discount_amount, discount_percentage FROM cashback_offers
+                WHERE (item_name ILIKE $1 OR item_name IS NULL) AND store_id = $2
+                AND is_active = true AND valid_from <= CURRENT_DATE AND valid_until >= CURRENT_DATE
+                ORDER BY COALESCE(discount_amount, $3 * discount_percentage / 100) DESC LIMIT 1
+                """,
+                f"%{service._normalize_item_name(item.name)}%", store_id, price,
+            )
+            if result:
+                if result["discount_amount"]:
+                    cashback += result["discount_amount"]
+                elif result["discount_percentage"]:
+                    cashback += price * result["discount_percentage"] / 100
+
+        return BasketAnalysis(total_savings, opportunities, recommendation, cashback)
+
+async def time_basket(service: PriceIntelligenceService, analyse, items: List[ReceiptItem], store_id: str, repeat: int) -> Dict[str, Any]:
+    """Latencies of `repeat` runs, the queries one run sends and its result"""
+    latencies = []
+    for _ in range(repeat):
+        service._pool.queries = 0
+        start = time.perf_counter()
+        analysis = await analyse(items, store_id)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_seconds": statistics.median(latencies),
+        "min_seconds": min(latencies),
+        "queries": service._pool.queries,
+        "analysis": analysis,
+    }
+
+async def run(args) -> Dict[str, Any]:
+    random.seed(args.seed)
+    pool = await asyncpg.create_pool(args.db_url, min_size=1, max_size=2)
+    service = PriceIntelligenceService(args.db_url)
+    service._pool = CountingPool(pool)
+    best_prices = BestPriceIndex(args.db_url)
+    indexed = PriceIntelligenceService(args.db_url, best_prices=best_prices)
+    indexed._pool = CountingPool(pool)
+    try:
+        await best_prices.refresh()
+        async with pool.acquire() as conn:
+            names = [row["item_name"] for row in await conn.fetch(
+                "SELECT DISTINCT item_name FROM price_history WHERE date >= CURRENT_DATE - INTERVAL '30 days'"
+            )]
+            store_id = await conn.fetchval("SELECT id FROM stores WHERE is_active = true ORDER BY id LIMIT 1")
+        if not names or store_id is None:
+            raise SystemExit("price_history has no rows from the last 30 days to build baskets from")
+
+        report = {}
+        for size in BASKET_SIZES:
+            items = [ReceiptItem(name=random.choice(names), price=round(random.uniform(1, 20), 2)) for _ in range(size)]
+            paths = {
+                "per_item": await time_basket(service, lambda i, s: per_item_analysis(service, i, s), items, store_id, args.repeat),
+                "set_based": await time_basket(service, service.analyze_basket_savings, items, store_id, args.repeat),
+                "indexed": await time_basket(indexed, indexed.analyze_basket_savings, items, store_id, args.repeat),
+            }
+            analyses = [asdict(result.pop("analysis")) for result in paths.values()]
+            report[str(size)] = {**paths, "identical": all(analysis == analyses[0] for analysis in analyses)}
+        return report
+    finally:
+        await best_prices.close()
+        await pool.close()
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--db-url", default=os.getenv("DATABASE_URL"), help="Postgres with price_history data")
+    arg_parser.add_argument("--repeat", type=int, default=20, help="Timed runs per basket size and path")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--output", help="Write the report as JSON to this path")
+    arg_parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = arg_parser.parse_args()
+    if not args.db_url:
+        arg_parser.error("--db-url or DATABASE_URL is required")
+
+    report = {**git_revision(), "config": {"repeat": args.repeat, "seed": args.seed}, "baskets": asyncio.run(run(args))}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    for size, result in report["baskets"].items():
+        per_item, set_based, indexed = result["per_item"], result["set_based"], result["indexed"]
+        line = (
+            f"{size:>4} items: per-item {per_item['p50_seconds'] * 1e3:8.1f} ms ({per_item['queries']} queries)"
+            f"  set-based {set_based['p50_seconds'] * 1e3:7.1f} ms ({set_based['queries']} queries)"
+            f"  indexed {indexed['p50_seconds'] * 1e3:7.1f} ms ({indexed['queries']} queries)"
+            f"  x{per_item['p50_seconds'] / set_based['p50_seconds']:.1f}  identical={result['identical']}"
+        )
+        old = (baseline or {}).get("baskets", {}).get(size)
+        if old:
+            line += f"  set-based speedup x{old['set_based']['p50_seconds'] / set_based['p50_seconds']:.2f} vs {(baseline.get('commit') or 'baseline')[:8]}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
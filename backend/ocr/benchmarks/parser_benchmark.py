@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Parser Benchmark
+Times ReceiptParser.parse_ocr_results on synthetic OCR output, without images
+or OCR, so parser changes can be compared across commits
+
+Usage: python benchmarks/parser_benchmark.py --count 200 --output parser.json
+       python benchmarks/parser_benchmark.py --compare parser.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from receipt_corpus import MOCK_STORES, generate_mock_receipt, receipt_lines, resize_receipt, score_receipt
+from service_benchmark import git_revision
+from receipt_parser import ReceiptParser
+
+LINE_HEIGHT = 30
+PAGE_WIDTH = 600
+
+# (name, items per receipt, prices in their own boxes, non-item lines with numbers on them);
+# None keeps mock_ocr_service's 3-8 items
+CORPORA = [('lines', None, False, False), ('long', 40, False, False), ('boxes', None, True, False), ('noisy', None, False, True)]
+
+def noisy_lines(receipt: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """receipt_lines plus a phone number, a multibuy saving and the EFTPOS payment, none of them items"""
+    lines = receipt_lines(receipt)
+    first_item, last_item = 3, 3 + len(receipt['items'])
+    return (
+        lines[:first_item] + [("PH 09 555 1234", "")] + lines[first_item:last_item]
+        + [("MULTIBUY SAVING", "-$1.50")] + lines[last_item:-1]
+        + [("EFTPOS", f"${receipt['total']:.2f}")] + lines[-1:]
+    )
+
+def ocr_results_for(receipt: Dict[str, Any], split_columns: bool = False, noisy: bool = False) -> List[Dict[str, Any]]:
+    """PaddleOCR-shaped output, one box per printed line or (split_columns) names and prices as separate boxes"""
+    results = []
+    for i, (left, right) in enumerate(noisy_lines(receipt) if noisy else receipt_lines(receipt)):
+        top, bottom = i * LINE_HEIGHT, i * LINE_HEIGHT + LINE_HEIGHT - 6
+        columns = [(left, 10), (right, PAGE_WIDTH - 10 - 12 * len(right))] if split_columns else [(f"{left}   {right}".strip(), 10)]
+        for text, x1 in columns:
+            if text:
+                x2 = x1 + 12 * len(text)
+                results.append({'text': text, 'bbox': [[x1, top], [x2, top], [x2, bottom], [x1, bottom]], 'confidence': 0.95})
+    return results
+
+def build_receipts(count: int, seed: int, items: int = None) -> List[Dict[str, Any]]:
+    random.seed(seed)
+    store_types = list(MOCK_STORES)
+    receipts = []
+    for i in range(count):
+        store_type = store_types[i % len(store_types)]
+        receipt = generate_mock_receipt(store_type)
+        receipts.append(resize_receipt(receipt, store_type, items) if items else receipt)
+    return receipts
+
+def time_parser(receipts: List[Dict[str, Any]], repeat: int, split_columns: bool, noisy: bool = False) -> Dict[str, Any]:
+    """Per-receipt parse time on a fresh parser, best of `repeat` passes, plus field accuracy"""
+    inputs = [ocr_results_for(receipt, split_columns, noisy) for receipt in receipts]
+    passes = []
+    for _ in range(repeat):
+        parser = ReceiptParser()
+        start = time.perf_counter()
+        parsed = [parser.parse_ocr_results(ocr_results) for ocr_results in inputs]
+        passes.append((time.perf_counter() - start) / len(inputs))
+
+    scores = [score_receipt(truth, result) for truth, result in zip(receipts, parsed)]
+    return {
+        'receipts': len(inputs),
+        'seconds_per_receipt': min(passes),
+        'seconds_per_receipt_median': statistics.median(passes),
+        'receipts_per_second': 1 / min(passes),
+        'accuracy': {field: statistics.mean(s[field] for s in scores) for field in scores[0]},
+    }
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--count", type=int, default=200, help="Receipts per corpus")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed passes over each corpus")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--output", help="Write the report as JSON to this path")
+    arg_parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = arg_parser.parse_args()
+
+    report = {**git_revision(), 'config': {'count': args.count, 'repeat': args.repeat, 'seed': args.seed}, 'corpora': {}}
+    for name, items, split_columns, noisy in CORPORA:
+        report['corpora'][name] = time_parser(build_receipts(args.count, args.seed, items), args.repeat, split_columns, noisy)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    for name, result in report['corpora'].items():
+        line = f"{name:>8}: {result['seconds_per_receipt'] * 1e6:9.0f} us/receipt  {result['receipts_per_second']:8.0f} receipts/s"
+        old = (baseline or {}).get('corpora', {}).get(name)
+        if old:
+            line += f"  speedup x{old['seconds_per_receipt'] / result['seconds_per_receipt']:.2f} vs {(baseline.get('commit') or 'baseline')[:8]}"
+        line += "  " + "  ".join(f"{k}={v:.2f}" for k, v in result['accuracy'].items())
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Preprocessing Benchmark
+Compares latency and parse accuracy of the preprocessing modes and quality
+profiles on the same synthetic corpus
+
+Usage: python benchmarks/preprocessing_benchmark.py --count 10 --output results.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from receipt_corpus import build_corpus, score_receipt
+from image_preprocessing import run_pipeline, default_skip_stages
+from ocr_pool import create_ocr_engine, ocr_results_from_prediction, MockOCR
+from receipt_parser import ReceiptParser
+
+# (resolution mode, profile) pairs; "auto" lets the quality classifier choose
+CONFIGURATIONS = [("full", "full"), ("adaptive", "full"), ("adaptive", "auto")]
+
+def run(count: int, width: int) -> dict:
+    corpus = build_corpus(count, width=width, line_height=width // 27, noise=0.03, blur=1)
+    engine = create_ocr_engine()
+    measure_accuracy = not isinstance(engine, MockOCR)
+    parser = ReceiptParser()
+
+    report = {"count": count, "width": width, "accuracy_measured": measure_accuracy, "modes": {}}
+    for mode, profile in CONFIGURATIONS:
+        latencies = []
+        scores = []
+        profiles = {}
+        for truth, image_bytes in corpus:
+            start = time.perf_counter()
+            pipeline = run_pipeline(image_bytes, default_skip_stages(mode), profile)
+            latencies.append(time.perf_counter() - start)
+            processed = pipeline.image
+            profiles[pipeline.profile] = profiles.get(pipeline.profile, 0) + 1
+
+            if measure_accuracy:
+                ocr_results = ocr_results_from_prediction(engine.predict(processed))
+                scores.append(score_receipt(truth, parser.parse_ocr_results(ocr_results)))
+
+        result = {
+            "preprocess_p50": statistics.median(latencies),
+            "preprocess_mean": statistics.mean(latencies),
+            "output_shape": list(processed.shape),
+            "profiles": profiles,
+        }
+        if scores:
+            result["accuracy"] = {field: statistics.mean(s[field] for s in scores) for field in scores[0]}
+        report["modes"][f"{mode}/{profile}"] = result
+    return report
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--count", type=int, default=5)
+    arg_parser.add_argument("--width", type=int, default=3000, help="Rendered receipt width in pixels (3000 ~ 12 MP)")
+    arg_parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = arg_parser.parse_args()
+
+    report = run(args.count, args.width)
+    for mode, result in report["modes"].items():
+        line = f"{mode:>14}: p50 {result['preprocess_p50'] * 1000:8.1f} ms  output {result['output_shape']}  profiles {result['profiles']}"
+        if "accuracy" in result:
+            line += "  " + "  ".join(f"{k}={v:.2f}" for k, v in result["accuracy"].items())
+        print(line)
+    if not report["accuracy_measured"]:
+        print("PaddleOCR not installed: accuracy not measured")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
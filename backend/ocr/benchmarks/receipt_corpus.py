@@ -0,0 +1,141 @@
+"""
+Synthetic Receipt Corpus
+Renders ground-truth receipts from mock_ocr_service to images and scores parser
+output against them
+"""
+
+import os
+import random
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_ocr_service import generate_mock_receipt, MOCK_STORES
+from receipt_parser import ReceiptData, ReceiptItem
+
+def receipt_lines(receipt: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Left/right column text for each printed line of a receipt"""
+    date = datetime.strptime(receipt["date"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    lines = [(receipt["store_name"].upper(), ""), (date, ""), ("", "")]
+    for item in receipt["items"]:
+        name = item["name"].upper()
+        if item["quantity"] > 1:
+            name = f"{item['quantity']} x {name}"
+        lines.append((name, f"${item['price'] * item['quantity']:.2f}"))
+    lines += [
+        ("", ""),
+        ("SUBTOTAL", f"${receipt['subtotal']:.2f}"),
+        ("GST", f"${receipt['tax']:.2f}"),
+        ("TOTAL", f"${receipt['total']:.2f}"),
+        (f"RECEIPT #{receipt['receipt_number'][1:]}", ""),
+    ]
+    return lines
+
+def render_receipt(
+    receipt: Dict[str, Any],
+    width: int = 3000,
+    line_height: int = 110,
+    noise: float = 0.0,
+    blur: int = 0,
+    skew_degrees: float = 0.0,
+) -> np.ndarray:
+    """Draw a receipt as a phone-photo-sized BGR image"""
+    lines = receipt_lines(receipt)
+    margin = width // 12
+    height = max(width * 4 // 3, line_height * (len(lines) + 4))
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    font_scale = line_height / 40
+    thickness = max(2, line_height // 18)
+    for i, (left, right) in enumerate(lines):
+        y = margin + (i + 1) * line_height
+        if left:
+            cv2.putText(img, left, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+        if right:
+            (text_width, _), _ = cv2.getTextSize(right, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+            cv2.putText(img, right, (width - margin - text_width, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+
+    if skew_degrees:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew_degrees, 1.0)
+        img = cv2.warpAffine(img, matrix, (width, height), borderValue=(255, 255, 255))
+    if blur:
+        img = cv2.GaussianBlur(img, (blur * 2 + 1, blur * 2 + 1), 0)
+    if noise:
+        grain = np.random.normal(0, noise * 255, img.shape)
+        img = np.clip(img.astype(np.float32) + grain, 0, 255).astype(np.uint8)
+    return img
+
+def resize_receipt(receipt: Dict[str, Any], store_type: str, items: int) -> Dict[str, Any]:
+    """Refill a receipt with exactly `items` lines drawn from its store, recomputing the totals"""
+    catalogue = MOCK_STORES[store_type]["items"]
+    lines = [
+        {**random.choice(catalogue), "quantity": random.randint(1, 3), "confidence": round(random.uniform(0.7, 0.95), 2)}
+        for _ in range(items)
+    ]
+    subtotal = sum(item["price"] * item["quantity"] for item in lines)
+    tax = round(subtotal * 0.15, 2)
+    return {
+        **receipt,
+        "items": lines,
+        "subtotal": round(subtotal, 2),
+        "tax": tax,
+        "total": round(subtotal + tax, 2),
+        "validation": {**receipt["validation"], "items_parsed": items},
+    }
+
+def build_corpus(
+    count: int,
+    seed: int = 42,
+    items: Optional[int] = None,
+    **render_kwargs,
+) -> List[Tuple[Dict[str, Any], bytes]]:
+    """Ground-truth receipts paired with JPEG bytes, reproducible for a given seed.
+
+    ``items`` fixes the number of lines per receipt (long receipts render
+    taller than the usual 3:4 page); otherwise mock_ocr_service picks 3-8.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    store_types = list(MOCK_STORES.keys())
+    corpus = []
+    for i in range(count):
+        store_type = store_types[i % len(store_types)]
+        receipt = generate_mock_receipt(store_type)
+        if items:
+            receipt = resize_receipt(receipt, store_type, items)
+        img = render_receipt(receipt, **render_kwargs)
+        corpus.append((receipt, cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()))
+    return corpus
+
+def parsed_from_response(response: Dict[str, Any]) -> ReceiptData:
+    """Rebuild ReceiptData from a /parse response body so it can be scored"""
+    date = response.get("date")
+    return ReceiptData(
+        store_name=response.get("store_name"),
+        date=datetime.fromisoformat(date) if date else None,
+        total=response.get("total"),
+        items=[ReceiptItem(name=item["name"], price=item["price"], quantity=item.get("quantity", 1)) for item in response.get("items", [])],
+    )
+
+def score_receipt(truth: Dict[str, Any], parsed) -> Dict[str, float]:
+    """Compare a parsed ReceiptData against its ground truth"""
+    expected = {(item["name"].upper(), round(item["price"] * item["quantity"], 2)) for item in truth["items"]}
+    found = {(item.name.upper(), round(item.price, 2)) for item in parsed.items}
+    expected_prices = sorted(price for _, price in expected)
+    found_prices = sorted(round(item.price, 2) for item in parsed.items)
+    truth_date = datetime.strptime(truth["date"], "%Y-%m-%d").date()
+
+    return {
+        "items_exact": len(expected & found) / len(expected),
+        # Share of parsed items that are on the receipt; non-item lines read as items lower it
+        "items_precision": len(expected & found) / len(found) if found else 0.0,
+        "item_prices": sum(1 for price in expected_prices if price in found_prices) / len(expected_prices),
+        "total": float(parsed.total is not None and abs(parsed.total - truth["total"]) < 0.01),
+        "store": float(bool(parsed.store_name) and truth["store_name"].upper().replace("'", "") in parsed.store_name.upper().replace("'", "")),
+        "date": float(parsed.date is not None and parsed.date.date() == truth_date),
+    }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Serialization Benchmark
+Times turning parsed receipts into response bytes: pydantic response models
+re-validated and JSON-encoded the way FastAPI does for a response_model,
+against the payload dicts and orjson response the parse endpoints return
+
+Usage: python benchmarks/serialization_benchmark.py --items 100 --output serialization.json
+       python benchmarks/serialization_benchmark.py --compare serialization.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from parser_benchmark import build_receipts, ocr_results_for
+from service_benchmark import git_revision
+from receipt_parser import ReceiptParser, ReceiptItem
+
+from main import FastJSONResponse, ReceiptItemResponse, ReceiptResponse, receipt_payload, validate_receipt_data
+
+@dataclass
+class DictReceiptItem:
+    """ReceiptItem without __slots__, for the per-item memory comparison"""
+    name: str
+    price: float
+    quantity: int = 1
+    category: Optional[str] = None
+    confidence: float = 0.0
+
+def model_body(receipt_data, validation) -> bytes:
+    """Response models built item by item, then dumped, re-validated and encoded as FastAPI does for response_model"""
+    items = [
+        ReceiptItemResponse(
+            name=item.name, price=item.price, quantity=item.quantity, category=item.category, confidence=item.confidence
+        )
+        for item in receipt_data.items
+    ]
+    response = ReceiptResponse(
+        store_name=receipt_data.store_name,
+        date=receipt_data.date.isoformat() if receipt_data.date else None,
+        total=receipt_data.total,
+        items=items,
+        subtotal=receipt_data.subtotal,
+        tax=receipt_data.tax,
+        receipt_number=receipt_data.receipt_number,
+        validation=validation,
+        processing_time=0.0,
+    )
+    content = ReceiptResponse.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(content)).body
+
+def payload_body(receipt_data, validation) -> bytes:
+    """One conversion to a payload dict, serialised by orjson"""
+    return FastJSONResponse(receipt_payload(receipt_data, validation)).body
+
+PATHS: Dict[str, Callable] = {"pydantic": model_body, "orjson": payload_body}
+
+def time_path(body: Callable, receipts: List, repeat: int) -> Dict[str, Any]:
+    """Per-receipt seconds (best of `repeat` passes) and peak traced memory per conversion"""
+    passes = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for receipt_data, validation in receipts:
+            body(receipt_data, validation)
+        passes.append((time.perf_counter() - start) / len(receipts))
+
+    peaks = []
+    tracemalloc.start()
+    for receipt_data, validation in receipts:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        body(receipt_data, validation)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        "seconds_per_receipt": min(passes),
+        "seconds_per_receipt_median": statistics.median(passes),
+        "peak_bytes_per_receipt": statistics.mean(peaks),
+        "body_bytes": statistics.mean(len(body(r, v)) for r, v in receipts),
+    }
+
+def item_bytes(item_class, count: int = 10000) -> float:
+    """Traced bytes per item instance"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [item_class(name=f"ITEM {i}", price=1.0, quantity=1, category="Pantry", confidence=0.9) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return size / count
+
+def main_cli():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--count", type=int, default=50, help="Receipts to serialise")
+    arg_parser.add_argument("--items", type=int, default=100, help="Items per receipt")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the receipts")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--output", help="Write the report as JSON to this path")
+    arg_parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = arg_parser.parse_args()
+
+    parser = ReceiptParser()
+    receipts = []
+    for receipt in build_receipts(args.count, args.seed, args.items):
+        receipt_data = parser.parse_ocr_results(ocr_results_for(receipt))
+        receipts.append((receipt_data, validate_receipt_data(receipt_data)))
+
+    report = {
+        **git_revision(),
+        "config": {"count": args.count, "items": args.items, "repeat": args.repeat, "seed": args.seed},
+        "items_per_receipt": statistics.mean(len(r.items) for r, _ in receipts),
+        "paths": {name: time_path(body, receipts, args.repeat) for name, body in PATHS.items()},
+        "item_bytes": {"slots": item_bytes(ReceiptItem), "dict": item_bytes(DictReceiptItem)},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    fastest = min(report["paths"].values(), key=lambda r: r["seconds_per_receipt"])["seconds_per_receipt"]
+    for name, result in report["paths"].items():
+        line = (
+            f"{name:>9}: {result['seconds_per_receipt'] * 1e6:8.0f} us/receipt  x{result['seconds_per_receipt'] / fastest:5.2f}"
+            f"  peak {result['peak_bytes_per_receipt'] / 1024:7.1f} KiB  body {result['body_bytes'] / 1024:5.1f} KiB"
+        )
+        old = (baseline or {}).get("paths", {}).get(name)
+        if old:
+            line += f"  speedup x{old['seconds_per_receipt'] / result['seconds_per_receipt']:.2f} vs {(baseline.get('commit') or 'baseline')[:8]}"
+        print(line)
+    print(f"{'items':>9}: {report['item_bytes']['slots']:.0f} B with __slots__, {report['item_bytes']['dict']:.0f} B with __dict__"
+          f"  ({report['items_per_receipt']:.0f} items per receipt)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
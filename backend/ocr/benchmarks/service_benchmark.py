@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Service Benchmark
+Drives /ocr and /parse with rendered ground-truth receipts and records per-stage
+latency, end-to-end percentiles, throughput per concurrency level and parse
+accuracy as JSON that can be compared across commits
+
+Usage: python benchmarks/service_benchmark.py --count 8 --max-concurrency 8 --output bench.json
+       python benchmarks/service_benchmark.py --url http://localhost:8000 --compare bench.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from receipt_corpus import build_corpus, parsed_from_response, score_receipt
+
+ENDPOINTS = ["/ocr", "/parse"]
+
+# Named corpus variants; each maps to build_corpus/render_receipt keyword arguments
+VARIANTS: Dict[str, Dict[str, Any]] = {
+    "clean": {},
+    "skewed": {"skew_degrees": 4.0},
+    "blurred": {"blur": 3},
+    "noisy": {"noise": 0.06},
+    "long": {"items": 40},
+}
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+def concurrency_levels(max_concurrency: int) -> List[int]:
+    """1, 2, 4, ... up to and including max_concurrency"""
+    levels = []
+    level = 1
+    while level < max_concurrency:
+        levels.append(level)
+        level *= 2
+    return levels + [max_concurrency]
+
+def git_revision() -> Dict[str, Any]:
+    """Commit the numbers belong to; dirty trees are flagged so they are not mistaken for it"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+@asynccontextmanager
+async def service_client(url: Optional[str], ready_timeout: float):
+    """HTTP client for a running service, or for main.app in-process with its lifespan"""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=300) as client:
+            await wait_until_ready(client, ready_timeout)
+            yield client
+        return
+
+    # Cached results would turn every level after the first into cache hits
+    os.environ["OCR_CACHE_SIZE"] = "0"
+    os.environ.pop("REDIS_URL", None)
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+            await wait_until_ready(client, ready_timeout)
+            yield client
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    """Poll /readyz so model loading and warm-up are not measured"""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = await client.get("/readyz")
+        if response.status_code == 200:
+            return
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Service not ready after {timeout:.0f}s: {response.text}")
+        await asyncio.sleep(0.5)
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, corpus, concurrency: int) -> Dict[str, Any]:
+    """Send the whole corpus with at most `concurrency` requests in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(image_bytes: bytes):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(endpoint, files={"file": ("receipt.jpg", image_bytes, "image/jpeg")})
+            return time.perf_counter() - start, response
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(send(image_bytes) for _, image_bytes in corpus))
+    wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, response in outcomes if response.status_code == 200]
+    return {
+        "requests": len(outcomes),
+        "ok": len(latencies),
+        "rejected": sum(1 for _, response in outcomes if response.status_code == 429),
+        "errors": sum(1 for _, response in outcomes if response.status_code not in (200, 429)),
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else None,
+        "latency": percentiles(latencies),
+        "bodies": [response.json() if response.status_code == 200 else None for _, response in outcomes],
+    }
+
+def stage_summary(bodies: List[Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Percentiles of each stage's seconds across the responses that reported timings"""
+    stages: Dict[str, List[float]] = {}
+    for body in bodies:
+        for stage, seconds in ((body or {}).get("stage_timings") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    return {stage: percentiles(values) for stage, values in stages.items()}
+
+def accuracy_summary(corpus, bodies: List[Optional[Dict[str, Any]]]) -> Dict[str, float]:
+    """Mean field accuracy over the corpus; failed requests score zero"""
+    scores = []
+    for (truth, _), body in zip(corpus, bodies):
+        if body is None:
+            scores.append({"items_exact": 0.0, "item_prices": 0.0, "total": 0.0, "store": 0.0, "date": 0.0})
+        else:
+            scores.append(score_receipt(truth, parsed_from_response(body)))
+    return {field: float(np.mean([s[field] for s in scores])) for field in scores[0]}
+
+async def run(args) -> Dict[str, Any]:
+    levels = concurrency_levels(args.max_concurrency)
+    report = {
+        **git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        # Without PaddleOCR the in-process service falls back to MockOCR and accuracy is meaningless
+        "accuracy_measured": bool(args.url) or importlib.util.find_spec("paddleocr") is not None,
+        "config": {"count": args.count, "width": args.width, "seed": args.seed, "concurrency": levels, "variants": args.variants},
+        "variants": {},
+    }
+
+    async with service_client(args.url, args.ready_timeout) as client:
+        for variant in args.variants:
+            corpus = build_corpus(args.count, seed=args.seed, width=args.width, line_height=args.width // 27, **VARIANTS[variant])
+            result: Dict[str, Any] = {"endpoints": {}}
+            for endpoint in ENDPOINTS:
+                runs = {}
+                for concurrency in levels:
+                    runs[str(concurrency)] = await run_level(client, endpoint, corpus, concurrency)
+                # Stage timings and accuracy come from the uncontended run
+                baseline = runs["1"]["bodies"]
+                result["endpoints"][endpoint] = {
+                    "stages": stage_summary(baseline),
+                    "concurrency": {level: {k: v for k, v in run.items() if k != "bodies"} for level, run in runs.items()},
+                }
+                if endpoint == "/parse":
+                    result["accuracy"] = accuracy_summary(corpus, baseline)
+            report["variants"][variant] = result
+    return report
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing p50/p95 latency, throughput and accuracy changes against an earlier report"""
+    def change(new, old):
+        if new is None or old is None:
+            return "   n/a"
+        return f"{(new - old) / old * 100:+6.1f}%" if old else f"{new - old:+.3f}"
+
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')})"]
+    for variant, result in report["variants"].items():
+        old_result = baseline.get("variants", {}).get(variant)
+        if not old_result:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            old_levels = old_result["endpoints"].get(endpoint, {}).get("concurrency", {})
+            for level, run in stats["concurrency"].items():
+                old = old_levels.get(level)
+                if not old:
+                    continue
+                lines.append(
+                    f"{variant:>8} {endpoint:<7} c={level:<3}"
+                    f" p50 {change(run['latency']['p50'], old['latency']['p50'])}"
+                    f"  p95 {change(run['latency']['p95'], old['latency']['p95'])}"
+                    f"  rps {change(run['throughput_rps'], old['throughput_rps'])}"
+                )
+        if "accuracy" in result and "accuracy" in old_result:
+            lines.append(f"{variant:>8} accuracy " + "  ".join(
+                f"{field} {value - old_result['accuracy'].get(field, 0):+.2f}" for field, value in result["accuracy"].items()
+            ))
+    return lines
+
+def print_report(report: Dict[str, Any]):
+    for variant, result in report["variants"].items():
+        for endpoint, stats in result["endpoints"].items():
+            for level, run in stats["concurrency"].items():
+                latency = run["latency"]
+                ms = lambda seconds: f"{seconds * 1000:8.1f}" if seconds is not None else "     n/a"
+                print(
+                    f"{variant:>8} {endpoint:<7} c={level:<3} p50 {ms(latency['p50'])} ms  p95 {ms(latency['p95'])} ms"
+                    f"  p99 {ms(latency['p99'])} ms  {run['throughput_rps'] or 0:6.2f} req/s"
+                    f"  ok {run['ok']}/{run['requests']}  429 {run['rejected']}  err {run['errors']}"
+                )
+            stages = "  ".join(f"{stage} {p['p50'] * 1000:.0f}" for stage, p in stats["stages"].items())
+            if stages:
+                print(f"{'':>8} {endpoint:<7} stage p50 ms: {stages}")
+        if "accuracy" in result:
+            print(f"{variant:>8} accuracy: " + "  ".join(f"{k}={v:.2f}" for k, v in result["accuracy"].items()))
+    if not report["accuracy_measured"]:
+        print("PaddleOCR not installed: service uses MockOCR, accuracy is not meaningful")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--url", help="Benchmark a running service instead of main.app in-process")
+    arg_parser.add_argument("--count", type=int, default=8, help="Receipts per variant")
+    arg_parser.add_argument("--width", type=int, default=1500, help="Rendered receipt width in pixels")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--max-concurrency", type=int, default=4, help="Levels run 1, 2, 4, ... up to this")
+    arg_parser.add_argument("--variants", default="clean,skewed,blurred,noisy,long",
+                            help=f"Comma-separated subset of: {', '.join(VARIANTS)}")
+    arg_parser.add_argument("--ready-timeout", type=float, default=300, help="Seconds to wait for /readyz")
+    arg_parser.add_argument("--output", help="Write the report as JSON to this path")
+    arg_parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = arg_parser.parse_args()
+
+    args.variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        arg_parser.error(f"Unknown variants: {', '.join(sorted(unknown))}")
+
+    # One log line per request would bury the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(report, json.load(f))))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""
+Best Price Index
+Cheapest active price of every normalized item over the last 30 days, held in
+memory and kept fresh from price_history change notifications
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+import metrics
+
+# Seconds between full reloads, which also reconnect a dropped listener
+BEST_PRICE_RECONCILE_SECONDS = float(os.getenv("BEST_PRICE_RECONCILE_SECONDS", "600"))
+# Days of price history the best price is taken over
+BEST_PRICE_WINDOW_DAYS = int(os.getenv("BEST_PRICE_WINDOW_DAYS", "30"))
+# Channel the price_history trigger (database/07-best-price-notify.sql) notifies on
+BEST_PRICE_CHANNEL = "price_history_changes"
+
+# Cheapest row per key and the key's row count, for active stores inside the window
+_BEST_PRICES_SQL = """
+    SELECT DISTINCT ON (ph.normalized_name)
+        ph.normalized_name,
+        s.name AS store_name,
+        ph.price,
+        ph.confidence_score,
+        ph.date,
+        COUNT(*) OVER (PARTITION BY ph.normalized_name) AS price_history_points
+    FROM price_history ph
+    JOIN stores s ON ph.store_id = s.id
+    WHERE ph.date >= CURRENT_DATE - $1::int
+    AND s.is_active = true
+    {key_filter}
+    ORDER BY ph.normalized_name, ph.price ASC
+"""
+BEST_PRICES_QUERY = _BEST_PRICES_SQL.format(key_filter="")
+BEST_PRICE_KEY_QUERY = _BEST_PRICES_SQL.format(key_filter="AND ph.normalized_name = $2")
+# Read first in the same repeatable-read transaction, so it is the snapshot the rows come from
+SNAPSHOT_QUERY = "SELECT pg_current_snapshot()::text"
+
+_OUTCOME_STATS = {'hit': 'hits', 'miss': 'misses', 'cold': 'cold'}
+
+def in_snapshot(xid: Optional[str], snapshot: Optional[str]) -> bool:
+    """Whether the transaction xid (a payload's) had committed as of a pg_current_snapshot() text"""
+    if xid is None or snapshot is None:
+        return False
+    xmin, xmax, in_progress = snapshot.split(':')
+    return int(xid) < int(xmin) or (int(xid) < int(xmax) and xid not in in_progress.split(','))
+
+@dataclass(slots=True)
+class BestPrice:
+    store_name: str
+    price: Decimal
+    confidence_score: Optional[Decimal]
+    # Rows for the item inside the window, across stores
+    price_history_points: int
+    # Date of the cheapest row; the entry is stale once it leaves the window
+    date: Optional[date] = None
+
+    @classmethod
+    def from_row(cls, row: Any) -> "BestPrice":
+        return cls(
+            store_name=row['store_name'],
+            price=row['price'],
+            confidence_score=row['confidence_score'],
+            price_history_points=row['price_history_points'],
+            date=row['date'],
+        )
+
+class BestPriceIndex:
+    """normalized item name -> BestPrice, loaded in full and then patched from NOTIFY payloads.
+
+    An inserted row is applied straight from its payload: one more price
+    point, and the new best price if it is cheaper. Updates and deletes carry
+    the old row too and are applied in place as well, unless they remove the
+    best row or make it dearer; only then is that key dropped and reloaded
+    from the database. ``refresh`` reloads everything, which also corrects point counts
+    for rows that have aged out of the window. Changes that arrive while the
+    index or a key is being read are held back and applied afterwards, except
+    those whose transaction the read's snapshot already saw. Until the first load, and
+    after the listener connection drops, the index is cold: ``lookup``
+    returns None and callers ask the database instead.
+    """
+
+    def __init__(self, db_url: Optional[str] = None, window_days: int = BEST_PRICE_WINDOW_DAYS):
+        self.db_url = db_url
+        self.window_days = window_days
+        self._entries: Dict[str, BestPrice] = {}
+        self._ready = False
+        self._pool = None
+        self._listener = None
+        # Changes that arrive during a full load, applied once it has landed
+        self._loading = False
+        self._buffered: List[Dict[str, Any]] = []
+        # Key reloads in flight; holding the tasks keeps them from being collected mid-run
+        self._reloading_keys: Dict[str, asyncio.Task] = {}
+        # Changes to a key that arrive while it reloads, applied once its row has landed
+        self._reload_buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'cold': 0, 'notifications': 0, 'refreshes': 0, 'key_reloads': 0}
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def cutoff(self) -> date:
+        return date.today() - timedelta(days=self.window_days)
+
+    def lookup(self, key: str) -> Optional[BestPrice]:
+        """The best price for key, or None when the database has to answer (cold, unknown or stale)"""
+        if not self._ready:
+            outcome, entry = 'cold', None
+        else:
+            entry = self._entries.get(key)
+            if entry is not None and entry.date is not None and entry.date < self.cutoff():
+                entry = None
+            outcome = 'hit' if entry else 'miss'
+        self._stats[_OUTCOME_STATS[outcome]] += 1
+        metrics.BEST_PRICE_INDEX_LOOKUPS.labels(outcome=outcome).inc()
+        return entry
+
+    def load_rows(self, rows: Iterable[Any]):
+        """Replace the index with rows shaped like BEST_PRICES_QUERY's"""
+        self._entries = {row['normalized_name']: BestPrice.from_row(row) for row in rows}
+        metrics.BEST_PRICE_INDEX_ENTRIES.set(len(self._entries))
+
+    def apply_change(self, change: Dict[str, Any]) -> List[str]:
+        """Apply one NOTIFY payload; returns the keys that have to be reloaded from the database.
+
+        Only a change to the row held as an item's best price can leave the
+        next best unknown here; every other update or delete is applied in place.
+        """
+        reload: List[str] = []
+        key = change.get('normalized_name')
+        if change['op'] != 'INSERT':
+            old_key = change.get('old_normalized_name')
+            entry = self._entries.get(old_key) if old_key else None
+            if entry is not None and self._is_best_row(entry, change):
+                if change['op'] == 'UPDATE' and key == old_key and self._still_best(change, entry):
+                    # Same row, same or lower price: it stays the best, and its point stays counted
+                    self._set_best(entry, change)
+                    return reload
+                self._entries.pop(old_key, None)
+                reload.append(old_key)
+            elif entry is not None and self._counted(change, prefix='old_'):
+                entry.price_history_points = max(1, entry.price_history_points - 1)
+        if change['op'] != 'DELETE' and key and key not in reload:
+            if not self._add_row(key, change):
+                reload.append(key)
+        return reload
+
+    def _counted(self, change: Dict[str, Any], prefix: str = '') -> bool:
+        """Whether the payload's new (or old_) row falls inside the window at an active store"""
+        return bool(change.get(f'{prefix}store_active')) and date.fromisoformat(change[f'{prefix}date']) >= self.cutoff()
+
+    @staticmethod
+    def _is_best_row(entry: BestPrice, change: Dict[str, Any]) -> bool:
+        return (
+            entry.store_name == change.get('old_store_name')
+            and entry.price == change.get('old_price')
+            and entry.date == date.fromisoformat(change['old_date'])
+        )
+
+    def _still_best(self, change: Dict[str, Any], entry: BestPrice) -> bool:
+        return self._counted(change) and change['price'] <= entry.price
+
+    @staticmethod
+    def _set_best(entry: BestPrice, change: Dict[str, Any]):
+        entry.store_name = change['store_name']
+        entry.price = change['price']
+        entry.confidence_score = change.get('confidence_score')
+        entry.date = date.fromisoformat(change['date'])
+
+    def _add_row(self, key: str, change: Dict[str, Any]) -> bool:
+        """Count a new row for key; False when the entry is stale and the key needs a reload"""
+        if not self._counted(change):
+            return True
+        entry = self._entries.get(key)
+        if entry is not None and entry.date is not None and entry.date < self.cutoff():
+            # The best row has aged out, so the next best is unknown here
+            self._entries.pop(key, None)
+            return False
+        if entry is None:
+            entry = BestPrice(change['store_name'], change['price'], change.get('confidence_score'), 1)
+            self._set_best(entry, change)
+            self._entries[key] = entry
+            metrics.BEST_PRICE_INDEX_ENTRIES.set(len(self._entries))
+            return True
+        entry.price_history_points += 1
+        if change['price'] < entry.price:
+            self._set_best(entry, change)
+        return True
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self._stats['notifications'] += 1
+        try:
+            change = json.loads(payload, parse_float=Decimal)
+        except ValueError:
+            logger.warning(f"Best price index: unreadable notification {payload[:200]!r}")
+            return
+        if self._loading:
+            self._buffered.append(change)
+        else:
+            self._handle(change)
+
+    def _handle(self, change: Dict[str, Any]):
+        for key in (change.get('normalized_name'), change.get('old_normalized_name')):
+            if key in self._reloading_keys:
+                # Applied now, the reloaded row would overwrite it
+                self._reload_buffers.setdefault(key, []).append(change)
+                return
+        for key in self.apply_change(change):
+            if key not in self._reloading_keys:
+                self._reloading_keys[key] = asyncio.get_running_loop().create_task(self._reload_key(key))
+
+    async def _read(self, query: str, *args, fetch_one: bool = False):
+        """(snapshot, rows) from one repeatable-read transaction"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                snapshot = await conn.fetchval(SNAPSHOT_QUERY)
+                if fetch_one:
+                    return snapshot, await conn.fetchrow(query, *args)
+                return snapshot, await conn.fetch(query, *args)
+
+    def _replay(self, changes: List[Dict[str, Any]], snapshot: Optional[str]):
+        """Apply buffered changes the snapshot did not already hold"""
+        for change in changes:
+            if not in_snapshot(change.get('xid'), snapshot):
+                self._handle(change)
+
+    async def _reload_key(self, key: str):
+        snapshot = None
+        try:
+            snapshot, row = await self._read(BEST_PRICE_KEY_QUERY, self.window_days, key, fetch_one=True)
+            if row:
+                self._entries[key] = BestPrice.from_row(row)
+            self._stats['key_reloads'] += 1
+            metrics.BEST_PRICE_INDEX_ENTRIES.set(len(self._entries))
+        except Exception as e:
+            logger.warning(f"Best price index: reloading {key!r} failed: {e}")
+        finally:
+            self._reloading_keys.pop(key, None)
+            self._replay(self._reload_buffers.pop(key, []), snapshot)
+
+    def _on_listener_lost(self, connection):
+        # Changes from now on would be missed, so answer from the database until the next refresh
+        logger.warning("Best price index: listener connection lost, index is cold until the next refresh")
+        self._ready = False
+        self._listener = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import asyncpg
+            self._pool = await asyncpg.create_pool(self.db_url, min_size=1, max_size=2)
+        return self._pool
+
+    async def _listen(self):
+        if self._listener is None or self._listener.is_closed():
+            import asyncpg
+            self._listener = await asyncpg.connect(self.db_url)
+            self._listener.add_termination_listener(self._on_listener_lost)
+            await self._listener.add_listener(BEST_PRICE_CHANNEL, self._on_notification)
+
+    async def refresh(self) -> int:
+        """Reload every entry; changes notified while loading are applied on top. Returns the entry count."""
+        async with self._refresh_lock:
+            # Listen first, so no change between the snapshot and the subscription is lost
+            await self._listen()
+            self._loading = True
+            snapshot = None
+            try:
+                snapshot, rows = await self._read(BEST_PRICES_QUERY, self.window_days)
+                self.load_rows(rows)
+            finally:
+                self._loading = False
+                buffered, self._buffered = self._buffered, []
+            self._replay(buffered, snapshot)
+            self._ready = True
+            self._stats['refreshes'] += 1
+            self._last_refresh = time.time()
+        logger.info(f"Best price index: {len(self)} items loaded")
+        return len(self)
+
+    async def close(self):
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.remove_termination_listener(self._on_listener_lost)
+            await listener.close()
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self._ready = False
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses'] + self._stats['cold']
+        return {
+            **self._stats,
+            'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': len(self._entries),
+            'ready': self._ready,
+            'last_refresh': self._last_refresh,
+        }
@@ -0,0 +1,160 @@
+"""
+Correction Dictionary
+Raw OCR item names mapped to the name and category users confirmed for them,
+learned from item_corrections and consulted by the parser before fuzzy matching
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+import metrics
+
+# Seconds between incremental reloads of newly confirmed corrections
+CORRECTION_REFRESH_SECONDS = float(os.getenv("CORRECTION_REFRESH_SECONDS", "300"))
+# Confirmations a raw name needs before the parser trusts the correction
+CORRECTION_MIN_CONFIRMATIONS = int(os.getenv("CORRECTION_MIN_CONFIRMATIONS", "1"))
+# created_at is set when a row is written, not when it commits, so each refresh re-reads
+# this many seconds before the newest correction seen to catch late commits
+CORRECTION_OVERLAP_SECONDS = float(os.getenv("CORRECTION_OVERLAP_SECONDS", "300"))
+
+# Confirmed corrections joined to the parsed item they correct, oldest first,
+# from $1 on; rows already loaded are recognised by id.
+CONFIRMED_CORRECTIONS_QUERY = """
+    SELECT c.id, c.created_at, i.name AS raw_name, c.corrected_name, c.corrected_category
+    FROM item_corrections c
+    JOIN items i ON i.id = c.item_id
+    WHERE c.confirmed AND ($1::timestamptz IS NULL OR c.created_at >= $1)
+    ORDER BY c.created_at
+"""
+
+def dictionary_key(raw_name: str) -> str:
+    """Case- and spacing-insensitive key, so 'MILK  2L' and 'milk 2l' share an entry"""
+    return ' '.join(raw_name.lower().split())
+
+@dataclass
+class CorrectedItem:
+    name: str
+    category: Optional[str]
+    # Confirmations behind this (name, category) pair
+    confirmations: int
+
+class CorrectionDictionary:
+    """In-memory raw name -> CorrectedItem mapping, rebuilt from confirmed corrections.
+
+    Every confirmed correction is a vote for a (name, category) pair; the pair
+    with the most votes wins, the most recent one on a tie. ``refresh`` only
+    fetches corrections from overlap_seconds before the newest one it saw, so
+    it is cheap to run periodically and again whenever new corrections are
+    stored. Ids loaded inside that overlap are remembered, so a re-read row is
+    not counted twice, while a row that committed late is still picked up.
+    """
+
+    def __init__(
+        self,
+        db_url: Optional[str] = None,
+        min_confirmations: int = CORRECTION_MIN_CONFIRMATIONS,
+        overlap_seconds: float = CORRECTION_OVERLAP_SECONDS,
+    ):
+        self.db_url = db_url
+        self.min_confirmations = min_confirmations
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._pool = None
+        # key -> (name, category) -> [votes, order of the latest vote]
+        self._votes: Dict[str, Dict[Tuple[str, Optional[str]], list]] = {}
+        self._entries: Dict[str, CorrectedItem] = {}
+        self._order = 0
+        self._watermark: Optional[datetime] = None
+        # id -> created_at of the loaded rows the next fetch can return again
+        self._seen: Dict[Any, datetime] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'corrections_loaded': 0, 'refreshes': 0}
+        self._last_refresh: Optional[float] = None
+        # One refresh at a time, so each fetch starts from the previous one's watermark
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, raw_name: str, corrected_name: Optional[str], category: Optional[str] = None):
+        """Count one confirmed correction of raw_name"""
+        key = dictionary_key(raw_name or '')
+        corrected_name = (corrected_name or '').strip()
+        if not key or not corrected_name:
+            return
+        self._order += 1
+        votes = self._votes.setdefault(key, {})
+        vote = votes.setdefault((corrected_name, category or None), [0, 0])
+        vote[0] += 1
+        vote[1] = self._order
+
+        (name, category), (count, _) = max(votes.items(), key=lambda kv: kv[1])
+        if count >= self.min_confirmations:
+            self._entries[key] = CorrectedItem(name=name, category=category, confirmations=count)
+        metrics.CORRECTION_DICTIONARY_ENTRIES.set(len(self._entries))
+
+    def lookup(self, raw_name: str) -> Optional[CorrectedItem]:
+        """The confirmed correction for raw_name, counted towards the hit rate"""
+        entry = self._entries.get(dictionary_key(raw_name))
+        outcome = 'hit' if entry else 'miss'
+        self._stats['hits' if entry else 'misses'] += 1
+        metrics.CORRECTION_DICTIONARY_LOOKUPS.labels(outcome=outcome).inc()
+        return entry
+
+    def load_rows(self, rows: Iterable[Any]) -> int:
+        """Apply rows shaped like CONFIRMED_CORRECTIONS_QUERY's; returns how many were new"""
+        loaded = 0
+        for row in rows:
+            if row['id'] in self._seen:
+                continue
+            self._seen[row['id']] = row['created_at']
+            if self._watermark is None or row['created_at'] > self._watermark:
+                self._watermark = row['created_at']
+            self.add(row['raw_name'], row['corrected_name'], row['corrected_category'])
+            loaded += 1
+        # Only ids the next fetch can return again need remembering
+        fetch_from = self.fetch_from()
+        self._seen = {id: created_at for id, created_at in self._seen.items() if created_at >= fetch_from}
+        self._stats['corrections_loaded'] += loaded
+        return loaded
+
+    def fetch_from(self) -> Optional[datetime]:
+        """Where the next refresh starts reading: the overlap before the newest correction, None for everything"""
+        return self._watermark - self.overlap if self._watermark is not None else None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import asyncpg
+            self._pool = await asyncpg.create_pool(self.db_url, min_size=1, max_size=2)
+        return self._pool
+
+    async def close_pool(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def refresh(self) -> int:
+        """Load corrections confirmed since the last refresh (all of them the first time)"""
+        async with self._refresh_lock:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(CONFIRMED_CORRECTIONS_QUERY, self.fetch_from())
+            loaded = self.load_rows(rows)
+            self._stats['refreshes'] += 1
+            self._last_refresh = time.time()
+        if loaded:
+            logger.info(f"Correction dictionary: {loaded} new corrections, {len(self)} entries")
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': len(self._entries),
+            'last_refresh': self._last_refresh,
+        }
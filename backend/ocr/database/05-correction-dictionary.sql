@@ -0,0 +1,4 @@
+-- The correction dictionary reloads confirmed corrections newer than the last one it saw
+CREATE INDEX IF NOT EXISTS idx_item_corrections_confirmed_created_at
+  ON item_corrections (created_at)
+  WHERE confirmed;
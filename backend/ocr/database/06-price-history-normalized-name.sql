@@ -0,0 +1,61 @@
+-- Canonical item key for price_history: lookups match normalized_name exactly (B-tree)
+-- and fall back to trigram similarity only when no row has the key.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- SQL twin of item_names.normalize_item_name: lowercase, split on whitespace,
+-- drop stop words and words of two letters or fewer
+CREATE OR REPLACE FUNCTION normalize_item_name(name TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT COALESCE(string_agg(word, ' ' ORDER BY position), '')
+  FROM regexp_split_to_table(btrim(lower(name)), '\s+') WITH ORDINALITY AS words(word, position)
+  WHERE length(word) > 2
+  AND word NOT IN ('the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by')
+$$;
+
+ALTER TABLE price_history ADD COLUMN IF NOT EXISTS normalized_name TEXT;
+
+-- The Python writers set normalized_name themselves; this covers any writer that doesn't
+CREATE OR REPLACE FUNCTION price_history_fill_normalized_name() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW.normalized_name IS NULL OR (TG_OP = 'UPDATE' AND NEW.item_name IS DISTINCT FROM OLD.item_name) THEN
+    NEW.normalized_name := normalize_item_name(NEW.item_name);
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS price_history_fill_normalized_name ON price_history;
+CREATE TRIGGER price_history_fill_normalized_name
+  BEFORE INSERT OR UPDATE ON price_history
+  FOR EACH ROW EXECUTE FUNCTION price_history_fill_normalized_name();
+
+-- Exact lookups, usually restricted to a recent date range; built before the backfill,
+-- which also uses it to find the rows still missing a key
+CREATE INDEX IF NOT EXISTS idx_price_history_normalized_name_date
+  ON price_history (normalized_name, date);
+
+-- Backfill existing rows in batches of 10000, committing each one, so row locks are
+-- released and vacuum can reclaim dead rows as the backfill goes (COMMIT in DO needs
+-- PostgreSQL 11+ and must not run inside an explicit transaction block).
+-- Safe to re-run: only rows still missing a key are touched.
+DO $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  LOOP
+    UPDATE price_history SET normalized_name = normalize_item_name(item_name)
+    WHERE id IN (SELECT id FROM price_history WHERE normalized_name IS NULL LIMIT 10000);
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    EXIT WHEN updated = 0;
+    COMMIT;
+  END LOOP;
+END;
+$$;
+
+ALTER TABLE price_history ALTER COLUMN normalized_name SET NOT NULL;
+
+-- The trigram fallback for names with no exact key
+CREATE INDEX IF NOT EXISTS idx_price_history_normalized_name_trgm
+  ON price_history USING gin (normalized_name gin_trgm_ops);
@@ -0,0 +1,44 @@
+-- Notify the OCR service's in-memory best price index (best_price_index.py) of every
+-- price_history change. Payloads are sent when the writing transaction commits.
+-- Updates and deletes also carry the old row (old_*), so the index only has to go
+-- back to the database when the row it holds as an item's best price changed.
+-- xid is the writing transaction, so a change the index has already read from a
+-- snapshot is not applied twice.
+
+CREATE OR REPLACE FUNCTION price_history_notify_change() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+  payload JSONB := jsonb_build_object('op', TG_OP, 'xid', pg_current_xact_id()::text);
+  store RECORD;
+BEGIN
+  IF TG_OP <> 'DELETE' THEN
+    SELECT name, is_active INTO store FROM stores WHERE id = NEW.store_id;
+    payload := payload || jsonb_build_object(
+      'normalized_name', NEW.normalized_name,
+      'price', NEW.price,
+      'date', NEW.date,
+      'confidence_score', NEW.confidence_score,
+      'store_name', store.name,
+      'store_active', COALESCE(store.is_active, false)
+    );
+  END IF;
+  IF TG_OP <> 'INSERT' THEN
+    SELECT name, is_active INTO store FROM stores WHERE id = OLD.store_id;
+    payload := payload || jsonb_build_object(
+      'old_normalized_name', OLD.normalized_name,
+      'old_price', OLD.price,
+      'old_date', OLD.date,
+      'old_store_name', store.name,
+      'old_store_active', COALESCE(store.is_active, false)
+    );
+  END IF;
+
+  PERFORM pg_notify('price_history_changes', payload::text);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS price_history_notify_change ON price_history;
+CREATE TRIGGER price_history_notify_change
+  AFTER INSERT OR UPDATE OR DELETE ON price_history
+  FOR EACH ROW EXECUTE FUNCTION price_history_notify_change();
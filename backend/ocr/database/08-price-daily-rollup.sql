@@ -0,0 +1,147 @@
+-- Daily price moments per store, item key and day, so comparisons and summaries over
+-- 30-90 days sum a few rollup rows instead of re-aggregating price_history.
+--
+-- Over any set of days: price points = SUM(price_count), average = SUM(price_sum) / SUM(price_count),
+-- and the sample variance (what STDDEV squares) is
+--   (SUM(price_sum_squares) - SUM(price_sum)^2 / SUM(price_count)) / (SUM(price_count) - 1).
+-- The moments are NUMERIC, so the subtraction is exact.
+
+CREATE TABLE IF NOT EXISTS price_daily_rollup (
+  normalized_name TEXT NOT NULL,
+  date DATE NOT NULL,
+  store_id UUID NOT NULL REFERENCES stores(id),
+  price_count BIGINT NOT NULL,
+  price_sum NUMERIC NOT NULL,
+  price_sum_squares NUMERIC NOT NULL,
+  min_price DECIMAL(10,2) NOT NULL,
+  max_price DECIMAL(10,2) NOT NULL,
+  PRIMARY KEY (normalized_name, date, store_id)
+);
+
+-- The price_comparisons view reads every item over a date range
+CREATE INDEX IF NOT EXISTS idx_price_daily_rollup_date ON price_daily_rollup (date);
+
+-- Inserted rows merge into their day. Every writer (receipts and all scrapers) goes through
+-- here, including rows an ON CONFLICT upsert inserts.
+CREATE OR REPLACE FUNCTION price_daily_rollup_add() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO price_daily_rollup AS r
+    (normalized_name, date, store_id, price_count, price_sum, price_sum_squares, min_price, max_price)
+  SELECT normalized_name, date, store_id, COUNT(*), SUM(price), SUM(price * price), MIN(price), MAX(price)
+  FROM added
+  GROUP BY normalized_name, date, store_id
+  ON CONFLICT (normalized_name, date, store_id) DO UPDATE SET
+    price_count = r.price_count + EXCLUDED.price_count,
+    price_sum = r.price_sum + EXCLUDED.price_sum,
+    price_sum_squares = r.price_sum_squares + EXCLUDED.price_sum_squares,
+    min_price = LEAST(r.min_price, EXCLUDED.min_price),
+    max_price = GREATEST(r.max_price, EXCLUDED.max_price);
+  RETURN NULL;
+END;
+$$;
+
+-- Updated (including ON CONFLICT DO UPDATE) and deleted rows: the moments take the
+-- difference, while min and max are recomputed from the day's remaining rows, since a
+-- removed price may have been either. Days left without rows are dropped.
+CREATE OR REPLACE FUNCTION price_daily_rollup_adjust() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+  -- Removed rows count -1 and added rows +1 towards their day. A DELETE trigger has no
+  -- added table to name, so the statement is run dynamically with the right source.
+  changes TEXT := 'SELECT normalized_name, date, store_id, -1 AS sign, price FROM removed';
+BEGIN
+  -- Statement triggers also fire for upserts that updated nothing
+  IF NOT EXISTS (SELECT 1 FROM removed) THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP = 'UPDATE' THEN
+    changes := changes || ' UNION ALL SELECT normalized_name, date, store_id, 1, price FROM added';
+  END IF;
+
+  EXECUTE format($sql$
+    WITH changes AS (%s),
+    days AS (
+      SELECT c.normalized_name, c.date, c.store_id, c.price_count, c.price_sum, c.price_sum_squares,
+        day.min_price, day.max_price
+      FROM (
+        SELECT normalized_name, date, store_id,
+          SUM(sign) AS price_count, SUM(sign * price) AS price_sum, SUM(sign * price * price) AS price_sum_squares
+        FROM changes
+        GROUP BY normalized_name, date, store_id
+      ) c
+      CROSS JOIN LATERAL (
+        SELECT MIN(ph.price) AS min_price, MAX(ph.price) AS max_price
+        FROM price_history ph
+        WHERE ph.normalized_name = c.normalized_name AND ph.date = c.date AND ph.store_id = c.store_id
+      ) day
+    ),
+    emptied AS (
+      DELETE FROM price_daily_rollup r
+      USING days d
+      WHERE d.min_price IS NULL
+      AND r.normalized_name = d.normalized_name AND r.date = d.date AND r.store_id = d.store_id
+    )
+    INSERT INTO price_daily_rollup AS r
+      (normalized_name, date, store_id, price_count, price_sum, price_sum_squares, min_price, max_price)
+    SELECT normalized_name, date, store_id, price_count, price_sum, price_sum_squares, min_price, max_price
+    FROM days
+    WHERE min_price IS NOT NULL
+    ON CONFLICT (normalized_name, date, store_id) DO UPDATE SET
+      price_count = r.price_count + EXCLUDED.price_count,
+      price_sum = r.price_sum + EXCLUDED.price_sum,
+      price_sum_squares = r.price_sum_squares + EXCLUDED.price_sum_squares,
+      min_price = EXCLUDED.min_price,
+      max_price = EXCLUDED.max_price
+  $sql$, changes);
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables allow one event per trigger. Holding a SHARE lock while the
+-- triggers are created and the table is backfilled keeps writers from slipping
+-- rows in between.
+BEGIN;
+LOCK TABLE price_history IN SHARE MODE;
+
+DROP TRIGGER IF EXISTS price_daily_rollup_insert ON price_history;
+CREATE TRIGGER price_daily_rollup_insert
+  AFTER INSERT ON price_history REFERENCING NEW TABLE AS added
+  FOR EACH STATEMENT EXECUTE FUNCTION price_daily_rollup_add();
+
+DROP TRIGGER IF EXISTS price_daily_rollup_update ON price_history;
+CREATE TRIGGER price_daily_rollup_update
+  AFTER UPDATE ON price_history REFERENCING OLD TABLE AS removed NEW TABLE AS added
+  FOR EACH STATEMENT EXECUTE FUNCTION price_daily_rollup_adjust();
+
+DROP TRIGGER IF EXISTS price_daily_rollup_delete ON price_history;
+CREATE TRIGGER price_daily_rollup_delete
+  AFTER DELETE ON price_history REFERENCING OLD TABLE AS removed
+  FOR EACH STATEMENT EXECUTE FUNCTION price_daily_rollup_adjust();
+
+-- Rebuilt from scratch, so re-running the migration is safe
+TRUNCATE price_daily_rollup;
+INSERT INTO price_daily_rollup
+  (normalized_name, date, store_id, price_count, price_sum, price_sum_squares, min_price, max_price)
+SELECT normalized_name, date, store_id, COUNT(*), SUM(price), SUM(price * price), MIN(price), MAX(price)
+FROM price_history
+GROUP BY normalized_name, date, store_id;
+
+COMMIT;
+
+-- Same columns as before, now summed from the rollup; item_name is the item key
+DROP VIEW IF EXISTS price_comparisons;
+CREATE OR REPLACE VIEW price_comparisons AS
+SELECT
+  r.normalized_name AS item_name,
+  r.store_id,
+  s.name AS store_name,
+  SUM(r.price_sum) / SUM(r.price_count) AS avg_price,
+  MIN(r.min_price) AS min_price,
+  MAX(r.max_price) AS max_price,
+  SUM(r.price_count)::bigint AS price_count,
+  MAX(r.date) AS last_updated
+FROM price_daily_rollup r
+JOIN stores s ON r.store_id = s.id
+WHERE r.date >= CURRENT_DATE - INTERVAL '30 days'
+GROUP BY r.normalized_name, r.store_id, s.name;
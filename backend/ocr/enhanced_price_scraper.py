@@ -24,6 +24,7 @@ from bs4 import BeautifulSoup
 import aiohttp
 from fake_useragent import UserAgent
 from proxy_manager import ProxyManager
+from item_names import normalize_item_name
 import asyncpg
 
 
@@ -444,8 +445,8 @@ class EnhancedPriceScraperService:
                     code_to_uuid[code] = row["id"]
             await conn.executemany(
                 """
-                INSERT INTO price_history (store_id, item_name, price, date, source, confidence_score, volume_size, image_url)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                INSERT INTO price_history (store_id, item_name, normalized_name, price, date, source, confidence_score, volume_size, image_url)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                 ON CONFLICT (store_id, item_name, date, source)
                 DO UPDATE SET
                     price = EXCLUDED.price,
@@ -456,6 +457,7 @@ class EnhancedPriceScraperService:
                 [(
                     code_to_uuid.get(p.store_id, p.store_id),
                     p.item_name,
+                    normalize_item_name(p.item_name),
                     p.price,
                     p.date.date(),
                     'enhanced_scraper',
@@ -0,0 +1,242 @@
+"""
+Hybrid Parsing
+Runs local OCR parsing and AI parsing against the same receipt and decides
+which result to return
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+import metrics
+
+# "ai-first" only runs OCR after the AI call fails; "race" starts OCR and AI together, taking
+# an OCR worker slot on every call; "ocr-first" only calls the AI for receipts the OCR result looks wrong on
+HYBRID_MODE = os.getenv("HYBRID_MODE", "ai-first")
+HYBRID_MODES = ["race", "ai-first", "ocr-first"]
+# Seconds each path may run before it is abandoned, in race and (AI only) ocr-first; ai-first waits for the AI
+HYBRID_OCR_TIMEOUT = float(os.getenv("HYBRID_OCR_TIMEOUT", "20"))
+HYBRID_AI_TIMEOUT = float(os.getenv("HYBRID_AI_TIMEOUT", "30"))
+# validate_receipt_data confidence a result needs to win the race
+HYBRID_MIN_CONFIDENCE = float(os.getenv("HYBRID_MIN_CONFIDENCE", "0.6"))
+# ocr-first: escalate to the AI below this validate_receipt_data confidence
+ESCALATE_MIN_CONFIDENCE = float(os.getenv("ESCALATE_MIN_CONFIDENCE", str(HYBRID_MIN_CONFIDENCE)))
+# ocr-first: escalate when the items miss both total and subtotal by more than this fraction of the total
+ESCALATE_TOTAL_TOLERANCE = float(os.getenv("ESCALATE_TOTAL_TOLERANCE", "0.02"))
+# ocr-first: escalate when more than this fraction of items were read with low OCR confidence
+ESCALATE_MAX_LOW_CONFIDENCE_ITEMS = float(os.getenv("ESCALATE_MAX_LOW_CONFIDENCE_ITEMS", "0.25"))
+# Item confidence below which ReceiptParser.validate_receipt flags an item
+LOW_ITEM_CONFIDENCE = 0.6
+
+@dataclass
+class ParseOutcome:
+    # ReceiptData from the OCR path, ReceiptParseResult from the AI path
+    receipt: Any
+    validation: Dict[str, Any]
+    # run_ocr() output, OCR path only
+    ocr: Optional[Dict[str, Any]] = None
+
+@dataclass
+class RaceResult:
+    winner: str
+    outcome: ParseOutcome
+    # Per path: seconds until it finished or was abandoned, and how it ended
+    paths: Dict[str, Dict[str, Any]]
+
+@dataclass
+class EscalationDecision:
+    escalate: bool
+    # Why the OCR result was not trusted: invalid, low_confidence, parser_invalid, total_mismatch, low_confidence_items
+    reasons: List[str]
+    confidence: float
+    # |sum of items - total (or subtotal)| / total; None without a total or items
+    total_gap: Optional[float] = None
+
+def is_acceptable(validation: Dict[str, Any], min_confidence: float = HYBRID_MIN_CONFIDENCE) -> bool:
+    """Whether a validated result is good enough to return without waiting for another path"""
+    return bool(validation.get('is_valid')) and validation.get('confidence_score', 0.0) >= min_confidence
+
+async def race_parsers(
+    contenders: Dict[str, Callable[[], Awaitable[ParseOutcome]]],
+    deadlines: Dict[str, float],
+    min_confidence: float = HYBRID_MIN_CONFIDENCE,
+) -> RaceResult:
+    """Start every path at once and return the first acceptable result, cancelling the rest.
+
+    When no path is acceptable, the most confident result that did finish is
+    returned. When none finished, the error of the first path (in contender
+    order) is raised, so an OCR queue-full error still becomes a 429.
+    """
+    started = time.perf_counter()
+    tasks = {
+        asyncio.ensure_future(asyncio.wait_for(start(), deadlines[path])): path
+        for path, start in contenders.items()
+    }
+    order = list(contenders)
+    paths: Dict[str, Dict[str, Any]] = {}
+    finished: Dict[str, ParseOutcome] = {}
+    errors: Dict[str, BaseException] = {}
+    winner = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            seconds = time.perf_counter() - started
+            for task in sorted(done, key=lambda t: order.index(tasks[t])):
+                path = tasks[task]
+                try:
+                    outcome = task.result()
+                except asyncio.TimeoutError as e:
+                    paths[path] = {'seconds': seconds, 'outcome': 'timeout'}
+                    errors[path] = e
+                    continue
+                except Exception as e:
+                    paths[path] = {'seconds': seconds, 'outcome': 'failed'}
+                    errors[path] = e
+                    continue
+
+                finished[path] = outcome
+                if winner is None and is_acceptable(outcome.validation, min_confidence):
+                    winner = path
+                    paths[path] = {'seconds': seconds, 'outcome': 'won'}
+                else:
+                    paths[path] = {'seconds': seconds, 'outcome': 'lost' if winner else 'rejected'}
+    finally:
+        # Only this caller stops waiting: the loser's OCR job is owned by the result
+        # cache, so it still finishes, releases its worker slot and serves other
+        # requests for the same image
+        for task in pending:
+            task.cancel()
+            paths[tasks[task]] = {'seconds': time.perf_counter() - started, 'outcome': 'cancelled'}
+
+    if winner is None and finished:
+        winner = max(finished, key=lambda path: finished[path].validation.get('confidence_score', 0.0))
+        paths[winner]['outcome'] = 'fallback'
+
+    for path, info in paths.items():
+        metrics.HYBRID_PATH_SECONDS.labels(path=path, outcome=info['outcome']).observe(info['seconds'])
+    if winner is None:
+        raise next(errors[path] for path in order if path in errors)
+    metrics.HYBRID_WINS.labels(mode='race', path=winner).inc()
+    metrics.HYBRID_REQUESTS.labels(mode='race', escalated='false').inc()
+    return RaceResult(winner=winner, outcome=finished[winner], paths=paths)
+
+async def ai_first(
+    ai_path: Callable[[], Awaitable[ParseOutcome]],
+    ocr_path: Callable[[], Awaitable[ParseOutcome]],
+) -> RaceResult:
+    """Parse with the AI and only run OCR when the AI call fails.
+
+    The AI call has no deadline of its own, as before the other modes existed.
+    OCR errors propagate.
+    """
+    started = time.perf_counter()
+    try:
+        outcome = await ai_path()
+        winner = 'ai'
+        paths = {'ai': {'seconds': time.perf_counter() - started, 'outcome': 'won'}}
+    except Exception as e:
+        logger.warning(f"AI parsing failed, using OCR fallback: {e}")
+        paths = {'ai': {'seconds': time.perf_counter() - started, 'outcome': 'failed'}}
+        ocr_started = time.perf_counter()
+        outcome = await ocr_path()
+        winner = 'ocr'
+        paths['ocr'] = {'seconds': time.perf_counter() - ocr_started, 'outcome': 'fallback'}
+
+    for path, info in paths.items():
+        metrics.HYBRID_PATH_SECONDS.labels(path=path, outcome=info['outcome']).observe(info['seconds'])
+    metrics.HYBRID_WINS.labels(mode='ai-first', path=winner).inc()
+    metrics.HYBRID_REQUESTS.labels(mode='ai-first', escalated=str(winner == 'ocr').lower()).inc()
+    return RaceResult(winner=winner, outcome=outcome, paths=paths)
+
+def total_gap(receipt) -> Optional[float]:
+    """Relative gap between the sum of the items and the closer of total and subtotal"""
+    if not receipt.total or not receipt.items:
+        return None
+    items_sum = sum(item.price * item.quantity for item in receipt.items)
+    # Items may be printed before or after tax, so either printed amount can be right
+    gaps = [abs(items_sum - amount) for amount in (receipt.total, receipt.subtotal) if amount]
+    return min(gaps) / receipt.total
+
+def escalation_decision(
+    receipt,
+    validation: Dict[str, Any],
+    parser_validation: Dict[str, Any],
+    min_confidence: float = ESCALATE_MIN_CONFIDENCE,
+    total_tolerance: float = ESCALATE_TOTAL_TOLERANCE,
+    max_low_confidence_items: float = ESCALATE_MAX_LOW_CONFIDENCE_ITEMS,
+) -> EscalationDecision:
+    """Decide whether an OCR-parsed receipt should be sent to the AI parser.
+
+    ``validation`` comes from validate_receipt_data and ``parser_validation``
+    from ReceiptParser.validate_receipt; the total check is recomputed here
+    rather than read back from the parser's warning text.
+    """
+    reasons = []
+    confidence = validation.get('confidence_score', 0.0)
+    if not validation.get('is_valid'):
+        reasons.append('invalid')
+    if confidence < min_confidence:
+        reasons.append('low_confidence')
+    if not parser_validation.get('is_valid', True):
+        reasons.append('parser_invalid')
+
+    gap = total_gap(receipt)
+    if gap is not None and gap > total_tolerance:
+        reasons.append('total_mismatch')
+
+    if receipt.items:
+        low = sum(1 for item in receipt.items if item.confidence < LOW_ITEM_CONFIDENCE)
+        if low / len(receipt.items) > max_low_confidence_items:
+            reasons.append('low_confidence_items')
+
+    return EscalationDecision(escalate=bool(reasons), reasons=reasons, confidence=confidence, total_gap=gap)
+
+async def ocr_first(
+    ocr_path: Callable[[], Awaitable[ParseOutcome]],
+    ai_path: Optional[Callable[[], Awaitable[ParseOutcome]]],
+    parser_validate: Callable[[Any], Dict[str, Any]],
+    ai_timeout: float = HYBRID_AI_TIMEOUT,
+) -> Tuple[RaceResult, EscalationDecision]:
+    """Parse with OCR and only call the AI when escalation_decision says the result is doubtful.
+
+    OCR errors propagate. When the AI path is missing, fails, times out or
+    comes back less confident than OCR, the OCR result is returned.
+    """
+    started = time.perf_counter()
+    outcome = await ocr_path()
+    paths = {'ocr': {'seconds': time.perf_counter() - started, 'outcome': 'won'}}
+    decision = escalation_decision(outcome.receipt, outcome.validation, parser_validate(outcome.receipt))
+    winner, result = 'ocr', outcome
+
+    if decision.escalate:
+        for reason in decision.reasons:
+            metrics.HYBRID_ESCALATIONS.labels(reason=reason).inc()
+        paths['ocr']['outcome'] = 'fallback'
+        if ai_path is not None:
+            ai_started = time.perf_counter()
+            try:
+                ai_outcome = await asyncio.wait_for(ai_path(), ai_timeout)
+            except asyncio.TimeoutError:
+                paths['ai'] = {'seconds': time.perf_counter() - ai_started, 'outcome': 'timeout'}
+            except Exception:
+                paths['ai'] = {'seconds': time.perf_counter() - ai_started, 'outcome': 'failed'}
+            else:
+                ai_seconds = time.perf_counter() - ai_started
+                ai_confidence = ai_outcome.validation.get('confidence_score', 0.0)
+                if is_acceptable(ai_outcome.validation) or ai_confidence > decision.confidence:
+                    winner, result = 'ai', ai_outcome
+                    paths['ai'] = {'seconds': ai_seconds, 'outcome': 'won'}
+                    paths['ocr']['outcome'] = 'rejected'
+                else:
+                    paths['ai'] = {'seconds': ai_seconds, 'outcome': 'rejected'}
+
+    for path, info in paths.items():
+        metrics.HYBRID_PATH_SECONDS.labels(path=path, outcome=info['outcome']).observe(info['seconds'])
+    metrics.HYBRID_WINS.labels(mode='ocr-first', path=winner).inc()
+    metrics.HYBRID_REQUESTS.labels(mode='ocr-first', escalated=str(decision.escalate).lower()).inc()
+    return RaceResult(winner=winner, outcome=result, paths=paths), decision
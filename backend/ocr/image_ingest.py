@@ -0,0 +1,93 @@
+"""
+Image Ingestion
+Reads image headers once and decodes uploads once, straight to the resolution
+and colour space the OCR pipeline needs
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# EXIF orientations that swap width and height (90/270 degree rotations)
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Largest first so the smallest decode that still covers the target wins
+_REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+]
+
+class ImageDecodeError(ValueError):
+    """Raised when upload bytes are not a readable image"""
+
+@dataclass
+class ImageMetadata:
+    # Display size, after applying EXIF orientation
+    width: int
+    height: int
+    format: Optional[str] = None
+    orientation: int = 1
+
+    @property
+    def long_edge(self) -> int:
+        return max(self.width, self.height)
+
+def probe_image(image_bytes: bytes) -> ImageMetadata:
+    """Read size, format and EXIF orientation from the header without decoding pixels"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1)
+            image_format = img.format
+    except Exception as e:
+        raise ImageDecodeError("Unsupported or corrupt image") from e
+
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return ImageMetadata(width=width, height=height, format=image_format, orientation=orientation)
+
+def reduced_decode_factor(long_edge: int, target_long_edge: Optional[int]) -> int:
+    """Largest DCT downscale factor that keeps the long edge at or above the target"""
+    if not target_long_edge:
+        return 1
+    for factor, _ in _REDUCED_DECODE_FLAGS:
+        if long_edge // factor >= target_long_edge:
+            return factor
+    return 1
+
+def text_safe_decode_factor(factor: int, text_height: float, min_text_height: float) -> int:
+    """Largest factor below `factor` that keeps text measured at `factor` at or above min_text_height"""
+    full_text_height = text_height * factor
+    for smaller, _ in _REDUCED_DECODE_FLAGS:
+        if smaller < factor and full_text_height / smaller >= min_text_height:
+            return smaller
+    return 1
+
+def decode_grayscale(
+    image_bytes: bytes,
+    metadata: Optional[ImageMetadata] = None,
+    target_long_edge: Optional[int] = None,
+    factor: Optional[int] = None,
+) -> np.ndarray:
+    """Decode once to grayscale, EXIF-oriented, reduced when far above target_long_edge.
+
+    JPEG decoders scale in the DCT domain for the reduced flags, so a 12 MP
+    photo never exists as a full-size BGR array. Pass factor to choose the
+    reduction directly.
+    """
+    if metadata is None:
+        metadata = probe_image(image_bytes)
+
+    if factor is None:
+        factor = reduced_decode_factor(metadata.long_edge, target_long_edge)
+    flag = dict(_REDUCED_DECODE_FLAGS).get(factor, cv2.IMREAD_GRAYSCALE)
+    # imdecode applies EXIF orientation for every flag except IMREAD_UNCHANGED
+    gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+    if gray is None:
+        raise ImageDecodeError("Could not decode image")
+    return gray
@@ -0,0 +1,262 @@
+"""
+Image Preprocessing
+OpenCV pipeline that prepares receipt photos for OCR
+"""
+
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from image_ingest import ImageMetadata, decode_grayscale, probe_image, reduced_decode_factor, text_safe_decode_factor
+from image_quality import PROFILES, PROFILE_SKIP_STAGES, QUAD_MIN_CONFIDENCE, assess_quality, detect_receipt_quad
+
+# Bump whenever preprocessing output changes so cached OCR results are not reused
+PIPELINE_VERSION = "6"
+
+# "adaptive" resamples to a working resolution before the expensive stages; "full" keeps the original resolution
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "adaptive")
+PREPROCESS_MAX_LONG_EDGE = int(os.getenv("PREPROCESS_MAX_LONG_EDGE", "2000"))
+PREPROCESS_TARGET_TEXT_HEIGHT = int(os.getenv("PREPROCESS_TARGET_TEXT_HEIGHT", "32"))
+# Never shrink text below this many pixels, even to honour the long-edge cap
+PREPROCESS_MIN_TEXT_HEIGHT = 16
+# "auto" picks light/medium/full per image from its quality signals; a profile name forces it
+PREPROCESS_PROFILE = os.getenv("PREPROCESS_PROFILE", "auto")
+
+def preprocessing_fingerprint(skip_stages: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+    """Settings that change preprocessing output, for cache keys"""
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "skip_stages": sorted(skip_stages),
+        "profile": PREPROCESS_PROFILE,
+        "max_long_edge": PREPROCESS_MAX_LONG_EDGE,
+        "target_text_height": PREPROCESS_TARGET_TEXT_HEIGHT,
+    }
+
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """Estimate the typical glyph height in pixels from connected components"""
+    # Work on a small copy; component statistics survive downscaling well
+    long_edge = max(gray.shape[:2])
+    probe_scale = min(1.0, 1000 / long_edge)
+    probe = gray
+    if probe_scale < 1.0:
+        probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+
+    _, binary = cv2.threshold(probe, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Keep glyph-like blobs: not specks, not rules/borders, roughly character-shaped
+    glyphs = heights[(heights >= 3) & (heights <= probe.shape[0] * 0.1) & (widths <= heights * 3)]
+    if len(glyphs) < 10:
+        return None
+
+    return float(np.median(glyphs)) / probe_scale
+
+def decode_for_text(
+    image_bytes: bytes,
+    metadata: Optional[ImageMetadata] = None,
+    target_long_edge: Optional[int] = None,
+) -> np.ndarray:
+    """decode_grayscale, but never reduced so far that text drops below PREPROCESS_MIN_TEXT_HEIGHT.
+
+    The long edge alone picks the reduction; the reduced image then serves as
+    the probe for glyph height, and small text is decoded again with a smaller
+    factor (or in full) instead of being upscaled from lost detail.
+    """
+    if metadata is None:
+        metadata = probe_image(image_bytes)
+    factor = reduced_decode_factor(metadata.long_edge, target_long_edge)
+    gray = decode_grayscale(image_bytes, metadata, factor=factor)
+    if factor > 1:
+        text_height = estimate_text_height(gray)
+        if text_height and text_height < PREPROCESS_MIN_TEXT_HEIGHT:
+            factor = text_safe_decode_factor(factor, text_height, PREPROCESS_MIN_TEXT_HEIGHT)
+            gray = decode_grayscale(image_bytes, metadata, factor=factor)
+    return gray
+
+def resample_to_working_resolution(
+    gray: np.ndarray,
+    max_long_edge: int = PREPROCESS_MAX_LONG_EDGE,
+    target_text_height: int = PREPROCESS_TARGET_TEXT_HEIGHT,
+) -> np.ndarray:
+    """Downscale so text is about target_text_height and the long edge fits max_long_edge"""
+    long_edge = max(gray.shape[:2])
+    scale = min(1.0, max_long_edge / long_edge)
+
+    text_height = estimate_text_height(gray)
+    if text_height:
+        scale = min(scale, target_text_height / text_height)
+        scale = min(1.0, max(scale, PREPROCESS_MIN_TEXT_HEIGHT / text_height))
+
+    if scale >= 0.95:
+        return gray
+
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def adaptive_threshold(image: np.ndarray) -> np.ndarray:
+    """Apply adaptive thresholding with better parameters"""
+    return cv2.adaptiveThreshold(
+        image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 5
+    )
+
+def denoise(image: np.ndarray) -> np.ndarray:
+    """Non-local means denoising; the most expensive stage, cost scales with pixel count"""
+    return cv2.fastNlMeansDenoising(image, None, 10, 7, 21)
+
+def close_text_gaps(image: np.ndarray) -> np.ndarray:
+    """Apply morphological operations to clean up text"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    return cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
+
+def apply_perspective_correction(image: np.ndarray) -> np.ndarray:
+    """Apply perspective correction to straighten receipt"""
+    try:
+        quad = detect_receipt_quad(image)
+        if quad is None:
+            return image
+        if quad.confidence < QUAD_MIN_CONFIDENCE:
+            logger.debug(f"Skipping perspective warp, quad confidence {quad.confidence:.2f}")
+            return image
+
+        rect = quad.corners
+
+        # Calculate new width and height
+        widthA = np.sqrt(((rect[2][0] - rect[3][0]) ** 2) + ((rect[2][1] - rect[3][1]) ** 2))
+        widthB = np.sqrt(((rect[1][0] - rect[0][0]) ** 2) + ((rect[1][1] - rect[0][1]) ** 2))
+        maxWidth = max(int(widthA), int(widthB))
+
+        heightA = np.sqrt(((rect[1][0] - rect[2][0]) ** 2) + ((rect[1][1] - rect[2][1]) ** 2))
+        heightB = np.sqrt(((rect[0][0] - rect[3][0]) ** 2) + ((rect[0][1] - rect[3][1]) ** 2))
+        maxHeight = max(int(heightA), int(heightB))
+
+        # Define destination points
+        dst = np.array([
+            [0, 0],
+            [maxWidth - 1, 0],
+            [maxWidth - 1, maxHeight - 1],
+            [0, maxHeight - 1]
+        ], dtype="float32")
+
+        # One warp at working resolution, from corners found on the proxy
+        M = cv2.getPerspectiveTransform(rect, dst)
+        return cv2.warpPerspective(image, M, (maxWidth, maxHeight))
+    except Exception as e:
+        logger.warning(f"Perspective correction failed: {e}")
+
+    return image
+
+def enhance_contrast(image: np.ndarray) -> np.ndarray:
+    """Enhance image contrast for better OCR"""
+    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    enhanced = clahe.apply(image)
+
+    # Apply slight Gaussian blur to reduce noise
+    blurred = cv2.GaussianBlur(enhanced, (1, 1), 0)
+
+    return blurred
+
+# Ordered preprocessing stages; each takes the previous stage's output
+PIPELINE_STAGES: List[Tuple[str, Callable[[Any], Any]]] = [
+    # Header probe plus one grayscale decode, DCT-reduced for oversized JPEGs
+    ("decode", decode_for_text),
+    # Shrink 12 MP phone photos before denoising, which scales with pixel count
+    ("resample", resample_to_working_resolution),
+    # Picks a profile; does not change the image
+    ("classify", assess_quality),
+    ("perspective", apply_perspective_correction),
+    ("clahe", enhance_contrast),
+    ("threshold", adaptive_threshold),
+    ("denoise", denoise),
+    ("morph", close_text_gaps),
+]
+STAGE_NAMES = [name for name, _ in PIPELINE_STAGES]
+REQUIRED_STAGES = frozenset({"decode"})
+
+@dataclass
+class PipelineResult:
+    image: Optional[np.ndarray]
+    stage_timings: Dict[str, float]
+    profile: str
+    # Stages left out because of the profile rather than the caller's skip list
+    profile_skipped: List[str] = field(default_factory=list)
+    # Size of the image the profile-dependent stages work on
+    megapixels: float = 0.0
+    quality: Optional[Dict[str, Any]] = None
+
+def parse_skip_stages(value: Optional[str]) -> FrozenSet[str]:
+    """Parse a comma-separated list of stage names to skip"""
+    if not value:
+        return frozenset()
+    stages = frozenset(name.strip().lower() for name in value.split(",") if name.strip())
+    unknown = stages - set(STAGE_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stages: {', '.join(sorted(unknown))}")
+    required = stages & REQUIRED_STAGES
+    if required:
+        raise ValueError(f"Preprocessing stages cannot be skipped: {', '.join(sorted(required))}")
+    return stages
+
+# Parsed at import, so an invalid value stops the service at startup rather than failing each request
+PREPROCESS_SKIP_STAGES = parse_skip_stages(os.getenv("PREPROCESS_SKIP_STAGES"))
+
+def default_skip_stages(mode: str = PREPROCESS_MODE) -> FrozenSet[str]:
+    """Stages skipped when the request does not choose its own"""
+    skip = PREPROCESS_SKIP_STAGES
+    if mode == "full":
+        skip = skip | {"resample"}
+    return skip
+
+def run_pipeline(
+    image_bytes: bytes,
+    skip_stages: FrozenSet[str] = frozenset(),
+    profile: str = PREPROCESS_PROFILE,
+    metadata: Optional[ImageMetadata] = None,
+) -> PipelineResult:
+    """Run every stage not skipped by the caller or the quality profile.
+
+    With profile "auto" the classify stage picks the profile; skipping classify
+    falls back to "full".
+    """
+    if profile == "auto":
+        profile = "full"
+    elif profile not in PROFILES:
+        raise ValueError(f"Unknown preprocessing profile: {profile}")
+    else:
+        skip_stages = skip_stages | {"classify"}
+    result = PipelineResult(image=None, stage_timings={}, profile=profile)
+
+    for name, stage in PIPELINE_STAGES:
+        if name in skip_stages:
+            continue
+        if name in PROFILE_SKIP_STAGES[result.profile]:
+            result.profile_skipped.append(name)
+            continue
+        start = time.perf_counter()
+        if name == "decode":
+            # Decode straight to roughly working resolution unless full resolution was asked for
+            target_long_edge = None if "resample" in skip_stages else PREPROCESS_MAX_LONG_EDGE
+            result.image = stage(image_bytes, metadata, target_long_edge)
+        elif name == "classify":
+            assessment = stage(result.image)
+            result.profile = assessment.profile
+            result.quality = asdict(assessment)
+        else:
+            result.image = stage(result.image)
+        result.stage_timings[name] = time.perf_counter() - start
+        if name in ("decode", "resample"):
+            result.megapixels = result.image.size / 1e6
+
+    return result
+
+def preprocess_image(image_bytes: bytes, mode: str = PREPROCESS_MODE, profile: str = PREPROCESS_PROFILE) -> np.ndarray:
+    """Enhanced preprocessing for better OCR results"""
+    return run_pipeline(image_bytes, default_skip_stages(mode), profile).image
@@ -0,0 +1,188 @@
+"""
+Image Quality Classifier
+Cheap signals that decide how much preprocessing an upload actually needs
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+import cv2
+import numpy as np
+
+# Below this edge sharpness (mean |Laplacian| on edges) the image is treated as blurry
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "40"))
+# Above this noise estimate NL-means denoising is kept; daylight phone photos score
+# below it, low-light grain above (calibration in the README's Quality Profiles section)
+QUALITY_MAX_NOISE = float(os.getenv("QUALITY_MAX_NOISE", "3.0"))
+# Otsu between-class / total variance; close to 1 for clean black-on-white text
+QUALITY_MIN_BIMODALITY = float(os.getenv("QUALITY_MIN_BIMODALITY", "0.8"))
+# Quad detection runs on a copy with this long edge; corners are scaled back up
+QUAD_PROXY_LONG_EDGE = int(os.getenv("QUAD_PROXY_LONG_EDGE", "512"))
+# Quads scoring below this are treated as noise: no warp, no "has_quad"
+QUAD_MIN_CONFIDENCE = float(os.getenv("QUAD_MIN_CONFIDENCE", "0.5"))
+# A receipt covering this fraction of the frame gets full marks for area
+QUAD_FULL_AREA = 0.25
+
+# Stages each profile leaves out; "full" runs the whole pipeline
+PROFILE_SKIP_STAGES: Dict[str, FrozenSet[str]] = {
+    # Flat, clean scans and e-receipt screenshots
+    "light": frozenset({"perspective", "clahe", "denoise", "morph"}),
+    # Clean photos that may still need straightening and contrast
+    "medium": frozenset({"denoise"}),
+    "full": frozenset(),
+}
+PROFILES = list(PROFILE_SKIP_STAGES)
+
+@dataclass
+class QualityAssessment:
+    profile: str
+    sharpness: float
+    noise: float
+    bimodality: float
+    has_quad: bool
+    quad_confidence: float = 0.0
+
+@dataclass
+class QuadDetection:
+    # Top-left, top-right, bottom-right, bottom-left, in input image coordinates
+    corners: np.ndarray
+    confidence: float
+
+def order_corners(pts: np.ndarray) -> np.ndarray:
+    """Order 4 points as top-left, top-right, bottom-right, bottom-left"""
+    rect = np.zeros((4, 2), dtype="float32")
+
+    # Top-left point will have the smallest sum
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)]
+    rect[2] = pts[np.argmax(s)]
+
+    # Top-right point will have the smallest difference
+    diff = np.diff(pts, axis=1)
+    rect[1] = pts[np.argmin(diff)]
+    rect[3] = pts[np.argmax(diff)]
+    return rect
+
+def quad_confidence(quad: np.ndarray, edges: np.ndarray) -> float:
+    """Score a candidate outline by area, right angles and how much of it lies on real edges"""
+    quad = quad.astype(np.int32).reshape(4, 2)
+    if not cv2.isContourConvex(quad):
+        return 0.0
+
+    area_score = min(1.0, cv2.contourArea(quad) / (edges.size * QUAD_FULL_AREA))
+
+    # 1 for a rectangle, falling as corners move away from 90 degrees
+    cosines = []
+    for i in range(4):
+        a = quad[i - 1] - quad[i]
+        b = quad[(i + 1) % 4] - quad[i]
+        cosines.append(abs(np.dot(a, b)) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-6))
+    angle_score = 1.0 - float(np.mean(cosines))
+
+    # Fraction of the outline backed by a Canny edge within a pixel
+    outline = np.zeros_like(edges)
+    cv2.polylines(outline, [quad], True, 255, 1)
+    near_edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    support = cv2.countNonZero(cv2.bitwise_and(outline, near_edges)) / max(1, cv2.countNonZero(outline))
+
+    return round(area_score * angle_score * support, 3)
+
+def detect_receipt_quad(gray: np.ndarray, proxy_long_edge: int = QUAD_PROXY_LONG_EDGE) -> Optional[QuadDetection]:
+    """Find the receipt outline on a small proxy image.
+
+    Canny and findContours cost scales with pixels and most full-resolution
+    contours are texture noise, so only a proxy is searched and the four
+    corners are scaled back to the input resolution.
+    """
+    scale = min(1.0, proxy_long_edge / max(gray.shape[:2]))
+    proxy = gray
+    if scale < 1.0:
+        proxy = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    edges = cv2.Canny(proxy, 50, 150, apertureSize=3)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    # The largest contour is likely the receipt
+    largest_contour = max(contours, key=cv2.contourArea)
+    epsilon = 0.02 * cv2.arcLength(largest_contour, True)
+    approx = cv2.approxPolyDP(largest_contour, epsilon, True)
+    if len(approx) != 4:
+        return None
+
+    quad = approx.reshape(4, 2)
+    return QuadDetection(
+        corners=order_corners(quad.astype(np.float32) / scale),
+        confidence=quad_confidence(quad, edges),
+    )
+
+def edge_sharpness(gray: np.ndarray) -> float:
+    """Mean absolute Laplacian on edge pixels, so the amount of text does not matter"""
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), np.ones((3, 3), np.uint8))
+    if cv2.countNonZero(edges) < 100:
+        return 0.0
+    return float(np.abs(laplacian[edges > 0]).mean())
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """Noise sigma from the Laplacian-of-Laplacian response (Immerkaer, 1996), ignoring text edges"""
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = np.abs(cv2.filter2D(gray.astype(np.float32), -1, kernel))
+    # Glyph outlines would otherwise dominate the response on dense receipts
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), np.ones((5, 5), np.uint8))
+    flat = response[1:-1, 1:-1][edges[1:-1, 1:-1] == 0]
+    if flat.size == 0:
+        return 0.0
+    return float(np.sqrt(np.pi / 2) * flat.mean() / 6)
+
+def histogram_bimodality(gray: np.ndarray) -> float:
+    """Fraction of intensity variance explained by the Otsu split"""
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    prob = hist / hist.sum()
+    levels = np.arange(256)
+    mean = (prob * levels).sum()
+    total_var = (prob * (levels - mean) ** 2).sum()
+    if total_var == 0:
+        return 0.0
+
+    weight = np.cumsum(prob)
+    cum_mean = np.cumsum(prob * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between_var = (mean * weight - cum_mean) ** 2 / (weight * (1 - weight))
+    return float(np.nanmax(between_var) / total_var)
+
+def assess_quality(gray: np.ndarray) -> QualityAssessment:
+    """Measure the quality signals and pick a preprocessing profile"""
+    # Downscaling averages away noise and blur, so measure those at native resolution
+    height, width = gray.shape[:2]
+    sharpness = edge_sharpness(gray)
+    top, left = max(0, (height - 768) // 2), max(0, (width - 768) // 2)
+    noise = estimate_noise(gray[top:top + 768, left:left + 768])
+
+    # Histogram shape and the page outline survive downscaling
+    probe_scale = min(1.0, 1000 / max(height, width))
+    probe = gray
+    if probe_scale < 1.0:
+        probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+    bimodality = histogram_bimodality(probe)
+    quad = detect_receipt_quad(probe)
+    quad_confidence = quad.confidence if quad else 0.0
+    has_quad = quad_confidence >= QUAD_MIN_CONFIDENCE
+
+    if noise > QUALITY_MAX_NOISE or sharpness < QUALITY_MIN_SHARPNESS:
+        profile = "full"
+    elif has_quad or bimodality < QUALITY_MIN_BIMODALITY:
+        profile = "medium"
+    else:
+        profile = "light"
+
+    return QualityAssessment(
+        profile=profile,
+        sharpness=sharpness,
+        noise=noise,
+        bimodality=bimodality,
+        has_quad=has_quad,
+        quad_confidence=quad_confidence,
+    )
@@ -0,0 +1,41 @@
+"""
+Item Names
+The canonical key price_history rows are stored and looked up by, shared by
+every writer (receipts and scrapers) and reader of the table
+"""
+
+import os
+
+# Words that don't help with matching
+STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+# Trigram similarity a stored key needs to stand in for a name that has no exact match
+ITEM_MATCH_MIN_SIMILARITY = float(os.getenv("ITEM_MATCH_MIN_SIMILARITY", "0.5"))
+
+def normalize_item_name(item_name: str) -> str:
+    """Lowercased words of the name, without stop words and words of two letters or fewer.
+
+    database/06-price-history-normalized-name.sql mirrors this as the SQL
+    function normalize_item_name, used to backfill existing rows.
+    """
+    words = item_name.lower().strip().split()
+    return ' '.join(w for w in words if w not in STOP_WORDS and len(w) > 2)
+
+def item_key_sql(name: str, percent: str = '%') -> str:
+    """SQL subquery giving the price_history key for the normalized name `name` (a parameter or column).
+
+    The name itself when some row is stored under it (a B-tree lookup on
+    normalized_name); only otherwise the most similar stored key by trigram
+    similarity; no row when nothing is similar enough. Pass percent='%%' for
+    drivers, like psycopg2, that treat % as a placeholder.
+    """
+    return f"""(
+        SELECT {name}::text AS item_key
+        WHERE EXISTS (SELECT 1 FROM price_history WHERE normalized_name = {name})
+        UNION ALL
+        (SELECT normalized_name FROM price_history
+         WHERE normalized_name {percent} {name}
+         AND similarity(normalized_name, {name}) >= {ITEM_MATCH_MIN_SIMILARITY}
+         ORDER BY similarity(normalized_name, {name}) DESC
+         LIMIT 1)
+        LIMIT 1
+    )"""
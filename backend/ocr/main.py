@@ -1,80 +1,209 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Body
+import time
+
+# Measured from here so the reported import time covers the whole module
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Body, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+import orjson
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import cv2
-import numpy as np
-from PIL import Image
-import io
+from typing import List, Optional, Dict, Any, FrozenSet, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import base64
-import time
 import os
 import logging
 from loguru import logger
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from receipt_parser import ReceiptParser, ReceiptData, ReceiptItem
-from price_intelligence import PriceIntelligenceService, BasketAnalysis
-from openai_service import OpenAIReceiptService, ReceiptParseResult
+from ocr_pool import OCRWorkerPool, OCRQueueFullError
+from result_cache import ResultCache
+from correction_dictionary import CorrectionDictionary, CORRECTION_REFRESH_SECONDS
+from best_price_index import BestPriceIndex, BEST_PRICE_RECONCILE_SECONDS
+from image_ingest import ImageDecodeError, ImageMetadata, probe_image
+from image_preprocessing import default_skip_stages, parse_skip_stages, preprocessing_fingerprint
+from hybrid_parsing import (
+    ParseOutcome, race_parsers, ai_first, ocr_first, HYBRID_MODE, HYBRID_MODES, HYBRID_AI_TIMEOUT, HYBRID_OCR_TIMEOUT
+)
+import metrics
 import re
-import asyncpg
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger.add("ocr_service.log", rotation="10 MB", retention="7 days")
 
-app = FastAPI(
-    title="ReceiptRadar OCR Service",
-    description="OCR microservice for parsing grocery receipts with AI enhancement",
-    version="2.0.0"
-)
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/receiptradar")
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Run one inference per worker on a bundled receipt before reporting ready
+OCR_WARMUP = os.getenv("OCR_WARMUP", "true").lower() == "true"
+WARMUP_IMAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "warmup_receipt.png")
+
+# PaddleOCR runs in worker processes (see ocr_pool.py); the API process only awaits results
+ocr_pool = OCRWorkerPool()
+
+# Retried uploads of the same image reuse OCR results instead of re-running the pipeline
+ocr_cache = ResultCache.from_env()
+
+# Receipts from one /ocr/batch request processed at once (overridable per request)
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", str(ocr_pool.workers)))
+BATCH_QUEUE_FULL_RETRIES = 3
+
+# Worker processes for /parse/ocr-results/batch; smaller batches are parsed in the API process
+PARSE_BATCH_WORKERS = int(os.getenv("PARSE_BATCH_WORKERS", str(os.cpu_count() or 1)))
+PARSE_BATCH_MIN_POOL = int(os.getenv("PARSE_BATCH_MIN_POOL", "256"))
+parse_pool = None
 
-# Initialize services
-try:
-    from paddleocr import PaddleOCR
-    ocr = PaddleOCR(use_angle_cls=True, lang='en')
-    logger.info("PaddleOCR initialized successfully")
-except ImportError:
-    logger.warning("PaddleOCR not available, using mock OCR service")
-    ocr = None
-except Exception as e:
-    logger.error(f"Failed to initialize PaddleOCR: {e}")
-    ocr = None
-
-try:
-    receipt_parser = ReceiptParser()
-    
-    # Initialize price intelligence service
-    DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/receiptradar")
-    price_intelligence = None
+# Built by the lifespan startup task; endpoints answer 503 until then
+receipt_parser = None
+price_intelligence = None
+openai_service = None
+# Confirmed item corrections, when a database is configured
+correction_dictionary = None
+correction_refresh_task = None
+# Refreshes started after corrections are stored, referenced until they finish
+correction_reload_tasks: Set[asyncio.Task] = set()
+# 30-day best prices in memory for basket analysis, when a database is configured
+best_price_index = None
+best_price_task = None
+
+# Startup progress reported by /readyz and /health
+startup_state: Dict[str, Any] = {
+    "import_seconds": None,
+    "services_ready": False,
+    "ocr_warm": False,
+    "time_to_first_inference": None,
+    "error": None,
+}
+
+def init_services():
+    """Build the parser and the database/OpenAI clients; openai and asyncpg are imported here, not at module load"""
+    global receipt_parser, price_intelligence, openai_service, correction_dictionary, best_price_index
     
     # Only try to initialize if we have a valid database URL
     if DATABASE_URL and DATABASE_URL.startswith(('postgresql://', 'postgres://')):
+        correction_dictionary = CorrectionDictionary(DATABASE_URL)
         try:
-            price_intelligence = PriceIntelligenceService(DATABASE_URL)
+            from price_intelligence import PriceIntelligenceService
+            best_price_index = BestPriceIndex(DATABASE_URL)
+            price_intelligence = PriceIntelligenceService(DATABASE_URL, best_prices=best_price_index)
             logger.info("Price intelligence service initialized with database")
         except Exception as e:
             logger.warning(f"Database connection failed, using mock price intelligence: {e}")
-            price_intelligence = None
     else:
         logger.warning("No valid DATABASE_URL provided, using mock price intelligence")
     
-    # Initialize OpenAI service
-    openai_service = OpenAIReceiptService()
+    receipt_parser = ReceiptParser(corrections=correction_dictionary)
+    
+    # Use mock price intelligence if database connection failed
+    if price_intelligence is None:
+        price_intelligence = MockPriceIntelligenceService()
+        logger.info("Using mock price intelligence service")
+    
+    try:
+        from openai_service import OpenAIReceiptService
+        openai_service = OpenAIReceiptService()
+    except Exception as e:
+        logger.error(f"Failed to initialize OpenAI service: {e}")
     
-    logger.info("All services initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize services: {e}")
-    receipt_parser = None
-    price_intelligence = None
-    openai_service = None
+    logger.info("Services initialized")
+
+async def warm_up_ocr():
+    """Run the bundled receipt through every worker so the first real request skips model loading"""
+    with open(WARMUP_IMAGE_PATH, "rb") as f:
+        image_bytes = f.read()
+    metadata = probe_image(image_bytes)
+    # One job per worker; the executor spawns a process for each while none is idle
+    await asyncio.gather(*[ocr_pool.run(image_bytes, metadata=metadata) for _ in range(ocr_pool.workers)])
+
+async def refresh_corrections():
+    """Load corrections confirmed since the last refresh; failures leave the dictionary as it was"""
+    try:
+        await correction_dictionary.refresh()
+    except Exception as e:
+        logger.warning(f"Correction dictionary refresh failed: {e}")
+
+async def refresh_corrections_periodically():
+    """Load confirmed corrections once, then pick up new ones every CORRECTION_REFRESH_SECONDS"""
+    while True:
+        await refresh_corrections()
+        await asyncio.sleep(CORRECTION_REFRESH_SECONDS)
+
+async def reconcile_best_prices():
+    """Reload the best price index in full; failures leave it cold or as it was"""
+    try:
+        await best_price_index.refresh()
+    except Exception as e:
+        logger.warning(f"Best price index refresh failed: {e}")
+
+async def reconcile_best_prices_periodically():
+    """Load the best price index, then reconcile it with price_history every BEST_PRICE_RECONCILE_SECONDS"""
+    while True:
+        await reconcile_best_prices()
+        await asyncio.sleep(BEST_PRICE_RECONCILE_SECONDS)
+
+async def start_services():
+    """Background startup: services first, then OCR warm-up, then ready"""
+    global correction_refresh_task, best_price_task
+    try:
+        started = time.perf_counter()
+        await asyncio.to_thread(init_services)
+        startup_state["services_ready"] = True
+        logger.info(f"Services initialized in {time.perf_counter() - started:.2f}s")
+        
+        # Parsing starts without the dictionary's contents; it fills in as the first refresh lands
+        if correction_dictionary is not None:
+            correction_refresh_task = asyncio.create_task(refresh_corrections_periodically())
+        # Basket analysis asks the database until the index has loaded
+        if best_price_index is not None:
+            best_price_task = asyncio.create_task(reconcile_best_prices_periodically())
+        
+        if OCR_WARMUP:
+            started = time.perf_counter()
+            await warm_up_ocr()
+            logger.info(f"OCR warm-up on {ocr_pool.workers} workers took {time.perf_counter() - started:.2f}s")
+        startup_state["ocr_warm"] = True
+        startup_state["time_to_first_inference"] = round(time.perf_counter() - _import_started, 3)
+        logger.info(f"Ready {startup_state['time_to_first_inference']:.2f}s after import started")
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.error(f"Startup failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving immediately; initialise and warm up in the background"""
+    ocr_pool.start()
+    startup_task = asyncio.create_task(start_services())
+    yield
+    startup_task.cancel()
+    if correction_refresh_task is not None:
+        correction_refresh_task.cancel()
+        for task in correction_reload_tasks:
+            task.cancel()
+        await correction_dictionary.close_pool()
+    if best_price_task is not None:
+        best_price_task.cancel()
+        await best_price_index.close()
+    ocr_pool.shutdown()
+    if parse_pool is not None:
+        parse_pool.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(
+    title="ReceiptRadar OCR Service",
+    description="OCR microservice for parsing grocery receipts with AI enhancement",
+    version="2.0.0",
+    lifespan=lifespan
+)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Configure appropriately for production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # Mock Price Intelligence Service for testing
 class MockPriceIntelligenceService:
@@ -107,29 +236,6 @@ class MockPriceIntelligenceService:
             cashback_available=Decimal("0.50")
         )
 
-# Use mock price intelligence if database connection failed
-if price_intelligence is None:
-    price_intelligence = MockPriceIntelligenceService()
-    logger.info("Using mock price intelligence service")
-
-# Mock OCR class for when PaddleOCR is not available
-class MockOCR:
-    def __init__(self):
-        self.mock_results = [
-            {"text": "STORE NAME", "bbox": [[10, 10, 100, 30]], "confidence": 0.9},
-            {"text": "TOTAL: $25.50", "bbox": [[10, 200, 150, 220]], "confidence": 0.95},
-            {"text": "MILK $4.50", "bbox": [[10, 50, 100, 70]], "confidence": 0.8},
-            {"text": "BREAD $3.00", "bbox": [[10, 80, 100, 100]], "confidence": 0.8},
-            {"text": "EGGS $5.00", "bbox": [[10, 110, 100, 130]], "confidence": 0.8},
-        ]
-    
-    def __call__(self, img, cls=True):
-        return [self.mock_results]
-
-# Use mock OCR if PaddleOCR is not available
-if ocr is None:
-    ocr = MockOCR()
-
 class OCRResult(BaseModel):
     text: str
     bbox: List[List[float]]
@@ -139,6 +245,8 @@ class OCRResponse(BaseModel):
     results: List[OCRResult]
     processing_time: float
     image_size: Dict[str, int]
+    stage_timings: Dict[str, float] = {}
+    preprocess_profile: Optional[str] = None
 
 class ReceiptItemResponse(BaseModel):
     name: str
@@ -158,6 +266,10 @@ class ReceiptResponse(BaseModel):
     validation: Dict[str, Any]
     processing_time: float
     ai_enhanced: bool = False
+    stage_timings: Dict[str, float] = {}
+    preprocess_profile: Optional[str] = None
+    # /parse-hybrid only: mode, winning path and per-path seconds/outcome
+    hybrid: Optional[Dict[str, Any]] = None
 
 class AIReceiptResponse(BaseModel):
     store_name: str
@@ -171,109 +283,65 @@ class AIReceiptResponse(BaseModel):
     ai_enhanced: bool = True
     processing_time: float
 
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
-    """Enhanced preprocessing for better OCR results"""
-    # Convert bytes to numpy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Get image dimensions
-    height, width = img.shape[:2]
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Apply perspective correction if needed
-    corrected = apply_perspective_correction(gray)
-    
-    # Enhance contrast
-    enhanced = enhance_contrast(corrected)
-    
-    # Apply adaptive thresholding with better parameters
-    thresh = cv2.adaptiveThreshold(
-        enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 5
-    )
-    
-    # Denoise with better parameters
-    denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
-    
-    # Apply morphological operations to clean up text
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-    cleaned = cv2.morphologyEx(denoised, cv2.MORPH_CLOSE, kernel)
-    
-    return cleaned
+class FastJSONResponse(JSONResponse):
+    """JSON body serialised by orjson.
 
-def apply_perspective_correction(image: np.ndarray) -> np.ndarray:
-    """Apply perspective correction to straighten receipt"""
-    try:
-        # Find edges
-        edges = cv2.Canny(image, 50, 150, apertureSize=3)
-        
-        # Find contours
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            # Find the largest contour (likely the receipt)
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # Approximate the contour to a polygon
-            epsilon = 0.02 * cv2.arcLength(largest_contour, True)
-            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-            
-            # If we have 4 points, it's likely a rectangle
-            if len(approx) == 4:
-                # Order points: top-left, top-right, bottom-right, bottom-left
-                pts = approx.reshape(4, 2)
-                rect = np.zeros((4, 2), dtype="float32")
-                
-                # Top-left point will have the smallest sum
-                s = pts.sum(axis=1)
-                rect[0] = pts[np.argmin(s)]
-                rect[2] = pts[np.argmax(s)]
-                
-                # Top-right point will have the smallest difference
-                diff = np.diff(pts, axis=1)
-                rect[1] = pts[np.argmin(diff)]
-                rect[3] = pts[np.argmax(diff)]
-                
-                # Calculate new width and height
-                widthA = np.sqrt(((rect[2][0] - rect[3][0]) ** 2) + ((rect[2][1] - rect[3][1]) ** 2))
-                widthB = np.sqrt(((rect[1][0] - rect[0][0]) ** 2) + ((rect[1][1] - rect[0][1]) ** 2))
-                maxWidth = max(int(widthA), int(widthB))
-                
-                heightA = np.sqrt(((rect[1][0] - rect[2][0]) ** 2) + ((rect[1][1] - rect[2][1]) ** 2))
-                heightB = np.sqrt(((rect[0][0] - rect[3][0]) ** 2) + ((rect[0][1] - rect[3][1]) ** 2))
-                maxHeight = max(int(heightA), int(heightB))
-                
-                # Define destination points
-                dst = np.array([
-                    [0, 0],
-                    [maxWidth - 1, 0],
-                    [maxWidth - 1, maxHeight - 1],
-                    [0, maxHeight - 1]
-                ], dtype="float32")
-                
-                # Calculate perspective transform matrix
-                M = cv2.getPerspectiveTransform(rect, dst)
-                
-                # Apply perspective transform
-                warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
-                return warped
-    except Exception as e:
-        logger.warning(f"Perspective correction failed: {e}")
+    Parse endpoints build their body as plain dicts in one step from the
+    parser's dataclasses (see receipt_payload) and return it in this class, so
+    FastAPI neither re-validates it against the response model nor runs it
+    through jsonable_encoder. The response models still document the shape.
+    """
     
-    return image
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
-def enhance_contrast(image: np.ndarray) -> np.ndarray:
-    """Enhance image contrast for better OCR"""
-    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(image)
-    
-    # Apply slight Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(enhanced, (1, 1), 0)
+def item_payload(name: str, price: float, quantity: int, category: Optional[str], confidence: float) -> Dict[str, Any]:
+    """One ReceiptItemResponse-shaped dict"""
+    return {"name": name, "price": price, "quantity": quantity, "category": category, "confidence": confidence}
+
+def receipt_payload(
+    receipt_data: ReceiptData,
+    validation: Dict[str, Any],
+    processing_time: float = 0.0,
+    placeholders: bool = False,
+    **extra
+) -> Dict[str, Any]:
+    """ReceiptResponse-shaped dict straight from ReceiptData.
+
+    placeholders=True fills undetected store, date and amounts with "Unknown
+    Store", "" and 0, as the hybrid OCR path always has. Without it a receipt
+    missing its store or total is rejected, since ReceiptResponse requires both.
+    """
+    if placeholders:
+        store_name = receipt_data.store_name or "Unknown Store"
+        date = receipt_data.date.isoformat() if receipt_data.date else ""
+        total, subtotal, tax = (float(amount or 0) for amount in (receipt_data.total, receipt_data.subtotal, receipt_data.tax))
+    else:
+        if receipt_data.store_name is None or receipt_data.total is None:
+            raise ValueError("Receipt has no store name or total")
+        store_name = receipt_data.store_name
+        date = receipt_data.date.isoformat() if receipt_data.date else None
+        total, subtotal, tax = receipt_data.total, receipt_data.subtotal, receipt_data.tax
     
-    return blurred
+    return {
+        "store_name": store_name,
+        "date": date,
+        "total": total,
+        "items": [
+            item_payload(item.name, item.price, item.quantity, item.category, item.confidence)
+            for item in receipt_data.items
+        ],
+        "subtotal": subtotal,
+        "tax": tax,
+        "receipt_number": receipt_data.receipt_number,
+        "validation": validation,
+        "processing_time": processing_time,
+        "ai_enhanced": False,
+        "stage_timings": {},
+        "preprocess_profile": None,
+        "hybrid": None,
+        **extra
+    }
 
 def filter_ocr_results(results: List[Dict], min_confidence: float = 0.6) -> List[Dict]:
     """Filter OCR results by confidence and clean up text"""
@@ -281,11 +349,10 @@ def filter_ocr_results(results: List[Dict], min_confidence: float = 0.6) -> List
     
     for result in results:
         if result['confidence'] >= min_confidence:
-            # Clean up text
+            # Clean up text (copy, so callers' and cached results keep the raw text)
             cleaned_text = clean_text(result['text'])
             if cleaned_text and len(cleaned_text.strip()) > 1:
-                result['text'] = cleaned_text
-                filtered_results.append(result)
+                filtered_results.append({**result, 'text': cleaned_text})
     
     # Sort by vertical position (top to bottom)
     filtered_results.sort(key=lambda x: x['bbox'][0][1] if x['bbox'] else 0)
@@ -372,171 +439,210 @@ def validate_receipt_data(receipt_data) -> Dict[str, Any]:
     
     return validation
 
+def queue_full_exception(error: OCRQueueFullError) -> HTTPException:
+    """429 telling the client when the OCR queue is likely to have room again"""
+    logger.warning(f"Rejecting OCR request: {error}")
+    return HTTPException(
+        status_code=429,
+        detail="OCR service is busy, please retry shortly",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def resolve_skip_stages(skip_stages: Optional[str]) -> FrozenSet[str]:
+    """Stages to skip for a request; the request parameter replaces the configured default"""
+    if skip_stages is None:
+        return default_skip_stages()
+    try:
+        return parse_skip_stages(skip_stages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def read_image_upload(file: UploadFile) -> Tuple[bytes, ImageMetadata]:
+    """Read an upload once and probe its header; pixels are decoded once, on the OCR worker"""
+    image_bytes = await file.read()
+    try:
+        return image_bytes, probe_image(image_bytes)
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def describe_upload(file: UploadFile, metadata: Optional[ImageMetadata]) -> str:
+    """Filename and probed header details for failure logs"""
+    file_info = f"filename={getattr(file, 'filename', 'unknown')}"
+    if metadata is None:
+        return file_info
+    return f"{file_info}, image_size=({metadata.width}, {metadata.height}), format={metadata.format}"
+
+async def run_ocr(
+    image_bytes: bytes,
+    skip_stages: Optional[FrozenSet[str]] = None,
+    metadata: Optional[ImageMetadata] = None
+) -> Dict[str, Any]:
+    """OCR an image on the worker pool, reusing cached results for identical uploads.
+
+    Returns the OCR ``results``, the ``preprocess_profile`` they were produced
+    with and the per-stage ``stage_timings`` of this request's job; timings are
+    empty when the results came from the cache.
+    """
+    if skip_stages is None:
+        skip_stages = default_skip_stages()
+    stage_timings = {}
+    
+    async def compute():
+        job = await ocr_pool.run(image_bytes, skip_stages, metadata)
+        stage_timings.update(job['stage_timings'])
+        return {'results': job['results'], 'preprocess_profile': job['preprocess_profile']}
+    
+    cached = await ocr_cache.get_or_compute(
+        image_bytes,
+        compute,
+        fingerprint=preprocessing_fingerprint(skip_stages)
+    )
+    return {**cached, 'stage_timings': stage_timings}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "ocr_available": ocr is not None,
+        # Workers are up and have run the warm-up receipt (or warm-up is disabled)
+        "ocr_available": ocr_pool.running and startup_state["ocr_warm"],
         "parser_available": receipt_parser is not None,
+        "ready": is_ready(),
+        "startup": startup_state,
+        "ocr_pool": ocr_pool.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "correction_dictionary": correction_dictionary.stats() if correction_dictionary else None,
+        "best_price_index": best_price_index.stats() if best_price_index else None,
         "version": "2.0.0"
     }
 
+def is_ready() -> bool:
+    return startup_state["services_ready"] and startup_state["ocr_warm"]
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving, whether or not it is warmed up"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: 503 until services are initialised and the OCR workers have run once"""
+    body = {"ready": is_ready(), **startup_state}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/ocr", response_model=OCRResponse)
-async def process_receipt_ocr(file: UploadFile = File(...)):
+async def process_receipt_ocr(
+    file: UploadFile = File(...),
+    skip_stages: Optional[str] = Query(None, description="Comma-separated preprocessing stages to skip, e.g. denoise,morph")
+):
     """Process receipt image and extract raw OCR text"""
     start_time = time.time()
     
-    if not ocr:
+    if not ocr_pool:
         raise HTTPException(status_code=503, detail="OCR service not available")
     
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    skip = resolve_skip_stages(skip_stages)
+    image_bytes, metadata = await read_image_upload(file)
+    
     try:
-        # Read image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Preprocess image
-        processed_img = preprocess_image(image_bytes)
-        
-        # Perform OCR
-        results = ocr.predict(processed_img)
-        
-        # Parse results (new PaddleOCR structure)
-        ocr_results = []
-        if results and len(results) > 0:
-            res = results[0]
-            texts = res['rec_texts']
-            scores = res['rec_scores']
-            boxes = res['rec_boxes']
-            for text, score, box in zip(texts, scores, boxes):
-                ocr_results.append(OCRResult(
-                    text=text,
-                    bbox=box.tolist() if hasattr(box, 'tolist') else box,
-                    confidence=score
-                ))
+        # Preprocess and OCR on a worker process
+        ocr = await run_ocr(image_bytes, skip, metadata)
+        ocr_results = [
+            {"text": result['text'], "bbox": result['bbox'], "confidence": result['confidence']}
+            for result in ocr['results']
+        ]
         
         processing_time = time.time() - start_time
         
         logger.info(f"Processed image in {processing_time:.2f}s, found {len(ocr_results)} text elements")
         
-        return OCRResponse(
-            results=ocr_results,
-            processing_time=processing_time,
-            image_size={
-                "width": image.width,
-                "height": image.height
-            }
-        )
+        return FastJSONResponse({
+            "results": ocr_results,
+            "processing_time": processing_time,
+            "image_size": {
+                "width": metadata.width,
+                "height": metadata.height
+            },
+            "stage_timings": ocr['stage_timings'],
+            "preprocess_profile": ocr['preprocess_profile']
+        })
         
+    except OCRQueueFullError as e:
+        raise queue_full_exception(e)
     except Exception as e:
-        # Enhanced error logging for OCR failures
-        try:
-            file_info = f"filename={getattr(file, 'filename', 'unknown')}"
-            image_info = ''
-            if 'image_bytes' in locals():
-                try:
-                    img = Image.open(io.BytesIO(image_bytes))
-                    image_info = f", image_size={img.size}, format={img.format}"
-                except Exception:
-                    image_info = ''
-            logger.error(f"OCR FAILURE: {file_info}{image_info}, error={e}")
-        except Exception as log_error:
-            logger.error(f"Failed to log OCR failure details: {log_error}")
+        # Enhanced error logging for OCR failures, from the already-probed header
+        logger.error(f"OCR FAILURE: {describe_upload(file, metadata)}, error={e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
+async def parse_receipt_image(
+    image_bytes: bytes,
+    start_time: float,
+    skip_stages: Optional[FrozenSet[str]] = None,
+    metadata: Optional[ImageMetadata] = None
+) -> Dict[str, Any]:
+    """OCR and parse one receipt image into a ReceiptResponse-shaped dict"""
+    # Preprocess and OCR on a worker process
+    ocr = await run_ocr(image_bytes, skip_stages, metadata)
+    ocr_results = ocr['results']
+    
+    # Filter and clean OCR results
+    filtered_results = filter_ocr_results(ocr_results, min_confidence=0.5)
+    
+    logger.info(f"OCR extracted {len(ocr_results)} text elements, filtered to {len(filtered_results)} high-confidence elements")
+    
+    # Parse receipt data
+    receipt_data = receipt_parser.parse_ocr_results(ocr_results)
+    
+    # Validate receipt
+    validation = validate_receipt_data(receipt_data)
+    
+    processing_time = time.time() - start_time
+    
+    logger.info(f"Parsed receipt in {processing_time:.2f}s, found {len(receipt_data.items)} items")
+    
+    return receipt_payload(
+        receipt_data,
+        validation,
+        processing_time,
+        stage_timings=ocr['stage_timings'],
+        preprocess_profile=ocr['preprocess_profile']
+    )
+
 @app.post("/parse", response_model=ReceiptResponse)
-async def parse_receipt(file: UploadFile = File(...)):
+async def parse_receipt(
+    file: UploadFile = File(...),
+    skip_stages: Optional[str] = Query(None, description="Comma-separated preprocessing stages to skip, e.g. denoise,morph")
+):
     """Process receipt image and return structured data"""
     start_time = time.time()
     
-    if not ocr or not receipt_parser:
+    if not ocr_pool or not receipt_parser:
         raise HTTPException(status_code=503, detail="OCR service not available")
     
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    skip = resolve_skip_stages(skip_stages)
+    image_bytes, metadata = await read_image_upload(file)
+    
     try:
-        # Read image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Preprocess image
-        processed_img = preprocess_image(image_bytes)
-        
-        # Perform OCR
-        results = ocr.predict(processed_img)
-        
-        # Convert to list of dicts for parser (new PaddleOCR structure)
-        ocr_results = []
-        if results and len(results) > 0:
-            res = results[0]
-            texts = res['rec_texts']
-            scores = res['rec_scores']
-            boxes = res['rec_boxes']
-            for text, score, box in zip(texts, scores, boxes):
-                ocr_results.append({
-                    'text': text,
-                    'bbox': box.tolist() if hasattr(box, 'tolist') else box,
-                    'confidence': score
-                })
-        
-        # Filter and clean OCR results
-        filtered_results = filter_ocr_results(ocr_results, min_confidence=0.5)
-        
-        logger.info(f"OCR extracted {len(ocr_results)} text elements, filtered to {len(filtered_results)} high-confidence elements")
-        
-        # Parse receipt data
-        receipt_data = receipt_parser.parse_ocr_results(ocr_results)
-        
-        # Validate receipt
-        validation = validate_receipt_data(receipt_data)
-        
-        processing_time = time.time() - start_time
-        
-        logger.info(f"Parsed receipt in {processing_time:.2f}s, found {len(receipt_data.items)} items")
-        
-        # Convert to response format
-        items_response = [
-            ReceiptItemResponse(
-                name=item.name,
-                price=item.price,
-                quantity=item.quantity,
-                category=item.category,
-                confidence=item.confidence
-            ) for item in receipt_data.items
-        ]
-        
-        return ReceiptResponse(
-            store_name=receipt_data.store_name,
-            date=receipt_data.date.isoformat() if receipt_data.date else None,
-            total=receipt_data.total,
-            items=items_response,
-            subtotal=receipt_data.subtotal,
-            tax=receipt_data.tax,
-            receipt_number=receipt_data.receipt_number,
-            validation=validation,
-            processing_time=processing_time
-        )
+        return FastJSONResponse(await parse_receipt_image(image_bytes, start_time, skip, metadata))
         
+    except OCRQueueFullError as e:
+        raise queue_full_exception(e)
     except Exception as e:
-        # Enhanced error logging for parse failures
-        try:
-            file_info = f"filename={getattr(file, 'filename', 'unknown')}"
-            image_info = ''
-            if 'image_bytes' in locals():
-                try:
-                    img = Image.open(io.BytesIO(image_bytes))
-                    image_info = f", image_size={img.size}, format={img.format}"
-                except Exception:
-                    image_info = ''
-            logger.error(f"PARSE FAILURE: {file_info}{image_info}, error={e}")
-        except Exception as log_error:
-            logger.error(f"Failed to log parse failure details: {log_error}")
+        # Enhanced error logging for parse failures, from the already-probed header
+        logger.error(f"PARSE FAILURE: {describe_upload(file, metadata)}, error={e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 @app.post("/parse/ocr-results")
@@ -549,55 +655,129 @@ async def parse_ocr_results(ocr_results: List[Dict]):
         # Parse receipt data
         receipt_data = receipt_parser.parse_ocr_results(ocr_results)
         
-        # Validate receipt
-        validation = validate_receipt_data(receipt_data)
-        
-        # Convert to response format
-        items_response = [
-            ReceiptItemResponse(
-                name=item.name,
-                price=item.price,
-                quantity=item.quantity,
-                category=item.category,
-                confidence=item.confidence
-            ) for item in receipt_data.items
-        ]
-        
-        return ReceiptResponse(
-            store_name=receipt_data.store_name,
-            date=receipt_data.date.isoformat() if receipt_data.date else None,
-            total=receipt_data.total,
-            items=items_response,
-            subtotal=receipt_data.subtotal,
-            tax=receipt_data.tax,
-            receipt_number=receipt_data.receipt_number,
-            validation=validation,
-            processing_time=0.0
-        )
+        # Validate receipt and convert to response format
+        return FastJSONResponse(receipt_payload(receipt_data, validate_receipt_data(receipt_data)))
         
     except Exception as e:
         logger.error(f"Error parsing OCR results: {e}")
         raise HTTPException(status_code=500, detail=f"Error parsing OCR results: {str(e)}")
 
-@app.post("/ocr/batch")
-async def process_batch(files: List[UploadFile] = File(...)):
-    """Process multiple receipt images"""
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Process pool for large /parse/ocr-results/batch requests, started on first use"""
+    global parse_pool
+    if parse_pool is None:
+        parse_pool = ProcessPoolExecutor(max_workers=PARSE_BATCH_WORKERS)
+        logger.info(f"Parse pool started with {PARSE_BATCH_WORKERS} workers")
+    return parse_pool
+
+@app.post("/parse/ocr-results/batch")
+async def parse_ocr_results_batch(ocr_result_sets: List[List[Dict]]):
+    """Parse many stored OCR result sets in one call; results come back in request order, with throughput stats.
+    
+    Item names from the whole batch are categorised in one vectorised pass.
+    Batches of at least PARSE_BATCH_MIN_POOL receipts are extracted on a
+    process pool. A receipt that cannot be parsed gets an ``error`` entry in
+    its place instead of failing the batch.
+    """
+    if not receipt_parser:
+        raise HTTPException(status_code=503, detail="Receipt parser not available")
+    
+    executor = get_parse_pool() if PARSE_BATCH_WORKERS > 1 and len(ocr_result_sets) >= PARSE_BATCH_MIN_POOL else None
+    started = time.perf_counter()
+    try:
+        # Off the event loop: the categorisation pass and waiting on the pool both block
+        batch = await asyncio.to_thread(receipt_parser.parse_many, ocr_result_sets, executor)
+    except Exception as e:
+        logger.error(f"Error parsing OCR result batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Error parsing OCR results: {str(e)}")
+    
     results = []
+    for index, receipt_data in enumerate(batch.receipts):
+        if receipt_data is None:
+            results.append({"index": index, "error": batch.errors[index]})
+            continue
+        try:
+            results.append(receipt_payload(receipt_data, validate_receipt_data(receipt_data)))
+        except Exception as e:
+            results.append({"index": index, "error": str(e)})
+    
+    seconds = time.perf_counter() - started
+    stats = {
+        **batch.stats,
+        "workers": PARSE_BATCH_WORKERS if executor else 0,
+        # Parsing plus validation and response building
+        "total_seconds": seconds,
+    }
+    logger.info(f"Parsed batch of {len(results)} OCR result sets in {seconds:.2f}s ({stats['failed']} failed)")
+    return FastJSONResponse({"results": results, "stats": stats})
+
+@app.post("/ocr/batch")
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    concurrency: Optional[int] = Query(None, ge=1, description="Maximum receipts from this batch processed at once"),
+    skip_stages: Optional[str] = Query(None, description="Comma-separated preprocessing stages to skip, e.g. denoise,morph")
+):
+    """Process multiple receipt images concurrently, streaming one NDJSON line per receipt as it finishes"""
+    if not ocr_pool or not receipt_parser:
+        raise HTTPException(status_code=503, detail="OCR service not available")
+    
+    skip = resolve_skip_stages(skip_stages)
     
+    # Never let one batch claim more slots than the pool can hold
+    limit = min(concurrency or OCR_BATCH_CONCURRENCY, ocr_pool.capacity)
+    semaphore = asyncio.Semaphore(limit)
+    
+    # Read uploads up front; they are closed once the streaming response starts
+    uploads = []
     for file in files:
+        is_image = bool(file.content_type and file.content_type.startswith('image/'))
+        uploads.append((file.filename, is_image, await file.read() if is_image else None))
+    
+    async def process_item(filename: str, is_image: bool, image_bytes: Optional[bytes]) -> Dict[str, Any]:
+        async with semaphore:
+            start_time = time.time()
+            if not is_image:
+                return {"filename": filename, "error": "File must be an image", "processing_time": 0.0}
+            
+            try:
+                metadata = probe_image(image_bytes)
+            except ImageDecodeError as e:
+                return {"filename": filename, "error": str(e), "processing_time": time.time() - start_time}
+            
+            for attempt in range(BATCH_QUEUE_FULL_RETRIES + 1):
+                try:
+                    result = await parse_receipt_image(image_bytes, start_time, skip, metadata)
+                    return {
+                        "filename": filename,
+                        "result": result,
+                        "processing_time": time.time() - start_time
+                    }
+                except OCRQueueFullError as e:
+                    # Other traffic filled the pool; wait for a slot rather than failing the item
+                    if attempt == BATCH_QUEUE_FULL_RETRIES:
+                        error = str(e)
+                        break
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    logger.error(f"BATCH PARSE FAILURE: filename={filename}, error={e}")
+                    error = str(e)
+                    break
+            
+            return {"filename": filename, "error": error, "processing_time": time.time() - start_time}
+    
+    async def stream_results():
+        tasks = [asyncio.ensure_future(process_item(*upload)) for upload in uploads]
         try:
-            result = await parse_receipt(file)
-            results.append({
-                "filename": file.filename,
-                "result": result
-            })
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield orjson.dumps(item, default=str) + b"\n"
+        finally:
+            # Client went away: stop processing the rest of the batch
+            for task in tasks:
+                task.cancel()
     
-    return {"results": results}
+    logger.info(f"Processing batch of {len(uploads)} receipts with concurrency {limit}")
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 @app.get("/categories")
 async def get_categories():
@@ -741,179 +921,215 @@ async def parse_receipt_with_ai(file: UploadFile = File(...)):
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    image_bytes, _ = await read_image_upload(file)
+    
     try:
-        # Read image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
         # Parse with AI
         ai_result = await openai_service.parse_receipt_with_ai(image_bytes)
         
-        # Convert to response format
-        items = [
-            ReceiptItemResponse(
-                name=item.get('name', ''),
-                price=float(item.get('price', 0)),
-                quantity=int(item.get('quantity', 1)),
-                category=item.get('category'),
-                confidence=1.0
-            )
-            for item in ai_result.items
-        ]
-        
         processing_time = time.time() - start_time
         
-        logger.info(f"AI parsed receipt in {processing_time:.2f}s, found {len(items)} items")
+        logger.info(f"AI parsed receipt in {processing_time:.2f}s, found {len(ai_result.items)} items")
         
-        return AIReceiptResponse(
-            store_name=ai_result.store_name,
-            date=ai_result.date,
-            total=ai_result.total,
-            items=items,
-            subtotal=ai_result.subtotal,
-            tax=ai_result.tax,
-            receipt_number=ai_result.receipt_number,
-            confidence=ai_result.confidence,
-            ai_enhanced=True,
-            processing_time=processing_time
-        )
+        return FastJSONResponse({
+            "store_name": ai_result.store_name,
+            "date": ai_result.date,
+            "total": ai_result.total,
+            "items": ai_items_payload(ai_result.items),
+            "subtotal": ai_result.subtotal,
+            "tax": ai_result.tax,
+            "receipt_number": ai_result.receipt_number,
+            "confidence": ai_result.confidence,
+            "ai_enhanced": True,
+            "processing_time": processing_time
+        })
         
     except Exception as e:
         logger.error(f"Error processing image with AI: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image with AI: {str(e)}")
 
+async def parse_with_ocr(
+    image_bytes: bytes,
+    skip_stages: Optional[FrozenSet[str]] = None,
+    metadata: Optional[ImageMetadata] = None
+) -> ParseOutcome:
+    """Local OCR path: worker OCR, ReceiptParser, validation"""
+    ocr = await run_ocr(image_bytes, skip_stages, metadata)
+    receipt_data = receipt_parser.parse_ocr_results(ocr['results'])
+    return ParseOutcome(receipt=receipt_data, validation=validate_receipt_data(receipt_data), ocr=ocr)
+
+async def parse_with_ai(image_bytes: bytes) -> ParseOutcome:
+    """AI path: vision model parse, validated the same way as OCR output"""
+    ai_result = await openai_service.parse_receipt_with_ai(image_bytes)
+    return ParseOutcome(receipt=ai_result, validation=validate_receipt_data(ai_result))
+
+async def parse_with_ai_trusted(image_bytes: bytes) -> ParseOutcome:
+    """AI path for ai-first: valid, with the model's own confidence, as that mode has always reported it"""
+    ai_result = await openai_service.parse_receipt_with_ai(image_bytes)
+    return ParseOutcome(receipt=ai_result, validation={
+        "is_valid": True,
+        "confidence_score": ai_result.confidence,
+        "warnings": [],
+        "errors": []
+    })
+
+def ai_items_payload(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ReceiptItemResponse-shaped dicts for the AI parser's items"""
+    return [
+        item_payload(item.get('name', ''), float(item.get('price', 0)), int(item.get('quantity', 1)), item.get('category'), 1.0)
+        for item in items
+    ]
+
+def ai_receipt_response(ai_result, validation: Dict[str, Any], processing_time: float, **extra) -> FastJSONResponse:
+    """ReceiptResponse body for a result from the AI path"""
+    return FastJSONResponse({
+        "store_name": ai_result.store_name,
+        "date": ai_result.date,
+        "total": ai_result.total,
+        "items": ai_items_payload(ai_result.items),
+        "subtotal": ai_result.subtotal,
+        "tax": ai_result.tax,
+        "receipt_number": ai_result.receipt_number,
+        "validation": validation,
+        "processing_time": processing_time,
+        "ai_enhanced": True,
+        "stage_timings": {},
+        "preprocess_profile": None,
+        "hybrid": None,
+        **extra
+    })
+
+def ocr_receipt_response(outcome: ParseOutcome, processing_time: float, **extra) -> FastJSONResponse:
+    """ReceiptResponse body for a result from the OCR path, with placeholders for undetected fields"""
+    return FastJSONResponse(receipt_payload(
+        outcome.receipt,
+        outcome.validation,
+        processing_time,
+        placeholders=True,
+        stage_timings=outcome.ocr['stage_timings'],
+        preprocess_profile=outcome.ocr['preprocess_profile'],
+        **extra
+    ))
+
 @app.post("/parse-hybrid", response_model=ReceiptResponse)
-async def parse_receipt_hybrid(file: UploadFile = File(...)):
-    """Parse receipt using AI first, fallback to OCR if needed"""
+async def parse_receipt_hybrid(
+    file: UploadFile = File(...),
+    skip_stages: Optional[str] = Query(None, description="Comma-separated preprocessing stages to skip, e.g. denoise,morph"),
+    mode: Optional[str] = Query(None, description="race, ai-first or ocr-first; defaults to HYBRID_MODE")
+):
+    """Parse receipt with both AI and OCR: racing them, falling back from AI to OCR, or escalating from OCR to AI"""
     start_time = time.time()
     
-    if not openai_service or not ocr or not receipt_parser:
+    mode = mode or HYBRID_MODE
+    if mode not in HYBRID_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown hybrid mode '{mode}', expected one of: {', '.join(HYBRID_MODES)}")
+    
+    # ocr-first still answers (without escalation) when the AI service is down
+    if not ocr_pool or not receipt_parser or (not openai_service and mode != "ocr-first"):
         raise HTTPException(status_code=503, detail="Services not available")
     
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    skip = resolve_skip_stages(skip_stages)
+    image_bytes, metadata = await read_image_upload(file)
+    
     try:
-        # Read image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Try AI first
-        try:
-            ai_result = await openai_service.parse_receipt_with_ai(image_bytes)
-            
-            # Convert to response format
-            items = [
-                ReceiptItemResponse(
-                    name=item.get('name', ''),
-                    price=float(item.get('price', 0)),
-                    quantity=int(item.get('quantity', 1)),
-                    category=item.get('category'),
-                    confidence=1.0
-                )
-                for item in ai_result.items
-            ]
-            
+        if mode == "race":
+            # OCR is listed first so its error (e.g. queue full) wins when both paths fail
+            race = await race_parsers(
+                {"ocr": lambda: parse_with_ocr(image_bytes, skip, metadata), "ai": lambda: parse_with_ai(image_bytes)},
+                {"ocr": HYBRID_OCR_TIMEOUT, "ai": HYBRID_AI_TIMEOUT}
+            )
             processing_time = time.time() - start_time
+            hybrid = {"mode": mode, "winner": race.winner, "paths": race.paths}
+            logger.info(f"Hybrid race won by {race.winner} in {processing_time:.2f}s: {race.paths}")
             
-            logger.info(f"AI parsing successful in {processing_time:.2f}s")
+            metrics.HYBRID_SECONDS.labels(mode=mode, path=race.winner).observe(processing_time)
             
-            return ReceiptResponse(
-                store_name=ai_result.store_name,
-                date=ai_result.date,
-                total=ai_result.total,
-                items=items,
-                subtotal=ai_result.subtotal,
-                tax=ai_result.tax,
-                receipt_number=ai_result.receipt_number,
-                validation={
-                    "is_valid": True,
-                    "confidence_score": ai_result.confidence,
-                    "warnings": [],
-                    "errors": []
-                },
-                processing_time=processing_time,
-                ai_enhanced=True
+            if race.winner == "ai":
+                return ai_receipt_response(race.outcome.receipt, race.outcome.validation, processing_time, hybrid=hybrid)
+            return ocr_receipt_response(race.outcome, processing_time, hybrid=hybrid)
+        
+        if mode == "ocr-first":
+            result, decision = await ocr_first(
+                lambda: parse_with_ocr(image_bytes, skip, metadata),
+                (lambda: parse_with_ai(image_bytes)) if openai_service else None,
+                receipt_parser.validate_receipt
             )
-            
-        except Exception as ai_error:
-            logger.warn(f"AI parsing failed, using OCR fallback: {ai_error}")
-            
-            # Fallback to OCR
-            processed_img = preprocess_image(image_bytes)
-            results = ocr.predict(processed_img)
-            
-            # Convert to list of dicts for parser
-            ocr_results = []
-            if results and len(results) > 0:
-                res = results[0]
-                texts = res['rec_texts']
-                scores = res['rec_scores']
-                boxes = res['rec_boxes']
-                for text, score, box in zip(texts, scores, boxes):
-                    ocr_results.append({
-                        'text': text,
-                        'bbox': box.tolist() if hasattr(box, 'tolist') else box,
-                        'confidence': score
-                    })
-            
-            # Filter and clean OCR results
-            filtered_results = filter_ocr_results(ocr_results, min_confidence=0.5)
-            
-            # Parse receipt data
-            receipt_data = receipt_parser.parse_ocr_results(ocr_results)
-            
-            # Validate receipt
-            validation = validate_receipt_data(receipt_data)
-            
             processing_time = time.time() - start_time
+            hybrid = {
+                "mode": mode,
+                "winner": result.winner,
+                "paths": result.paths,
+                "escalated": decision.escalate,
+                "escalation_reasons": decision.reasons
+            }
+            logger.info(f"OCR-first parse returned {result.winner} in {processing_time:.2f}s, escalation reasons: {decision.reasons}")
+            metrics.HYBRID_SECONDS.labels(mode=mode, path=result.winner).observe(processing_time)
             
-            logger.info(f"OCR fallback successful in {processing_time:.2f}s")
-            
-            return ReceiptResponse(
-                store_name=receipt_data.store_name or "Unknown Store",
-                date=receipt_data.date.isoformat() if receipt_data.date else "",
-                total=float(receipt_data.total or 0),
-                items=[
-                    ReceiptItemResponse(
-                        name=item.name,
-                        price=float(item.price),
-                        quantity=item.quantity,
-                        category=item.category,
-                        confidence=item.confidence
-                    )
-                    for item in receipt_data.items
-                ],
-                subtotal=float(receipt_data.subtotal or 0),
-                tax=float(receipt_data.tax or 0),
-                receipt_number=receipt_data.receipt_number,
-                validation=validation,
-                processing_time=processing_time,
-                ai_enhanced=False
-            )
+            if result.winner == "ai":
+                return ai_receipt_response(result.outcome.receipt, result.outcome.validation, processing_time, hybrid=hybrid)
+            return ocr_receipt_response(result.outcome, processing_time, hybrid=hybrid)
+        
+        # AI first, OCR only if the AI call fails
+        result = await ai_first(
+            lambda: parse_with_ai_trusted(image_bytes),
+            lambda: parse_with_ocr(image_bytes, skip, metadata)
+        )
+        processing_time = time.time() - start_time
+        hybrid = {"mode": mode, "winner": result.winner, "paths": result.paths}
+        logger.info(f"AI-first parse returned {result.winner} in {processing_time:.2f}s")
+        metrics.HYBRID_SECONDS.labels(mode=mode, path=result.winner).observe(processing_time)
         
+        if result.winner == "ai":
+            return ai_receipt_response(result.outcome.receipt, result.outcome.validation, processing_time, hybrid=hybrid)
+        return ocr_receipt_response(result.outcome, processing_time, hybrid=hybrid)
+        
+    except OCRQueueFullError as e:
+        raise queue_full_exception(e)
     except Exception as e:
         logger.error(f"Error in hybrid parsing: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 @app.post("/normalize-products")
 async def normalize_products(products: List[str]):
-    """Normalize product names for cross-store comparison"""
-    if not openai_service:
+    """Normalize product names for cross-store comparison; names users have corrected skip the AI call"""
+    corrected = {}
+    if correction_dictionary is not None:
+        for product in products:
+            entry = correction_dictionary.lookup(product)
+            if entry:
+                corrected[product] = entry
+    remaining = [product for product in products if product not in corrected]
+    
+    if remaining and not openai_service:
         raise HTTPException(status_code=503, detail="AI service not available")
     
     try:
-        normalized = await openai_service.normalize_products(products)
+        normalized = await openai_service.normalize_products(remaining) if remaining else []
         return {
             "normalized_products": [
+                {
+                    "original": product,
+                    "normalized": entry.name,
+                    "brand": None,
+                    "size": None,
+                    "category": entry.category,
+                    "confidence": 1.0,
+                    "source": "corrections"
+                }
+                for product, entry in corrected.items()
+            ] + [
                 {
                     "original": item.original,
                     "normalized": item.normalized,
                     "brand": item.brand,
                     "size": item.size,
                     "category": item.category,
-                    "confidence": item.confidence
+                    "confidence": item.confidence,
+                    "source": "ai"
                 }
                 for item in normalized
             ]
@@ -981,6 +1197,7 @@ async def submit_receipt_corrections(receipt_id: str, corrections: dict = Body(.
         return {"success": False, "error": "Missing user_id or items"}
     confirmed_count = sum(1 for item in items if item.get("confirmed"))
     try:
+        import asyncpg
         pool = await asyncpg.create_pool(DATABASE_URL)
         async with pool.acquire() as conn:
             for item in items:
@@ -1036,11 +1253,19 @@ async def submit_receipt_corrections(receipt_id: str, corrections: dict = Body(.
                 new_xp = None
         await pool.close()
         logger.info(f"Corrections stored for receipt {receipt_id} by user {user_id}")
+        if confirmed_count > 0 and correction_dictionary is not None:
+            # Picks up just the rows stored above, so the next receipt already uses them
+            task = asyncio.create_task(refresh_corrections())
+            correction_reload_tasks.add(task)
+            task.add_done_callback(correction_reload_tasks.discard)
         return {"success": True, "xp": new_xp}
     except Exception as e:
         logger.error(f"Failed to store corrections: {e}")
         return {"success": False, "error": str(e)}
 
+startup_state["import_seconds"] = round(time.perf_counter() - _import_started, 3)
+logger.info(f"main imported in {startup_state['import_seconds']:.2f}s")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
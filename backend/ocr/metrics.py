@@ -0,0 +1,112 @@
+"""
+Service Metrics
+Prometheus collectors exposed on /metrics for the OCR service
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# OCR worker pool
+OCR_QUEUE_DEPTH = Gauge(
+    'ocr_queue_depth',
+    'OCR jobs waiting for a free worker'
+)
+OCR_WORKERS_BUSY = Gauge(
+    'ocr_workers_busy',
+    'OCR worker processes currently running a job'
+)
+OCR_WORKER_UTILISATION = Gauge(
+    'ocr_worker_utilisation',
+    'Fraction of OCR worker processes currently busy'
+)
+OCR_QUEUE_WAIT_SECONDS = Histogram(
+    'ocr_queue_wait_seconds',
+    'Time an OCR job waited before a worker picked it up',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+OCR_JOB_SECONDS = Histogram(
+    'ocr_job_seconds',
+    'Time a worker spent preprocessing and recognising one image',
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30)
+)
+OCR_STAGE_SECONDS = Histogram(
+    'ocr_stage_seconds',
+    'Time an OCR job spent in each preprocessing stage and in inference',
+    ['stage'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+OCR_PREPROCESS_PROFILES = Counter(
+    'ocr_preprocess_profile_total',
+    'OCR jobs by the preprocessing profile the quality classifier chose',
+    ['profile']
+)
+OCR_PREPROCESS_SECONDS_SAVED = Counter(
+    'ocr_preprocess_seconds_saved_total',
+    'Estimated CPU seconds not spent on stages skipped by the preprocessing profile',
+    ['profile']
+)
+OCR_TILED_JOBS = Counter(
+    'ocr_tiled_jobs_total',
+    'Tall images recognised as overlapping strips across several workers'
+)
+OCR_JOBS_REJECTED = Counter(
+    'ocr_jobs_rejected_total',
+    'OCR jobs rejected with 429 because the queue was full'
+)
+
+# /parse-hybrid
+HYBRID_PATH_SECONDS = Histogram(
+    'hybrid_parse_path_seconds',
+    'Time each /parse-hybrid path ran, by how it ended (won, lost, rejected, fallback, failed, timeout, cancelled)',
+    ['path', 'outcome'],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+)
+HYBRID_WINS = Counter(
+    'hybrid_parse_wins_total',
+    '/parse-hybrid responses by mode and the path whose result was returned',
+    ['mode', 'path']
+)
+HYBRID_REQUESTS = Counter(
+    'hybrid_parse_requests_total',
+    '/parse-hybrid requests by mode and whether a second path ran (ocr-first: AI escalation, ai-first: OCR fallback; race: always false)',
+    ['mode', 'escalated']
+)
+HYBRID_ESCALATIONS = Counter(
+    'hybrid_parse_escalations_total',
+    'Reasons ocr-first /parse-hybrid requests were escalated to the AI parser',
+    ['reason']
+)
+HYBRID_SECONDS = Histogram(
+    'hybrid_parse_seconds',
+    'End-to-end /parse-hybrid latency by mode and the path whose result was returned',
+    ['mode', 'path'],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+)
+
+# OCR result cache
+OCR_CACHE_REQUESTS = Counter(
+    'ocr_cache_requests_total',
+    'OCR result cache lookups by outcome',
+    ['outcome']
+)
+
+# Correction-learned item dictionary
+CORRECTION_DICTIONARY_LOOKUPS = Counter(
+    'correction_dictionary_lookups_total',
+    'Parsed item names looked up in the correction dictionary, by outcome',
+    ['outcome']
+)
+CORRECTION_DICTIONARY_ENTRIES = Gauge(
+    'correction_dictionary_entries',
+    'Raw item names with a confirmed correction in memory'
+)
+
+# In-memory best price index
+BEST_PRICE_INDEX_LOOKUPS = Counter(
+    'best_price_index_lookups_total',
+    'Basket items looked up in the best price index, by outcome (hit, miss or cold)',
+    ['outcome']
+)
+BEST_PRICE_INDEX_ENTRIES = Gauge(
+    'best_price_index_entries',
+    'Normalized item names with a 30-day best price in memory'
+)
@@ -18,6 +18,7 @@ import asyncpg
 import os
 import argparse
 import logging
+from item_names import normalize_item_name
 
 logger = logging.getLogger(__name__)
 
@@ -339,8 +340,8 @@ class NewWorldScraper:
             # Upsert price history
             await conn.executemany(
                 """
-                INSERT INTO price_history (store_id, item_name, price, date, source, confidence_score, volume_size, image_url)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                INSERT INTO price_history (store_id, item_name, normalized_name, price, date, source, confidence_score, volume_size, image_url)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                 ON CONFLICT (store_id, item_name, date, source)
                 DO UPDATE SET
                     price = EXCLUDED.price,
@@ -352,6 +353,7 @@ class NewWorldScraper:
                     (
                         code_to_uuid.get(p.store_id, p.store_id),
                         p.item_name,
+                        normalize_item_name(p.item_name),
                         p.price,
                         p.date.date(),
                         "enhanced_scraper",
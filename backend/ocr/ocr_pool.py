@@ -0,0 +1,351 @@
+"""
+OCR Worker Pool
+Runs preprocessing and PaddleOCR inference in worker processes behind a bounded
+job queue, so the API event loop only awaits results
+"""
+
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+import numpy as np
+from loguru import logger
+
+import metrics
+from image_ingest import ImageMetadata
+from image_preprocessing import default_skip_stages, run_pipeline
+from ocr_tiling import merge_strip_predictions, plan_strips
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "16"))
+
+class OCRQueueFullError(Exception):
+    """Raised when every worker is busy and the job queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"OCR queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+# Mock OCR class for when PaddleOCR is not available
+class MockOCR:
+    def __init__(self):
+        self.mock_results = [
+            {"text": "STORE NAME", "bbox": [[10, 10, 100, 30]], "confidence": 0.9},
+            {"text": "TOTAL: $25.50", "bbox": [[10, 200, 150, 220]], "confidence": 0.95},
+            {"text": "MILK $4.50", "bbox": [[10, 50, 100, 70]], "confidence": 0.8},
+            {"text": "BREAD $3.00", "bbox": [[10, 80, 100, 100]], "confidence": 0.8},
+            {"text": "EGGS $5.00", "bbox": [[10, 110, 100, 130]], "confidence": 0.8},
+        ]
+
+    def predict(self, img):
+        return [{
+            'rec_texts': [r['text'] for r in self.mock_results],
+            'rec_scores': [r['confidence'] for r in self.mock_results],
+            'rec_boxes': [r['bbox'] for r in self.mock_results],
+        }]
+
+def create_ocr_engine():
+    """Build the OCR engine used inside a worker process"""
+    try:
+        from paddleocr import PaddleOCR
+        engine = PaddleOCR(use_angle_cls=True, lang='en')
+        logger.info(f"PaddleOCR initialized in worker {os.getpid()}")
+        return engine
+    except ImportError:
+        logger.warning("PaddleOCR not available, using mock OCR service")
+    except Exception as e:
+        logger.error(f"Failed to initialize PaddleOCR: {e}")
+    return MockOCR()
+
+def ocr_results_from_prediction(results) -> List[Dict]:
+    """Convert a PaddleOCR predict() result into the text/bbox/confidence dicts the parser expects"""
+    ocr_results = []
+    if results and len(results) > 0:
+        res = results[0]
+        # Quads keep the text's rotation, which row grouping uses to correct skew
+        boxes = res['rec_polys'] if 'rec_polys' in res else res['rec_boxes']
+        for text, score, box in zip(res['rec_texts'], res['rec_scores'], boxes):
+            ocr_results.append({
+                'text': text,
+                'bbox': box.tolist() if hasattr(box, 'tolist') else box,
+                'confidence': float(score)
+            })
+    return ocr_results
+
+# Per-process engine, created once by the pool initializer
+_engine = None
+
+def _init_worker(engine_factory: Callable[[], Any]):
+    global _engine
+    _engine = engine_factory()
+
+def _run_ocr_job(
+    image_bytes: bytes,
+    submitted_at: float,
+    skip_stages: FrozenSet[str],
+    metadata: Optional[ImageMetadata],
+) -> Dict[str, Any]:
+    """Worker entry point: preprocess and recognise one image.
+
+    Tall images come back preprocessed but unrecognised, with ``strips`` set,
+    so the pool can recognise the strips on several workers at once.
+    """
+    started_at = time.time()
+    pipeline = run_pipeline(image_bytes, skip_stages, metadata=metadata)
+    job = {
+        'results': [],
+        'stage_timings': pipeline.stage_timings,
+        'preprocess_profile': pipeline.profile,
+        'profile_skipped': pipeline.profile_skipped,
+        'megapixels': pipeline.megapixels,
+        'queue_wait': max(0.0, started_at - submitted_at),
+    }
+
+    strips = plan_strips(*pipeline.image.shape[:2])
+    if len(strips) > 1:
+        job['strips'] = strips
+        job['image'] = pipeline.image
+    else:
+        ocr_start = time.perf_counter()
+        job['results'] = ocr_results_from_prediction(_engine.predict(pipeline.image))
+        job['stage_timings']['ocr'] = time.perf_counter() - ocr_start
+
+    job['run_time'] = time.time() - started_at
+    return job
+
+def _run_strip_job(strip: np.ndarray, submitted_at: float) -> Dict[str, Any]:
+    """Worker entry point: recognise one strip of a tall image"""
+    started_at = time.time()
+    results = _engine.predict(strip)
+    # Plain lists only; the engine's result objects are not guaranteed to pickle
+    res = results[0] if results else {}
+    prediction = {key: list(res.get(key, [])) for key in ('rec_texts', 'rec_scores', 'rec_boxes')}
+    if 'rec_polys' in res:
+        # Quads keep the text's rotation; merge_strip_predictions handles either box shape
+        prediction['rec_boxes'] = list(res['rec_polys'])
+    return {
+        'prediction': prediction,
+        'queue_wait': max(0.0, started_at - submitted_at),
+        'run_time': time.time() - started_at,
+    }
+
+class OCRWorkerPool:
+    """Fixed pool of OCR worker processes with admission control.
+
+    At most ``workers`` jobs run at once and at most ``queue_size`` more wait
+    for a worker. Anything beyond that is rejected with OCRQueueFullError
+    instead of adding latency for everyone already queued.
+    """
+
+    def __init__(
+        self,
+        workers: int = OCR_WORKERS,
+        queue_size: int = OCR_QUEUE_SIZE,
+        engine_factory: Callable[[], Any] = create_ocr_engine,
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.engine_factory = engine_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Set when a job fails with BrokenProcessPool (a worker died); cleared when the executor is replaced
+        self._broken = False
+        self._inflight = 0
+        self._avg_job_seconds = 2.0  # Seed for Retry-After until real jobs complete
+        self._avg_queue_wait = 0.0
+        self._busy_seconds = 0.0
+        self._jobs_completed = 0
+        self._jobs_rejected = 0
+        self._started_at = time.time()
+        # Observed seconds per megapixel of each stage, to price the stages a profile skips
+        self._stage_seconds_per_mp: Dict[str, float] = {}
+        self._profile_counts: Dict[str, int] = {}
+        self._preprocess_seconds_saved = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def busy_workers(self) -> int:
+        return min(self._inflight, self.workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._inflight - self.workers)
+
+    @property
+    def running(self) -> bool:
+        """Started and not broken by a worker dying; the next job restarts a broken pool"""
+        return self._executor is not None and not self._broken
+
+    def start(self):
+        """Spawn the worker processes (idempotent)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.engine_factory,),
+            )
+            self._broken = False
+            self._started_at = time.time()
+            logger.info(f"OCR worker pool started with {self.workers} workers, queue size {self.queue_size}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("OCR worker pool shut down")
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        return max(1, math.ceil(self._avg_job_seconds * (self.queue_depth + 1) / self.workers))
+
+    async def run(
+        self,
+        image_bytes: bytes,
+        skip_stages: Optional[FrozenSet[str]] = None,
+        metadata: Optional[ImageMetadata] = None,
+    ) -> Dict[str, Any]:
+        """Preprocess and OCR an image on a worker.
+
+        Only the encoded bytes (and the already-probed header metadata) cross
+        the process boundary; the worker decodes them once.
+
+        Returns the job dict: ``results`` (text/bbox/confidence dicts),
+        ``stage_timings`` (seconds per pipeline stage plus ``ocr``),
+        ``preprocess_profile``, ``queue_wait`` and ``run_time``.
+        """
+        if skip_stages is None:
+            skip_stages = default_skip_stages()
+        if self._inflight >= self.capacity:
+            self._jobs_rejected += 1
+            metrics.OCR_JOBS_REJECTED.inc()
+            raise OCRQueueFullError(self.retry_after())
+
+        job = await self._submit(_run_ocr_job, image_bytes, time.time(), skip_stages, metadata)
+        if 'strips' in job:
+            await self._recognise_strips(job)
+        return job
+
+    async def _recognise_strips(self, job: Dict[str, Any]):
+        """Recognise the strips of a tall image in parallel and merge them into job['results'].
+
+        Strip jobs belong to an already admitted request, so they are never
+        rejected: turning one away would fail a request whose OCR is half done.
+        They still count as in flight, so new requests see the extra load and
+        are rejected sooner. In-flight jobs can therefore exceed ``capacity``,
+        by at most the strips of the requests already admitted.
+        """
+        image = job.pop('image')
+        strips = job.pop('strips')
+        start = time.perf_counter()
+        strip_jobs = await asyncio.gather(*[
+            self._submit(_run_strip_job, image[top:bottom], time.time()) for top, bottom in strips
+        ])
+        merged = merge_strip_predictions(strips, [strip_job['prediction'] for strip_job in strip_jobs])
+        job['results'] = ocr_results_from_prediction([merged])
+        job['stage_timings']['ocr'] = time.perf_counter() - start
+        job['strip_count'] = len(strips)
+        metrics.OCR_STAGE_SECONDS.labels(stage='ocr').observe(job['stage_timings']['ocr'])
+        metrics.OCR_TILED_JOBS.inc()
+
+    def _submit(self, fn: Callable[..., Dict[str, Any]], *args) -> asyncio.Future:
+        """Run fn on a worker, holding a slot until the worker finishes"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        if self._broken:
+            self._restart()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._restart()
+            future = self._executor.submit(fn, *args)
+
+        # Release the slot when the worker actually finishes, even if the
+        # request awaiting it was cancelled in the meantime
+        self._inflight += 1
+        self._update_gauges()
+        executor = self._executor
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f, executor))
+
+        return asyncio.wrap_future(future)
+
+    def _restart(self):
+        logger.error("OCR worker pool is broken, restarting")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.start()
+
+    def _release(self, future, executor: Optional[ProcessPoolExecutor] = None):
+        self._inflight -= 1
+        self._update_gauges()
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # Jobs of an executor that has already been replaced say nothing about the current one
+            if isinstance(future.exception(), BrokenProcessPool) and executor is self._executor:
+                self._broken = True
+            return
+
+        job = future.result()
+        self._busy_seconds += job['run_time']
+        # Exponential moving averages keep Retry-After responsive to load
+        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * job['run_time']
+        self._avg_queue_wait = 0.8 * self._avg_queue_wait + 0.2 * job['queue_wait']
+        metrics.OCR_QUEUE_WAIT_SECONDS.observe(job['queue_wait'])
+        metrics.OCR_JOB_SECONDS.observe(job['run_time'])
+        if 'stage_timings' not in job:
+            # Strip job; the image it belongs to is counted once, below
+            return
+
+        self._jobs_completed += 1
+        for stage, seconds in job['stage_timings'].items():
+            metrics.OCR_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        self._record_profile(job)
+
+    def _record_profile(self, job: Dict[str, Any]):
+        """Count the chosen profile and estimate the CPU time its skipped stages would have cost"""
+        profile = job['preprocess_profile']
+        megapixels = job['megapixels']
+        self._profile_counts[profile] = self._profile_counts.get(profile, 0) + 1
+        metrics.OCR_PREPROCESS_PROFILES.labels(profile=profile).inc()
+        if megapixels <= 0:
+            return
+
+        for stage, seconds in job['stage_timings'].items():
+            cost = seconds / megapixels
+            previous = self._stage_seconds_per_mp.get(stage)
+            self._stage_seconds_per_mp[stage] = cost if previous is None else 0.8 * previous + 0.2 * cost
+
+        saved = sum(self._stage_seconds_per_mp.get(stage, 0.0) * megapixels for stage in job['profile_skipped'])
+        if saved > 0:
+            self._preprocess_seconds_saved += saved
+            metrics.OCR_PREPROCESS_SECONDS_SAVED.labels(profile=profile).inc(saved)
+
+    def _update_gauges(self):
+        metrics.OCR_QUEUE_DEPTH.set(self.queue_depth)
+        metrics.OCR_WORKERS_BUSY.set(self.busy_workers)
+        metrics.OCR_WORKER_UTILISATION.set(self.busy_workers / self.workers)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, wait time and worker utilisation"""
+        uptime = max(time.time() - self._started_at, 1e-6)
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'inflight': self._inflight,
+            'queue_depth': self.queue_depth,
+            'busy_workers': self.busy_workers,
+            'utilisation': round(self.busy_workers / self.workers, 3),
+            'utilisation_since_start': round(min(1.0, self._busy_seconds / (uptime * self.workers)), 3),
+            'avg_queue_wait': round(self._avg_queue_wait, 4),
+            'avg_job_seconds': round(self._avg_job_seconds, 4),
+            'jobs_completed': self._jobs_completed,
+            'jobs_rejected': self._jobs_rejected,
+            'preprocess_profiles': dict(self._profile_counts),
+            'preprocess_seconds_saved': round(self._preprocess_seconds_saved, 3),
+        }
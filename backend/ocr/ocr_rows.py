@@ -0,0 +1,116 @@
+"""
+OCR Row Reconstruction
+Groups OCR boxes into the visual rows of the receipt, so an item name and its
+price recognised as separate boxes reach the parser as one line
+"""
+
+import os
+from dataclasses import dataclass
+from statistics import median
+from typing import Any, Dict, List, Optional, Sequence
+
+# Boxes whose deskewed centres are within this many text heights share a row
+OCR_ROW_TOLERANCE = float(os.getenv("OCR_ROW_TOLERANCE", "0.5"))
+# Gaps wider than this many text heights are kept as a column break (two spaces)
+COLUMN_GAP = 1.0
+# Per-box slopes (rise over run) beyond this are treated as noise, not skew
+MAX_SKEW = 0.25
+
+@dataclass
+class _Box:
+    result: Dict[str, Any]
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    # Baseline slope from the box corners; None for axis-aligned boxes
+    slope: Optional[float] = None
+
+    @property
+    def cx(self) -> float:
+        return (self.x1 + self.x2) / 2
+
+    @property
+    def cy(self) -> float:
+        return (self.y1 + self.y2) / 2
+
+def _flatten(bbox: Any) -> List[float]:
+    flat = []
+    for value in bbox:
+        if isinstance(value, (list, tuple)):
+            flat.extend(value)
+        else:
+            flat.append(value)
+    return flat
+
+def _box(result: Dict[str, Any]) -> Optional[_Box]:
+    """Box geometry from [x1, y1, x2, y2], [[x1, y1, x2, y2]] or corner points (clockwise from top-left)"""
+    bbox = result.get('bbox')
+    if not bbox:
+        return None
+    flat = _flatten(bbox)
+    if len(flat) == 4:
+        return _Box(result, flat[0], flat[1], flat[2], flat[3])
+    if len(flat) < 8 or len(flat) % 2:
+        return None
+
+    xs, ys = flat[0::2], flat[1::2]
+    box = _Box(result, min(xs), min(ys), max(xs), max(ys))
+    if len(xs) == 4:
+        # Mid-points of the left (top-left, bottom-left) and right (top-right, bottom-right) edges
+        run = (xs[1] + xs[2] - xs[0] - xs[3]) / 2
+        rise = (ys[1] + ys[2] - ys[0] - ys[3]) / 2
+        if run > 0 and abs(rise / run) <= MAX_SKEW:
+            box.slope = rise / run
+    return box
+
+def _row_result(row: List[_Box], text_height: float) -> Dict[str, Any]:
+    """One OCR result for a row: texts left to right, box covering the row, weakest confidence"""
+    if len(row) == 1:
+        return row[0].result
+    row.sort(key=lambda b: b.x1)
+    parts = [row[0].result['text'].strip()]
+    for previous, box in zip(row, row[1:]):
+        # Wide gaps are column breaks, which the parser reads as receipt layout
+        parts.append('  ' if box.x1 - previous.x2 > COLUMN_GAP * text_height else ' ')
+        parts.append(box.result['text'].strip())
+
+    x1, y1 = min(b.x1 for b in row), min(b.y1 for b in row)
+    x2, y2 = max(b.x2 for b in row), max(b.y2 for b in row)
+    return {
+        'text': ''.join(parts),
+        'bbox': [[x1, y1], [x2, y1], [x2, y2], [x1, y2]],
+        'confidence': min(b.result.get('confidence', 0.0) for b in row),
+    }
+
+def group_rows(ocr_results: Sequence[Dict[str, Any]], tolerance: float = OCR_ROW_TOLERANCE) -> List[Dict[str, Any]]:
+    """Merge OCR results into visual rows, top to bottom and left to right within a row.
+
+    The receipt's skew is the median baseline slope of the boxes that have
+    corners. Each box is keyed by where its centre's baseline meets x = 0, so
+    boxes on one printed line share a key even when the photo is rotated. One
+    sort plus one sweep over the keys groups the rows: O(n log n). Results
+    without usable boxes are returned unchanged.
+    """
+    boxes = [_box(result) for result in ocr_results]
+    if len(boxes) < 2 or any(box is None for box in boxes):
+        return list(ocr_results)
+
+    text_height = max(1.0, median(box.y2 - box.y1 for box in boxes))
+    slopes = [box.slope for box in boxes if box.slope is not None]
+    skew = median(slopes) if slopes else 0.0
+    max_gap = tolerance * text_height
+
+    keyed = sorted(((box.cy - skew * box.cx, box) for box in boxes), key=lambda kb: kb[0])
+    rows: List[List[_Box]] = []
+    row_key = None
+    for key, box in keyed:
+        if rows and key - row_key <= max_gap:
+            rows[-1].append(box)
+            # Running mean, so a long row does not drift with its first box
+            row_key += (key - row_key) / len(rows[-1])
+        else:
+            rows.append([box])
+            row_key = key
+
+    return [_row_result(row, text_height) for row in rows]
@@ -0,0 +1,97 @@
+"""
+OCR Tiling
+Splits tall receipts into overlapping horizontal strips and merges the
+per-strip OCR output back into one prediction
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Images taller than this many widths are tiled; 0 disables tiling
+OCR_TILE_MIN_ASPECT = float(os.getenv("OCR_TILE_MIN_ASPECT", "3.0"))
+# Each strip is about this many widths tall, so the detector sees text at a usable size
+OCR_TILE_ASPECT = float(os.getenv("OCR_TILE_ASPECT", "1.5"))
+# Rows shared by neighbouring strips; must exceed the tallest text line
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "128"))
+
+# Boxes from neighbouring strips overlapping more than this are the same text
+_DUPLICATE_IOU = 0.5
+
+def plan_strips(
+    height: int,
+    width: int,
+    min_aspect: float = OCR_TILE_MIN_ASPECT,
+    strip_aspect: float = OCR_TILE_ASPECT,
+    overlap: int = OCR_TILE_OVERLAP,
+) -> List[Tuple[int, int]]:
+    """Row ranges (start, end) of evenly sized overlapping strips; one range when not tall enough"""
+    if not min_aspect or height < width * min_aspect:
+        return [(0, height)]
+
+    target = max(int(width * strip_aspect), overlap * 3)
+    count = max(1, math.ceil((height - overlap) / (target - overlap)))
+    # Spread the rows evenly instead of leaving a sliver for the last strip
+    strip_height = math.ceil((height + (count - 1) * overlap) / count)
+    strips = []
+    for i in range(count):
+        start = i * (strip_height - overlap)
+        strips.append((start, min(height, start + strip_height)))
+    return strips
+
+def box_bounds(box: Any) -> Tuple[float, float, float, float]:
+    """(x1, y1, x2, y2) of a box given as [x1, y1, x2, y2], [[x1, y1, x2, y2]] or corner points"""
+    points = np.asarray(box, dtype=np.float32).reshape(-1, 2)
+    return (float(points[:, 0].min()), float(points[:, 1].min()), float(points[:, 0].max()), float(points[:, 1].max()))
+
+def offset_box(box: Any, dy: float) -> Any:
+    """Shift a box down by dy, keeping its original layout"""
+    points = np.asarray(box, dtype=np.float32)
+    shifted = points.reshape(-1, 2) + np.array([0, dy], dtype=np.float32)
+    return shifted.reshape(points.shape)
+
+def _iou(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> float:
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+def merge_strip_predictions(
+    strips: Sequence[Tuple[int, int]],
+    predictions: Sequence[Dict[str, Sequence]],
+) -> Dict[str, List]:
+    """Merge per-strip rec_texts/rec_scores/rec_boxes into one full-image prediction.
+
+    Each strip owns the rows up to the middle of its overlaps, so a line seen
+    whole by two strips is kept once, from the strip where it sits further
+    from the cut. Remaining duplicates (lines straddling the middle) are
+    resolved by IoU, keeping the more confident reading.
+    """
+    candidates = []
+    for i, ((start, end), prediction) in enumerate(zip(strips, predictions)):
+        owned_from = (start + strips[i - 1][1]) / 2 if i > 0 else float("-inf")
+        owned_to = (strips[i + 1][0] + end) / 2 if i + 1 < len(strips) else float("inf")
+        for text, score, box in zip(prediction["rec_texts"], prediction["rec_scores"], prediction["rec_boxes"]):
+            box = offset_box(box, start)
+            bounds = box_bounds(box)
+            centre = (bounds[1] + bounds[3]) / 2
+            if owned_from <= centre < owned_to:
+                candidates.append((float(score), text, box, bounds))
+
+    kept = []
+    for candidate in sorted(candidates, key=lambda c: c[0], reverse=True):
+        if all(_iou(candidate[3], other[3]) <= _DUPLICATE_IOU for other in kept):
+            kept.append(candidate)
+
+    # Back to reading order: top to bottom, then left to right
+    kept.sort(key=lambda c: (c[3][1], c[3][0]))
+    return {
+        "rec_texts": [c[1] for c in kept],
+        "rec_scores": [c[0] for c in kept],
+        "rec_boxes": [c[2] for c in kept],
+    }
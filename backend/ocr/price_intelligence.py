@@ -5,6 +5,8 @@ Core component for building price history and identifying savings opportunities
 
 import asyncio
 import logging
+import os
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -13,6 +15,8 @@ from decimal import Decimal
 import asyncpg
 from asyncpg.pool import Pool
 from receipt_parser import ReceiptData, ReceiptItem
+from item_names import item_key_sql, normalize_item_name
+from best_price_index import BestPrice, BestPriceIndex
 
 # Try to import BUSINESS_RULES, with fallback
 try:
@@ -21,6 +25,9 @@ try:
 except (ImportError, AttributeError):
     MAX_CONNECTIONS = 10  # Default fallback
 
+# Users whose anonymized_id is kept in memory for basket snapshots
+ANONYMIZED_ID_CACHE_SIZE = int(os.getenv("ANONYMIZED_ID_CACHE_SIZE", "1024"))
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -50,9 +57,13 @@ class BasketAnalysis:
     cashback_available: Decimal
 
 class PriceIntelligenceService:
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, best_prices: BestPriceIndex | None = None):
         self.db_url = db_url
         self._pool: Pool | None = None
+        # In-memory 30-day best prices; items it cannot answer go to the database
+        self.best_prices = best_prices
+        # user id -> anonymized_id, least recently used first; a user's anonymized_id does not change
+        self._anonymized_ids: OrderedDict = OrderedDict()
 
     async def _get_pool(self) -> Pool:
         """Get or create an asyncpg connection pool."""
@@ -77,29 +88,35 @@ class PriceIntelligenceService:
             logger.info("Asyncpg connection pool closed.")
 
     async def store_receipt_prices(self, receipt_data: ReceiptData, store_id: str, user_id: str) -> bool:
-        """Store prices from a receipt into price history using an atomic transaction."""
+        """Store prices from a receipt into price history using an atomic transaction.
+
+        All items go in with one upsert over unnested arrays, so a receipt costs
+        the same few round trips whatever its length.
+        """
+        # Receipt items are stored under their normalized name, which is also their key.
+        # One statement cannot upsert a row twice, so a repeated name keeps its last price, as before.
+        items = {self._normalize_item_name(item.name): item for item in receipt_data.items}
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
                 try:
-                    for item in receipt_data.items:
-                        normalized_name = self._normalize_item_name(item.name)
-                        await conn.execute(
-                            """
-                            INSERT INTO price_history (store_id, item_name, price, date, source, confidence_score)
-                            VALUES ($1, $2, $3, $4, $5, $6)
-                            ON CONFLICT (store_id, item_name, date, source)
-                            DO UPDATE SET
-                                price = EXCLUDED.price,
-                                confidence_score = EXCLUDED.confidence_score
-                            """,
-                            store_id,
-                            normalized_name,
-                            item.price,
-                            receipt_data.date or datetime.now().date(),
-                            "receipt",
-                            item.confidence,
-                        )
+                    await conn.execute(
+                        """
+                        INSERT INTO price_history (store_id, item_name, normalized_name, price, date, source, confidence_score)
+                        SELECT $1, item.name, item.name, item.price, $5, $6, item.confidence
+                        FROM unnest($2::text[], $3::numeric[], $4::float8[]) AS item(name, price, confidence)
+                        ON CONFLICT (store_id, item_name, date, source)
+                        DO UPDATE SET
+                            price = EXCLUDED.price,
+                            confidence_score = EXCLUDED.confidence_score
+                        """,
+                        store_id,
+                        list(items),
+                        [self._item_price(item) for item in items.values()],
+                        [item.confidence for item in items.values()],
+                        receipt_data.date or datetime.now().date(),
+                        "receipt",
+                    )
                     await self._create_basket_snapshot(conn, receipt_data, store_id, user_id)
                     logger.info(f"Stored {len(receipt_data.items)} price points for store {store_id}")
                     return True
@@ -109,48 +126,37 @@ class PriceIntelligenceService:
                     return False
 
     async def analyze_basket_savings(self, items: list[ReceiptItem], store_id: str, user_location: tuple[float, float] | None = None) -> BasketAnalysis:
-        """Analyze basket for savings opportunities."""
+        """Analyze basket for savings opportunities.
+
+        The whole basket costs at most two queries, whatever its size: one for
+        the best price of every item the in-memory index cannot answer (shared
+        with the store recommendation) and one for the cashback offers.
+        """
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             try:
                 savings_opportunities = []
                 total_savings = Decimal("0.00")
 
-                for item in items:
-                    normalized_name = self._normalize_item_name(item.name)
-                    result = await conn.fetchrow(
-                        """
-                        SELECT
-                            s.name as store_name,
-                            ph.price,
-                            ph.confidence_score,
-                            COUNT(*) OVER (PARTITION BY ph.item_name) as price_history_points
-                        FROM price_history ph
-                        JOIN stores s ON ph.store_id = s.id
-                        WHERE ph.item_name ILIKE $1
-                        AND ph.date >= CURRENT_DATE - INTERVAL '30 days'
-                        AND s.is_active = true
-                        ORDER BY ph.price ASC
-                        LIMIT 1
-                        """,
-                        f"%{normalized_name}%",
-                    )
-                    if result and result["price"] < item.price:
-                        savings = item.price - result["price"]
+                best_prices = await self._get_best_prices(conn, items)
+                for item, result in zip(items, best_prices):
+                    price = self._item_price(item)
+                    if result and result.price < price:
+                        savings = price - result.price
                         savings_opportunities.append(
                             SavingsOpportunity(
                                 item_name=item.name,
-                                current_price=item.price,
-                                best_price=result["price"],
+                                current_price=price,
+                                best_price=result.price,
                                 savings=savings,
-                                store_name=result["store_name"],
-                                confidence=result["confidence_score"],
-                                price_history_points=result["price_history_points"],
+                                store_name=result.store_name,
+                                confidence=result.confidence_score,
+                                price_history_points=result.price_history_points,
                             )
                         )
                         total_savings += savings
                 
-                store_recommendation = await self._get_store_recommendation(conn, items, user_location)
+                store_recommendation = await self._get_store_recommendation(conn, items, user_location, best_prices)
                 cashback_available = await self._calculate_cashback_opportunities(conn, items, store_id)
 
                 return BasketAnalysis(
@@ -163,42 +169,92 @@ class PriceIntelligenceService:
                 logger.error(f"Error analyzing basket savings: {e}")
                 return BasketAnalysis(Decimal("0.00"), [], None, Decimal("0.00"))
 
+    async def _get_best_prices(self, conn: asyncpg.Connection, items: list[ReceiptItem]) -> list[BestPrice | None]:
+        """Cheapest active-store price of the last 30 days for each item, in item order.
+
+        Names the best price index holds are answered from memory. The rest
+        (all of them while the index is cold) take one query: each distinct
+        normalized name is resolved to its price_history key (exact, else the
+        most similar) and looked up once, by LATERAL subqueries per unnested
+        name. Items with no price history get None.
+        """
+        names = list(dict.fromkeys(filter(None, (self._normalize_item_name(item.name) for item in items))))
+        found: dict[str, BestPrice] = {}
+        if self.best_prices is not None:
+            for name in names:
+                entry = self.best_prices.lookup(name)
+                if entry is not None:
+                    found[name] = entry
+        missing = [name for name in names if name not in found]
+        if missing:
+            found.update(await self._fetch_best_prices(conn, missing))
+        return [found.get(self._normalize_item_name(item.name)) for item in items]
+
+    async def _fetch_best_prices(self, conn: asyncpg.Connection, names: list[str]) -> dict[str, BestPrice]:
+        """Best price per normalized name from price_history, in one query"""
+        rows = await conn.fetch(
+            f"""
+            SELECT basket.name, best.store_name, best.price, best.confidence_score, best.price_history_points, best.date
+            FROM unnest($1::text[]) AS basket(name)
+            CROSS JOIN LATERAL {item_key_sql('basket.name')} AS item
+            CROSS JOIN LATERAL (
+                SELECT
+                    s.name as store_name,
+                    ph.price,
+                    ph.confidence_score,
+                    ph.date,
+                    COUNT(*) OVER () as price_history_points
+                FROM price_history ph
+                JOIN stores s ON ph.store_id = s.id
+                WHERE ph.normalized_name = item.item_key
+                AND ph.date >= CURRENT_DATE - INTERVAL '30 days'
+                AND s.is_active = true
+                ORDER BY ph.price ASC
+                LIMIT 1
+            ) best
+            """,
+            names,
+        )
+        return {row["name"]: BestPrice.from_row(row) for row in rows}
+
     async def get_price_history(self, item_name: str, store_id: str | None = None, days: int = 90) -> list[dict]:
         """Get price history for an item."""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             try:
                 normalized_name = self._normalize_item_name(item_name)
-                query = """
+                query = f"""
                     SELECT ph.price, ph.date, ph.confidence_score, s.name as store_name
                     FROM price_history ph
                     JOIN stores s ON ph.store_id = s.id
-                    WHERE ph.item_name ILIKE $1 AND ($2::UUID IS NULL OR ph.store_id = $2)
+                    WHERE ph.normalized_name = (SELECT item_key FROM {item_key_sql('$1')} AS item)
+                    AND ($2::UUID IS NULL OR ph.store_id = $2)
                     AND ph.date >= CURRENT_DATE - INTERVAL '1 day' * $3
                     ORDER BY ph.date ASC
                 """
-                results = await conn.fetch(query, f"%{normalized_name}%", store_id, days)
+                results = await conn.fetch(query, normalized_name, store_id, days)
                 return [dict(row) for row in results]
             except Exception as e:
                 logger.error(f"Error getting price history: {e}")
                 return []
 
     async def get_store_price_comparison(self, item_name: str) -> list[dict]:
-        """Compare prices across stores for an item."""
+        """Compare prices across stores for an item, summed from the last 30 days of price_daily_rollup."""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             try:
                 normalized_name = self._normalize_item_name(item_name)
-                query = """
-                    SELECT s.name as store_name, MIN(ph.price) as best_price, MAX(ph.price) as highest_price, AVG(ph.price) as average_price
-                    FROM price_history ph
-                    JOIN stores s ON ph.store_id = s.id
-                    WHERE ph.item_name ILIKE $1
-                    AND ph.date >= CURRENT_DATE - INTERVAL '30 days'
+                query = f"""
+                    SELECT s.name as store_name, MIN(r.min_price) as best_price, MAX(r.max_price) as highest_price,
+                        SUM(r.price_sum) / SUM(r.price_count) as average_price
+                    FROM price_daily_rollup r
+                    JOIN stores s ON r.store_id = s.id
+                    WHERE r.normalized_name = (SELECT item_key FROM {item_key_sql('$1')} AS item)
+                    AND r.date >= CURRENT_DATE - INTERVAL '30 days'
                     GROUP BY s.name
                     ORDER BY average_price ASC
                 """
-                results = await conn.fetch(query, f"%{normalized_name}%")
+                results = await conn.fetch(query, normalized_name)
                 return [dict(row) for row in results]
             except Exception as e:
                 logger.error(f"Error getting store price comparison: {e}")
@@ -207,12 +263,18 @@ class PriceIntelligenceService:
     async def _create_basket_snapshot(self, conn: asyncpg.Connection, receipt_data: ReceiptData, store_id: str, user_id: str):
         """Create anonymized basket snapshot for B2B data. Assumes it's called within a transaction."""
         try:
-            anonymized_id_row = await conn.fetchrow("SELECT anonymized_id FROM users WHERE id = $1", user_id)
-            if not anonymized_id_row:
-                logger.warn(f"No anonymized_id found for user_id {user_id}")
-                return
-
-            anonymized_id = anonymized_id_row['anonymized_id']
+            anonymized_id = self._anonymized_ids.get(user_id)
+            if anonymized_id is None:
+                anonymized_id_row = await conn.fetchrow("SELECT anonymized_id FROM users WHERE id = $1", user_id)
+                if not anonymized_id_row:
+                    logger.warn(f"No anonymized_id found for user_id {user_id}")
+                    return
+                anonymized_id = anonymized_id_row['anonymized_id']
+                self._anonymized_ids[user_id] = anonymized_id
+                if len(self._anonymized_ids) > ANONYMIZED_ID_CACHE_SIZE:
+                    self._anonymized_ids.popitem(last=False)
+            else:
+                self._anonymized_ids.move_to_end(user_id)
             anonymized_items = [
                 {"name": self._normalize_item_name(item.name), "price": float(item.price)}
                 for item in receipt_data.items
@@ -234,26 +296,26 @@ class PriceIntelligenceService:
             logger.error(f"Error creating basket snapshot: {e}")
             # Do not re-raise, to avoid breaking the main transaction
     
-    async def _get_store_recommendation(self, conn: asyncpg.Connection, items: list[ReceiptItem], user_location: tuple[float, float] | None) -> str | None:
-        """Get store recommendation based on basket and location."""
+    async def _get_store_recommendation(
+        self,
+        conn: asyncpg.Connection,
+        items: list[ReceiptItem],
+        user_location: tuple[float, float] | None,
+        best_prices: list[BestPrice | None] | None = None,
+    ) -> str | None:
+        """Get store recommendation based on basket and location.
+
+        Pass the rows from _get_best_prices when the caller already has them; otherwise they are fetched here.
+        """
         try:
+            if best_prices is None:
+                best_prices = await self._get_best_prices(conn, items)
             total_savings_by_store = {}
-            for item in items:
-                normalized_name = self._normalize_item_name(item.name)
-                result = await conn.fetchrow(
-                    """
-                    SELECT s.name, ph.price FROM price_history ph
-                    JOIN stores s ON ph.store_id = s.id
-                    WHERE ph.item_name ILIKE $1
-                    AND ph.date >= CURRENT_DATE - INTERVAL '30 days'
-                    AND s.is_active = true
-                    ORDER BY ph.price ASC LIMIT 1
-                    """,
-                    f"%{normalized_name}%",
-                )
-                if result and result['price'] < item.price:
-                    store_name = result['name']
-                    savings = item.price - result['price']
+            for item, result in zip(items, best_prices):
+                price = self._item_price(item)
+                if result and result.price < price:
+                    store_name = result.store_name
+                    savings = price - result.price
                     total_savings_by_store[store_name] = total_savings_by_store.get(store_name, Decimal("0.0")) + savings
 
             if not total_savings_by_store:
@@ -265,45 +327,48 @@ class PriceIntelligenceService:
             return None
 
     async def _calculate_cashback_opportunities(self, conn: asyncpg.Connection, items: list[ReceiptItem], store_id: str) -> Decimal:
-        """Calculate available cashback for items."""
+        """Calculate available cashback for items: the best offer per item, all items in one query."""
         try:
             total_cashback = Decimal("0.00")
-            for item in items:
-                normalized_name = self._normalize_item_name(item.name)
-                result = await conn.fetchrow(
-                    """
+            if not items:
+                return total_cashback
+            prices = [self._item_price(item) for item in items]
+            rows = await conn.fetch(
+                """
+                SELECT basket.idx, offer.discount_amount, offer.discount_percentage
+                FROM unnest($1::text[], $3::numeric[]) WITH ORDINALITY AS basket(pattern, price, idx)
+                CROSS JOIN LATERAL (
                     SELECT discount_amount, discount_percentage FROM cashback_offers
-                    WHERE (item_name ILIKE $1 OR item_name IS NULL)
+                    WHERE (item_name ILIKE basket.pattern OR item_name IS NULL)
                     AND store_id = $2
                     AND is_active = true AND valid_from <= CURRENT_DATE AND valid_until >= CURRENT_DATE
-                    ORDER BY COALESCE(discount_amount, $3 * discount_percentage / 100) DESC
+                    ORDER BY COALESCE(discount_amount, basket.price * discount_percentage / 100) DESC
                     LIMIT 1
-                    """,
-                    f"%{normalized_name}%",
-                    store_id,
-                    item.price,
-                )
-                if result:
-                    if result['discount_amount']:
-                        total_cashback += result['discount_amount']
-                    elif result['discount_percentage']:
-                        total_cashback += item.price * result['discount_percentage'] / 100
+                ) offer
+                ORDER BY basket.idx
+                """,
+                [f"%{self._normalize_item_name(item.name)}%" for item in items],
+                store_id,
+                prices,
+            )
+            for result in rows:
+                if result['discount_amount']:
+                    total_cashback += result['discount_amount']
+                elif result['discount_percentage']:
+                    total_cashback += prices[result['idx'] - 1] * result['discount_percentage'] / 100
             return total_cashback
         except Exception as e:
             logger.error(f"Error calculating cashback: {e}")
             return Decimal("0.00")
     
+    @staticmethod
+    def _item_price(item: ReceiptItem) -> Decimal:
+        """The item's price as a Decimal, so it can be compared and combined with NUMERIC columns"""
+        return Decimal(str(item.price))
+
     def _normalize_item_name(self, item_name: str) -> str:
-        """Normalize item name for better matching"""
-        # Remove common prefixes/suffixes, standardize formatting
-        normalized = item_name.lower().strip()
-        
-        # Remove common words that don't help with matching
-        stop_words = ['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by']
-        words = normalized.split()
-        words = [w for w in words if w not in stop_words and len(w) > 2]
-        
-        return ' '.join(words)
+        """Normalize item name for better matching: the price_history key, as every writer stores it"""
+        return normalize_item_name(item_name)
     
     def _get_price_range(self, price: float) -> str:
         """Convert price to range for anonymization"""
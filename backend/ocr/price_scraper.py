@@ -19,6 +19,7 @@ import argparse
 from playwright.async_api import async_playwright, Browser, Page
 import aiohttp
 from fake_useragent import UserAgent
+from item_names import normalize_item_name
 
 logger = logging.getLogger(__name__)
 
@@ -193,8 +194,8 @@ class PriceScraperService:
             
             for price in prices:
                 cursor.execute("""
-                    INSERT INTO price_history (store_id, item_name, price, date, source, confidence_score)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO price_history (store_id, item_name, normalized_name, price, date, source, confidence_score)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (store_id, item_name, date, source) 
                     DO UPDATE SET 
                         price = EXCLUDED.price,
@@ -202,6 +203,7 @@ class PriceScraperService:
                 """, (
                     price.store_id,
                     price.item_name,
+                    normalize_item_name(price.item_name),
                     price.price,
                     price.date.date(),
                     'scraper',
@@ -24,6 +24,7 @@ from enhanced_price_scraper import EnhancedPriceScraperService
 from new_world_scraper import NewWorldScraper
 from cloudflare_scraper import CloudflareScraper
 from free_proxy_manager import FreeProxyManager
+from item_names import normalize_item_name
 
 logger = logging.getLogger(__name__)
 
@@ -107,6 +108,7 @@ class ProductionScraper:
                 await self.run_database_migration(cursor)
             
             conn.commit()
+            self.check_item_key_migration(cursor)
             cursor.close()
             conn.close()
             
@@ -127,6 +129,25 @@ class ProductionScraper:
             logger.error(f"Database migration failed: {e}")
             raise
     
+    def check_item_key_migration(self, cursor):
+        """Refuse to run until database/06-price-history-normalized-name.sql has been applied.
+
+        A bare normalized_name column without its backfill, trigger and index
+        would make exact item key lookups silently miss every older row.
+        """
+        cursor.execute("""
+            SELECT
+                (SELECT is_nullable = 'NO' FROM information_schema.columns
+                 WHERE table_name = 'price_history' AND column_name = 'normalized_name'),
+                EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'price_history_fill_normalized_name'),
+                to_regclass('idx_price_history_normalized_name_date') IS NOT NULL
+        """)
+        backfilled, trigger, index = cursor.fetchone()
+        if not (backfilled and trigger and index):
+            raise RuntimeError(
+                "price_history item keys are not set up; apply database/06-price-history-normalized-name.sql first"
+            )
+    
     async def run_scraping_job(self, store_name: str) -> Dict:
         """Run a single scraping job"""
         job = self.jobs[store_name]
@@ -293,8 +314,8 @@ class ProductionScraper:
             stored_count = 0
             for price in prices:
                 cursor.execute("""
-                    INSERT INTO price_history (store_id, item_name, price, date, source, confidence_score, volume_size, image_url)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO price_history (store_id, item_name, normalized_name, price, date, source, confidence_score, volume_size, image_url)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (store_id, item_name, date, source) 
                     DO UPDATE SET 
                         price = EXCLUDED.price,
@@ -304,6 +325,7 @@ class ProductionScraper:
                 """, (
                     code_to_uuid.get(getattr(price, 'store_id', None), getattr(price, 'store_id', None)),
                     price.item_name,
+                    normalize_item_name(price.item_name),
                     price.price,
                     price.date.date(),
                     'production_scraper',
@@ -1,14 +1,66 @@
 import re
 import json
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 import logging
-import rapidfuzz
+import time
+from concurrent.futures import Executor
+from functools import lru_cache
+import numpy as np
+from rapidfuzz import fuzz, process
+from ocr_rows import group_rows
+from correction_dictionary import CorrectionDictionary
+from store_profiles import STORE_PROFILES, StoreProfile, profile_for
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Compiled once and shared by every parser; tried in this order, first in-range match wins
+_PRICE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\$?\s*(\d+\.\d{2})',  # Standard price: $12.34
+    r'\$?\s*(\d+\.\d{1})',  # Price with one decimal: $12.3
+    r'\$?\s*(\d+)',         # Whole number price: $12
+    r'(\d+\.\d{2})\s*$',    # Price at end of line
+    r'(\d+\.\d{1})\s*$',    # Price with one decimal at end
+)]
+_QUANTITY_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\d+)\s*x\s*',        # 2 x
+    r'(\d+)\s*@\s*',        # 2 @
+    r'QTY\s*(\d+)',         # QTY 2
+    r'(\d+)\s*PKT',         # 2 PKT
+    r'(\d+)\s*PACK',        # 2 PACK
+)]
+_DATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # DD/MM/YYYY
+    r'(\d{4})-(\d{1,2})-(\d{1,2})',  # YYYY-MM-DD
+    r'(\d{1,2})\s+(\w{3})\s+(\d{4})',  # DD MMM YYYY
+)]
+# Every date pattern needs one of these, so most lines skip the date patterns entirely
+_DATE_HINT = re.compile(r'\d[/-]\d|\d\s+\w{3}\s+\d{4}')
+_AMOUNT = re.compile(r'\$?\s*(\d+\.\d{2})')
+_RECEIPT_NUMBER = re.compile(r'(?:receipt|rn|invoice)\s*[#:]?\s*(\d+)')
+_NAME_JUNK = re.compile(r'[^\w\s\.\-\&\(\)]')
+_WHITESPACE = re.compile(r'\s+')
+_MULTI_SPACE = re.compile(r'\s{2,}')
+_NAME_PREFIX = re.compile(r'^(QTY|QTY:|QTY\s+\d+|X\s*\d+)\s*', re.IGNORECASE)
+_NAME_SUFFIX = re.compile(r'\s+(EACH|PER|UNIT|KG|L|PACK|PKT)\s*$', re.IGNORECASE)
+
+# Item names remembered per parser, so repeated names skip the keyword search
+CATEGORY_MEMO_SIZE = 4096
+# partial_ratio a keyword must beat to count as a category match
+CATEGORY_MIN_SCORE = 80
+# Items scoring below this are dropped as misreads
+MIN_ITEM_CONFIDENCE = 0.3
+# Receipts sent to a pool worker at a time by parse_many; smaller chunks spend their time pickling
+PARSE_MANY_CHUNK_SIZE = 64
+
+HEADER_KEYWORDS = frozenset({'receipt', 'invoice', 'total', 'subtotal', 'tax', 'gst', 'change', 'card', 'cash'})
+TOTAL_KEYWORDS = frozenset({'total', 'subtotal', 'tax', 'gst', 'amount due', 'balance'})
+# Lookahead so overlapping keywords ("subtotal" and "total") are all found in one scan
+_KEYWORDS = re.compile('(?=(' + '|'.join(sorted(HEADER_KEYWORDS | TOTAL_KEYWORDS)) + '))')
+
+# Slotted: a batch holds thousands of items, and responses are built straight from their fields
+@dataclass(slots=True)
 class ReceiptItem:
     name: str
     price: float
@@ -16,7 +68,7 @@ class ReceiptItem:
     category: Optional[str] = None
     confidence: float = 0.0
 
-@dataclass
+@dataclass(slots=True)
 class ReceiptData:
     store_name: Optional[str] = None
     date: Optional[datetime] = None
@@ -30,17 +82,79 @@ class ReceiptData:
         if self.items is None:
             self.items = []
 
+@dataclass
+class ParsedBatch:
+    # In input order; None where that receipt failed to parse
+    receipts: List[Optional[ReceiptData]]
+    # Input position -> error message
+    errors: Dict[int, str]
+    # receipts, failed, items, corrected_items, unique_item_names and the seconds spent per phase
+    stats: Dict[str, float]
+
+@dataclass(slots=True)
+class LineToken:
+    """One OCR line, classified once by ReceiptParser.tokenize"""
+    text: str
+    # total, subtotal, tax, header, item, date, receipt_number or text
+    kind: str
+    # Money amount on total, subtotal and tax lines
+    amount: Optional[float] = None
+    # Item lines: price, cleaned name and quantity
+    price: Optional[float] = None
+    name: Optional[str] = None
+    quantity: int = 1
+    # Captured on any line, since dates and receipt numbers share lines with other text
+    date: Optional[datetime] = None
+    receipt_number: Optional[str] = None
+
+class CategoryIndex:
+    """Category keywords flattened once into a choices array, searched exactly and then fuzzily"""
+
+    def __init__(self, category_keywords: Dict[str, List[str]], min_score: float = CATEGORY_MIN_SCORE):
+        self.keywords = [keyword for keywords in category_keywords.values() for keyword in keywords]
+        self.categories = [category for category, keywords in category_keywords.items() for _ in keywords]
+        self.min_score = min_score
+
+    def lookup(self, item_lower: str) -> Optional[str]:
+        """Category of the first keyword with the best partial_ratio above min_score"""
+        # partial_ratio is 100 exactly when one string contains the other, so
+        # the first containing keyword is the best match without any scoring
+        for keyword, category in zip(self.keywords, self.categories):
+            if keyword in item_lower or (item_lower and item_lower in keyword):
+                return category
+        
+        match = process.extractOne(
+            item_lower, self.keywords, scorer=fuzz.partial_ratio, processor=None, score_cutoff=self.min_score
+        )
+        if match and match[1] > self.min_score:
+            return self.categories[match[2]]
+        return None
+
+    def lookup_many(self, items_lower: Sequence[str], workers: int = -1) -> List[Optional[str]]:
+        """lookup() for many names at once: one partial_ratio matrix, scored on all cores"""
+        if not items_lower:
+            return []
+        # float64 so near-equal scores rank exactly as extractOne ranks them
+        scores = process.cdist(
+            items_lower, self.keywords, scorer=fuzz.partial_ratio, processor=None,
+            score_cutoff=self.min_score, dtype=np.float64, workers=workers
+        )
+        # argmax takes the first of equal scores, like extractOne; containment scores 100,
+        # so the first containing keyword still wins
+        best = scores.argmax(axis=1)
+        return [
+            self.categories[keyword] if scores[row, keyword] > self.min_score else None
+            for row, keyword in enumerate(best)
+        ]
+
 class ReceiptParser:
-    def __init__(self):
-        # Common store name patterns
-        self.store_patterns = {
-            'countdown': r'(?i)countdown|cd\s*$',
-            'new_world': r'(?i)new\s*world|nw\s*$',
-            'paknsave': r'(?i)pak\s*[\'n\s]*save|pns\s*$',
-            'four_square': r'(?i)four\s*square|4\s*square',
-            'fresh_choice': r'(?i)fresh\s*choice',
-            'super_value': r'(?i)super\s*value',
-        }
+    def __init__(self, corrections: Optional[CorrectionDictionary] = None):
+        # User-confirmed names and categories, consulted before the keyword search
+        self.corrections = corrections
+        
+        # Common store name patterns, one per chain profile
+        self.store_patterns = {profile.key: profile.store_pattern for profile in STORE_PROFILES}
+        self._store_regexes = [profile.store_regex for profile in STORE_PROFILES]
         
         # Price patterns
         self.price_pattern = r'\$?\s*(\d+\.\d{2})'
@@ -64,36 +178,234 @@ class ReceiptParser:
             'Frozen': ['ice cream', 'frozen', 'pizza', 'fries', 'peas', 'corn'],
             'Household': ['toilet paper', 'paper towel', 'soap', 'detergent', 'cleaning', 'tissue'],
         }
+        
+        # Keywords used only for categorisation, on top of the ones listed above
+        extra_category_keywords = {
+            'Fresh Produce': ['grapes', 'kiwi', 'mandarin', 'pear', 'plum', 'spinach', 'broccoli', 'cauliflower', 'pumpkin', 'lemon', 'lime', 'orange', 'blueberry', 'strawberry'],
+            'Dairy': ['cream cheese', 'custard', 'evaporated milk', 'condensed milk', 'ice cream'],
+            'Meat': ['turkey', 'duck', 'venison', 'salami', 'meatballs', 'ribs', 'wings', 'drumsticks'],
+            'Pantry': ['muesli', 'granola', 'jam', 'honey', 'spices', 'herbs', 'baking powder', 'yeast', 'vinegar', 'mustard', 'mayonnaise', 'ketchup', 'tomato paste', 'beans', 'lentils', 'chickpeas', 'couscous', 'quinoa'],
+            'Beverages': ['smoothie', 'energy drink', 'sports drink', 'kombucha', 'lemonade', 'ginger beer', 'tonic', 'syrup'],
+            'Snacks': ['popcorn', 'muesli bar', 'granola bar', 'rice cracker', 'pretzel', 'fruit snack', 'trail mix', 'ice block'],
+            'Frozen': ['frozen berries', 'frozen veg', 'frozen meal', 'frozen fish', 'frozen chicken', 'frozen dessert'],
+            'Household': ['dishwasher', 'laundry', 'bleach', 'sponges', 'bin liner', 'foil', 'cling film', 'air freshener', 'insect spray', 'light bulb'],
+        }
+        self.category_index = CategoryIndex({
+            category: keywords + extra_category_keywords.get(category, [])
+            for category, keywords in self.category_keywords.items()
+        })
+        self._category_memo = lru_cache(maxsize=CATEGORY_MEMO_SIZE)(self.category_index.lookup)
 
-    def parse_ocr_results(self, ocr_results: List[Dict]) -> ReceiptData:
-        """Parse OCR results into structured receipt data"""
+    def parse_ocr_results(self, ocr_results: List[Dict], categorize: bool = True) -> ReceiptData:
+        """Parse OCR results into structured receipt data.
+
+        categorize=False leaves item names uncorrected, categories unset and item confidence without
+        its category bonus, for the caller to fill in (parse_many does, for the whole batch at once).
+        """
         receipt = ReceiptData()
-        lines = [result['text'].strip() for result in ocr_results if result['text'].strip()]
+        # PaddleOCR often boxes a name and its price separately; rebuild the printed lines first
+        rows = group_rows([result for result in ocr_results if result['text'].strip()])
+        lines = [row['text'].strip() for row in rows]
         
         # Extract store name from header
         receipt.store_name = self._extract_store_name(lines[:5])
         
+        # Classify every line once, with the store's grammar when it has one;
+        # the extractors below only read the tokens
+        tokens = self.tokenize(lines, profile_for(receipt.store_name))
+        
         # Extract date
-        receipt.date = self._extract_date(lines)
+        receipt.date = self._extract_date(tokens)
         
         # Extract items and prices
-        receipt.items = self._extract_items(lines)
+        receipt.items = self._extract_items(tokens, categorize)
         
         # Extract totals
-        receipt.total, receipt.subtotal, receipt.tax = self._extract_totals(lines)
+        receipt.total, receipt.subtotal, receipt.tax = self._extract_totals(tokens)
         
         # Extract receipt number
-        receipt.receipt_number = self._extract_receipt_number(lines)
+        receipt.receipt_number = self._extract_receipt_number(tokens)
         
         return receipt
 
+    def parse_many(self, ocr_result_sets: Sequence[List[Dict]], executor: Optional[Executor] = None) -> ParsedBatch:
+        """Parse many receipts, categorising every item name in the batch in one pass.
+
+        Extraction runs on ``executor`` (a process pool) in chunks when one is
+        given, otherwise here; pool workers use a default ReceiptParser. The
+        unique item names of the whole batch are then categorised with a single
+        CategoryIndex.lookup_many call, which also gives each item its confidence
+        bonus; _categorize_item is never called per item. A receipt that fails to parse is None in
+        ``receipts`` and its error is kept in ``errors``; the rest are unaffected.
+        """
+        started = time.perf_counter()
+        if executor is None:
+            parsed = _parse_chunk(ocr_result_sets, self)
+        else:
+            chunks = [ocr_result_sets[i:i + PARSE_MANY_CHUNK_SIZE] for i in range(0, len(ocr_result_sets), PARSE_MANY_CHUNK_SIZE)]
+            parsed = [result for chunk in executor.map(_parse_chunk, chunks) for result in chunk]
+        extracted = time.perf_counter()
+
+        receipts, errors = [], {}
+        for i, result in enumerate(parsed):
+            if isinstance(result, str):
+                errors[i] = result
+                receipts.append(None)
+            else:
+                receipts.append(result)
+        items = [item for receipt in receipts if receipt for item in receipt.items]
+        # The confidence bonus goes by the name as read, before any correction renames it
+        read_names = [item.name.lower() for item in items]
+        # Pool workers have no correction dictionary, so corrections are applied here too
+        uncategorized = [item for item in items if not self._apply_correction(item)]
+        names = list({*read_names, *(item.name.lower() for item in uncategorized)})
+        categories = dict(zip(names, self.category_index.lookup_many(names)))
+        for item, name in zip(items, read_names):
+            item.confidence = self._with_category_bonus(item.confidence, categories[name])
+        for item in uncategorized:
+            item.category = categories[item.name.lower()]
+        # Skip items with very low confidence, now that the bonus is known
+        for receipt in receipts:
+            if receipt:
+                receipt.items = [item for item in receipt.items if item.confidence >= MIN_ITEM_CONFIDENCE]
+        items = [item for receipt in receipts if receipt for item in receipt.items]
+        uncategorized = [item for item in uncategorized if item.confidence >= MIN_ITEM_CONFIDENCE]
+        finished = time.perf_counter()
+
+        return ParsedBatch(receipts=receipts, errors=errors, stats={
+            'receipts': len(receipts),
+            'failed': len(errors),
+            'items': len(items),
+            'corrected_items': len(items) - len(uncategorized),
+            'unique_item_names': len(names),
+            'extract_seconds': extracted - started,
+            'categorize_seconds': finished - extracted,
+            'seconds': finished - started,
+            'receipts_per_second': len(receipts) / (finished - started) if finished > started else 0.0,
+        })
+
+    def tokenize(self, lines: Sequence[str], profile: Optional[StoreProfile] = None) -> List[LineToken]:
+        """Classify each line once into total/subtotal/tax, header, item, date, receipt number or plain text.
+
+        With a store profile, item lines and amount labels follow that chain's
+        grammar; without one, the generic keyword and price patterns are used.
+        """
+        return [self._tokenize_line(line, profile) for line in lines]
+
+    def _tokenize_line(self, line: str, profile: Optional[StoreProfile] = None) -> LineToken:
+        line_lower = line.lower()
+        token = LineToken(text=line, kind='text')
+        
+        if _DATE_HINT.search(line):
+            token.date = self._match_date(line)
+        match = _RECEIPT_NUMBER.search(line_lower)
+        if match:
+            token.receipt_number = match.group(1)
+        
+        if profile is not None:
+            self._lex_profile_line(token, profile)
+        else:
+            self._lex_generic_line(token, line_lower)
+        
+        if token.kind == 'text':
+            if token.date:
+                token.kind = 'date'
+            elif token.receipt_number:
+                token.kind = 'receipt_number'
+        return token
+
+    def _lex_generic_line(self, token: LineToken, line_lower: str):
+        """Keyword search for totals and headers, then the generic price patterns"""
+        line = token.text
+        keywords = set(_KEYWORDS.findall(line_lower))
+        if keywords & TOTAL_KEYWORDS:
+            if 'total' in keywords and 'subtotal' not in keywords:
+                token.kind = 'total'
+            elif 'subtotal' in keywords:
+                token.kind = 'subtotal'
+            elif 'tax' in keywords or 'gst' in keywords:
+                token.kind = 'tax'
+            else:
+                # "amount due" / "balance": never an item, but not a total the parser records
+                token.kind = 'header'
+            match = _AMOUNT.search(line)
+            if match:
+                token.amount = float(match.group(1))
+        elif keywords & HEADER_KEYWORDS:
+            token.kind = 'header'
+        else:
+            self._lex_item(token)
+
+    def _lex_profile_line(self, token: LineToken, profile: StoreProfile):
+        """The chain's labels, then its single item pattern with the price in the last column"""
+        line = token.text
+        kind = profile.label_kind(line)
+        if kind is not None:
+            token.kind = kind
+            if kind != 'header':
+                # The amount is the right-hand column
+                amounts = _AMOUNT.findall(line)
+                if amounts:
+                    token.amount = float(amounts[-1])
+            return
+        
+        match = profile.item_regex.match(line)
+        if not match:
+            return
+        price = float(match.group('price'))
+        if not 0.01 <= price <= 10000:
+            return
+        
+        item_text, quantity = match.group('name'), 1
+        for regex in profile.quantity_regexes:
+            quantity_match = regex.search(item_text)
+            if quantity_match:
+                quantity = int(quantity_match.group('quantity')) or 1
+                item_text = item_text[:quantity_match.start()] + ' ' + item_text[quantity_match.end():]
+                break
+        item_text = _WHITESPACE.sub(' ', _NAME_JUNK.sub('', item_text))
+        item_text = _NAME_SUFFIX.sub('', item_text).strip()
+        if len(item_text) < 2:
+            return
+        
+        token.kind = 'item'
+        token.price = price
+        token.name = item_text
+        token.quantity = quantity
+
+    def _lex_item(self, token: LineToken):
+        """Fill in price, name and quantity when the line reads as an item"""
+        price_match = self._extract_price(token.text)
+        if not price_match:
+            return
+        
+        item_text = self._extract_item_name(token.text, price_match)
+        if not item_text or len(item_text.strip()) < 2:
+            return
+        
+        quantity = self._extract_quantity(item_text)
+        if quantity > 1:
+            # Remove quantity from item name
+            item_text = self._remove_quantity_from_name(item_text, quantity)
+        
+        token.kind = 'item'
+        token.price = price_match['price']
+        token.name = item_text
+        token.quantity = quantity
+
+    def _tokens(self, lines: Sequence[Union[str, LineToken]]) -> List[LineToken]:
+        """Accept raw lines or an already tokenized stream"""
+        if lines and isinstance(lines[0], LineToken):
+            return list(lines)
+        return self.tokenize(lines)
+
     def _extract_store_name(self, header_lines: List[str]) -> Optional[str]:
         """Enhanced store name extraction"""
         # First, try exact pattern matching
         for line in header_lines:
             line_lower = line.lower()
-            for store_name, pattern in self.store_patterns.items():
-                if re.search(pattern, line_lower):
+            for regex in self._store_regexes:
+                if regex.search(line_lower):
                     return line.strip()
         
         # If no exact match, try fuzzy matching
@@ -113,87 +425,85 @@ class ReceiptParser:
         
         return None
 
-    def _extract_date(self, lines: List[str]) -> Optional[datetime]:
+    def _extract_date(self, lines: Sequence[Union[str, LineToken]]) -> Optional[datetime]:
         """Extract date from receipt lines"""
-        for line in lines:
-            for pattern in self.date_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    try:
-                        if len(match.groups()) == 3:
-                            if len(match.group(3)) == 2:  # YY format
-                                year = '20' + match.group(3)
-                            else:
-                                year = match.group(3)
-                            
-                            if len(match.group(1)) == 4:  # YYYY-MM-DD format
-                                return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
-                            else:  # DD/MM/YYYY format
-                                return datetime(int(year), int(match.group(2)), int(match.group(1)))
-                    except (ValueError, IndexError):
-                        continue
+        for token in self._tokens(lines):
+            if token.date:
+                return token.date
         return None
 
-    def _extract_items(self, lines: List[str]) -> List[ReceiptItem]:
-        """Enhanced item extraction with better pattern matching"""
+    def _match_date(self, line: str) -> Optional[datetime]:
+        """First date in the line that is a real calendar date"""
+        for pattern in _DATE_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                try:
+                    if len(match.group(3)) == 2:  # YY format
+                        year = '20' + match.group(3)
+                    else:
+                        year = match.group(3)
+                    
+                    if len(match.group(1)) == 4:  # YYYY-MM-DD format
+                        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+                    else:  # DD/MM/YYYY format
+                        return datetime(int(year), int(match.group(2)), int(match.group(1)))
+                except (ValueError, IndexError):
+                    continue
+        return None
+
+    def _extract_items(self, lines: Sequence[Union[str, LineToken]], categorize: bool = True) -> List[ReceiptItem]:
+        """Build items from the item tokens, scoring and (unless categorize is False) categorising each.
+
+        Without categorize, items keep their score before the category bonus and none is dropped
+        for a low score yet; parse_many does both once the batch is categorised.
+        """
         items = []
         
-        for i, line in enumerate(lines):
-            # Skip header lines, totals, and non-item lines
-            if self._is_header_line(line) or self._is_total_line(line):
-                continue
-                
-            # Enhanced price pattern matching
-            price_match = self._extract_price(line)
-            if not price_match:
+        for token in self._tokens(lines):
+            if token.kind != 'item':
                 continue
-                
-            price = price_match['price']
-            
-            # Extract item name with better logic
-            item_text = self._extract_item_name(line, price_match)
-            if not item_text or len(item_text.strip()) < 2:
-                continue
-                
-            # Extract quantity with better patterns
-            quantity = self._extract_quantity(item_text)
-            if quantity > 1:
-                # Remove quantity from item name
-                item_text = self._remove_quantity_from_name(item_text, quantity)
-            
-            # Determine category with improved logic
-            category = self._categorize_item(item_text)
             
             # Calculate confidence based on multiple factors
-            confidence = self._calculate_item_confidence(item_text, price, line)
-            
-            # Skip items with very low confidence
-            if confidence < 0.3:
-                continue
+            if categorize:
+                confidence = self._calculate_item_confidence(token.name, token.price, token.text)
+                # Skip items with very low confidence
+                if confidence < MIN_ITEM_CONFIDENCE:
+                    continue
+            else:
+                confidence = self._base_item_confidence(token.name, token.price, token.text)
             
-            items.append(ReceiptItem(
-                name=item_text.strip(),
-                price=price,
-                quantity=quantity,
-                category=category,
+            item = ReceiptItem(
+                name=token.name.strip(),
+                price=token.price,
+                quantity=token.quantity,
                 confidence=confidence
-            ))
+            )
+            # A confirmed correction beats the keyword search; categorise the name as stored,
+            # so parse_many categorises the same string
+            if categorize and not self._apply_correction(item):
+                item.category = self._categorize_item(item.name)
+            items.append(item)
         
         return items
 
+    def _apply_correction(self, item: ReceiptItem) -> bool:
+        """Replace the item's name (and category, if confirmed) from the correction dictionary.
+
+        Returns True when the item now has its category; False leaves it for _categorize_item.
+        """
+        if self.corrections is None:
+            return False
+        corrected = self.corrections.lookup(item.name)
+        if corrected is None:
+            return False
+        item.name = corrected.name
+        item.category = corrected.category
+        return corrected.category is not None
+
     def _extract_price(self, line: str) -> Optional[Dict[str, float]]:
         """Enhanced price extraction with multiple patterns"""
-        # Multiple price patterns
-        price_patterns = [
-            r'\$?\s*(\d+\.\d{2})',  # Standard price: $12.34
-            r'\$?\s*(\d+\.\d{1})',  # Price with one decimal: $12.3
-            r'\$?\s*(\d+)',         # Whole number price: $12
-            r'(\d+\.\d{2})\s*$',    # Price at end of line
-            r'(\d+\.\d{1})\s*$',    # Price with one decimal at end
-        ]
-        
-        for pattern in price_patterns:
-            match = re.search(pattern, line)
+        for pattern in _PRICE_PATTERNS:
+            match = pattern.search(line)
             if match:
                 price = float(match.group(1))
                 # Validate reasonable price range
@@ -212,28 +522,19 @@ class ReceiptParser:
         item_text = line[:price_match['start']].strip()
         
         # Clean up common OCR artifacts
-        item_text = re.sub(r'[^\w\s\.\-\&\(\)]', '', item_text)
-        item_text = re.sub(r'\s+', ' ', item_text)
+        item_text = _NAME_JUNK.sub('', item_text)
+        item_text = _WHITESPACE.sub(' ', item_text)
         
         # Remove common prefixes/suffixes
-        item_text = re.sub(r'^(QTY|QTY:|QTY\s+\d+|X\s*\d+)\s*', '', item_text, flags=re.IGNORECASE)
-        item_text = re.sub(r'\s+(EACH|PER|UNIT|KG|L|PACK|PKT)\s*$', '', item_text, flags=re.IGNORECASE)
+        item_text = _NAME_PREFIX.sub('', item_text)
+        item_text = _NAME_SUFFIX.sub('', item_text)
         
         return item_text
 
     def _extract_quantity(self, item_text: str) -> int:
         """Enhanced quantity extraction"""
-        # Multiple quantity patterns
-        quantity_patterns = [
-            r'(\d+)\s*x\s*',        # 2 x
-            r'(\d+)\s*@\s*',        # 2 @
-            r'QTY\s*(\d+)',         # QTY 2
-            r'(\d+)\s*PKT',         # 2 PKT
-            r'(\d+)\s*PACK',        # 2 PACK
-        ]
-        
-        for pattern in quantity_patterns:
-            match = re.search(pattern, item_text, re.IGNORECASE)
+        for pattern in _QUANTITY_PATTERNS:
+            match = pattern.search(item_text)
             if match:
                 return int(match.group(1))
         
@@ -241,22 +542,22 @@ class ReceiptParser:
 
     def _remove_quantity_from_name(self, item_text: str, quantity: int) -> str:
         """Remove quantity information from item name"""
-        # Remove quantity patterns
-        patterns_to_remove = [
-            rf'{quantity}\s*x\s*',
-            rf'{quantity}\s*@\s*',
-            rf'QTY\s*{quantity}',
-            rf'{quantity}\s*PKT',
-            rf'{quantity}\s*PACK',
-        ]
+        def strip_quantity(match):
+            return '' if int(match.group(1)) == quantity else match.group(0)
         
-        for pattern in patterns_to_remove:
-            item_text = re.sub(pattern, '', item_text, flags=re.IGNORECASE)
+        for pattern in _QUANTITY_PATTERNS:
+            item_text = pattern.sub(strip_quantity, item_text)
         
         return item_text.strip()
 
     def _calculate_item_confidence(self, item_text: str, price: float, original_line: str) -> float:
         """Calculate confidence score for extracted item"""
+        return self._with_category_bonus(
+            self._base_item_confidence(item_text, price, original_line), self._categorize_item(item_text)
+        )
+
+    def _base_item_confidence(self, item_text: str, price: float, original_line: str) -> float:
+        """Every confidence factor but the category match, uncapped"""
         confidence = 0.5  # Base confidence
         
         # Text length factor
@@ -270,97 +571,49 @@ class ReceiptParser:
             confidence += 0.2
         
         # Line structure factor
-        if re.search(r'\s{2,}', original_line):  # Multiple spaces (typical receipt format)
-            confidence += 0.1
-        
-        # Category match factor
-        if self._categorize_item(item_text):
+        if _MULTI_SPACE.search(original_line):  # Multiple spaces (typical receipt format)
             confidence += 0.1
         
         # No suspicious characters
-        if not re.search(r'[^\w\s\.\-\&\(\)]', item_text):
+        if not _NAME_JUNK.search(item_text):
             confidence += 0.1
         
+        return confidence
+
+    @staticmethod
+    def _with_category_bonus(confidence: float, category: Optional[str]) -> float:
+        """Add the category match factor to a base score and cap it"""
+        if category:
+            confidence += 0.1
         return min(confidence, 0.95)
 
     def _is_header_line(self, line: str) -> bool:
         """Check if line is a header (store name, date, etc.)"""
-        header_keywords = ['receipt', 'invoice', 'total', 'subtotal', 'tax', 'gst', 'change', 'card', 'cash']
-        line_lower = line.lower()
-        return any(keyword in line_lower for keyword in header_keywords)
+        return bool(set(_KEYWORDS.findall(line.lower())) & HEADER_KEYWORDS)
 
     def _is_total_line(self, line: str) -> bool:
         """Check if line contains totals"""
-        total_keywords = ['total', 'subtotal', 'tax', 'gst', 'amount due', 'balance']
-        line_lower = line.lower()
-        return any(keyword in line_lower for keyword in total_keywords)
+        return bool(set(_KEYWORDS.findall(line.lower())) & TOTAL_KEYWORDS)
 
     def _categorize_item(self, item_name: str) -> Optional[str]:
         """Categorize item based on keywords and fuzzy matching"""
-        item_lower = item_name.lower()
-        best_category = None
-        best_score = 0.0
-        # Expanded category keywords
-        expanded_category_keywords = {
-            'Fresh Produce': self.category_keywords['Fresh Produce'] + ['grapes', 'kiwi', 'mandarin', 'pear', 'plum', 'spinach', 'broccoli', 'cauliflower', 'pumpkin', 'lemon', 'lime', 'orange', 'blueberry', 'strawberry'],
-            'Dairy': self.category_keywords['Dairy'] + ['cream cheese', 'custard', 'evaporated milk', 'condensed milk', 'ice cream'],
-            'Meat': self.category_keywords['Meat'] + ['turkey', 'duck', 'venison', 'salami', 'meatballs', 'ribs', 'wings', 'drumsticks'],
-            'Pantry': self.category_keywords['Pantry'] + ['muesli', 'granola', 'jam', 'honey', 'spices', 'herbs', 'baking powder', 'yeast', 'vinegar', 'mustard', 'mayonnaise', 'ketchup', 'tomato paste', 'beans', 'lentils', 'chickpeas', 'couscous', 'quinoa'],
-            'Beverages': self.category_keywords['Beverages'] + ['smoothie', 'energy drink', 'sports drink', 'kombucha', 'lemonade', 'ginger beer', 'tonic', 'syrup'],
-            'Snacks': self.category_keywords['Snacks'] + ['popcorn', 'muesli bar', 'granola bar', 'rice cracker', 'pretzel', 'fruit snack', 'trail mix', 'ice block'],
-            'Frozen': self.category_keywords['Frozen'] + ['frozen berries', 'frozen veg', 'frozen meal', 'frozen fish', 'frozen chicken', 'frozen dessert'],
-            'Household': self.category_keywords['Household'] + ['dishwasher', 'laundry', 'bleach', 'sponges', 'bin liner', 'foil', 'cling film', 'air freshener', 'insect spray', 'light bulb'],
-        }
-        # Fuzzy match against expanded keywords
-        for category, keywords in expanded_category_keywords.items():
-            for keyword in keywords:
-                score = rapidfuzz.fuzz.partial_ratio(item_lower, keyword)
-                if score > best_score and score > 80:  # 80+ is a strong match
-                    best_score = score
-                    best_category = category
-        if best_category:
-            return best_category
-        # Fallback: try OpenAI normalization if available and confidence is low
-        # (Pseudo-code, as this would require async and service access)
-        # if hasattr(self, 'openai_service') and best_score < 85:
-        #     normalized = await self.openai_service.normalize_products([item_name])
-        #     if normalized and normalized[0].category:
-        #         return normalized[0].category
-        return None
+        return self._category_memo(item_name.lower())
 
-    def _extract_totals(self, lines: List[str]) -> Tuple[Optional[float], Optional[float], Optional[float]]:
-        """Extract total, subtotal, and tax amounts"""
-        total = None
-        subtotal = None
-        tax = None
+    def _extract_totals(self, lines: Sequence[Union[str, LineToken]]) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """Extract total, subtotal, and tax amounts; the last of each wins"""
+        amounts = {'total': None, 'subtotal': None, 'tax': None}
         
-        for line in lines:
-            line_lower = line.lower()
-            
-            if 'total' in line_lower and not 'subtotal' in line_lower:
-                match = re.search(self.price_pattern, line)
-                if match:
-                    total = float(match.group(1))
-            
-            elif 'subtotal' in line_lower:
-                match = re.search(self.price_pattern, line)
-                if match:
-                    subtotal = float(match.group(1))
-            
-            elif 'tax' in line_lower or 'gst' in line_lower:
-                match = re.search(self.price_pattern, line)
-                if match:
-                    tax = float(match.group(1))
-        
-        return total, subtotal, tax
-
-    def _extract_receipt_number(self, lines: List[str]) -> Optional[str]:
-        """Extract receipt number"""
-        for line in lines:
-            # Look for patterns like "Receipt #12345" or "RN: 12345"
-            match = re.search(r'(?:receipt|rn|invoice)\s*[#:]?\s*(\d+)', line.lower())
-            if match:
-                return match.group(1)
+        for token in self._tokens(lines):
+            if token.kind in amounts and token.amount is not None:
+                amounts[token.kind] = token.amount
+        
+        return amounts['total'], amounts['subtotal'], amounts['tax']
+
+    def _extract_receipt_number(self, lines: Sequence[Union[str, LineToken]]) -> Optional[str]:
+        """Extract receipt number from lines like "Receipt #12345" or "RN: 12345" """
+        for token in self._tokens(lines):
+            if token.receipt_number:
+                return token.receipt_number
         return None
 
     def validate_receipt(self, receipt: ReceiptData) -> Dict[str, any]:
@@ -387,4 +640,22 @@ class ReceiptParser:
         if low_confidence_items:
             validation['warnings'].append(f'{len(low_confidence_items)} items have low confidence scores')
         
-        return validation 
\ No newline at end of file
+        return validation 
+
+# Per-process parser for parse_many's pool workers
+_chunk_parser = None
+
+def _parse_chunk(ocr_result_sets: Sequence[List[Dict]], parser: Optional[ReceiptParser] = None) -> List[Union[ReceiptData, str]]:
+    """Uncategorised parse of each receipt, or its error message; runs in parse_many's pool workers"""
+    global _chunk_parser
+    if parser is None:
+        if _chunk_parser is None:
+            _chunk_parser = ReceiptParser()
+        parser = _chunk_parser
+    results = []
+    for ocr_results in ocr_result_sets:
+        try:
+            results.append(parser.parse_ocr_results(ocr_results, categorize=False))
+        except Exception as e:
+            results.append(f"{type(e).__name__}: {e}")
+    return results
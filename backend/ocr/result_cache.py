@@ -0,0 +1,152 @@
+"""
+OCR Result Cache
+Content-addressed cache for OCR results with an in-memory LRU tier, an optional
+Redis tier and single-flight coalescing of identical in-flight requests
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+import metrics
+
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", "3600"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+def cache_key(image_bytes: bytes, fingerprint: Dict[str, Any]) -> str:
+    """SHA-256 of the image bytes plus a hash of the pipeline version/params"""
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    params_hash = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:16]
+    return f"ocr:{image_hash}:{params_hash}"
+
+class LRUCache:
+    """Bounded in-memory mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class ResultCache:
+    """Two-tier cache keyed by image content.
+
+    ``redis_client`` is any object with async ``get(key)`` and
+    ``set(key, value, ex=ttl)``; when it is None only the memory tier is used.
+    """
+
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE, ttl: int = OCR_CACHE_TTL, redis_client=None):
+        self.memory = LRUCache(max_entries)
+        self.ttl = ttl
+        self.redis = redis_client
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {'memory_hits': 0, 'redis_hits': 0, 'misses': 0, 'coalesced': 0, 'redis_errors': 0}
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        """Build the cache, attaching Redis when REDIS_URL is configured"""
+        redis_client = None
+        if REDIS_URL:
+            try:
+                from redis import asyncio as aioredis
+                redis_client = aioredis.from_url(REDIS_URL)
+                logger.info("OCR result cache using Redis tier")
+            except ImportError:
+                logger.warning("redis package not available, OCR result cache is memory-only")
+        return cls(redis_client=redis_client)
+
+    async def get_or_compute(
+        self,
+        image_bytes: bytes,
+        compute: Callable[[], Awaitable[Any]],
+        fingerprint: Dict[str, Any],
+    ) -> Any:
+        """Return the cached value for these bytes, computing it at most once across concurrent callers"""
+        key = cache_key(image_bytes, fingerprint)
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._record('memory_hits')
+            return value
+
+        # Join an identical request that is already being computed
+        task = self._inflight.get(key)
+        if task is not None:
+            self._record('coalesced')
+        else:
+            # The cache owns the computation, so a caller that goes away (a
+            # disconnected client, a lost race) doesn't cancel it for the others
+            task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self._redis_get(key)
+        if value is not None:
+            self._record('redis_hits')
+        else:
+            self._record('misses')
+            value = await compute()
+            await self._redis_set(key, value)
+        self.memory.set(key, value)
+        return value
+
+    def _finish(self, key: str, task: asyncio.Task):
+        del self._inflight[key]
+        # Mark a failure retrieved so it doesn't log a warning when every caller has gone
+        if not task.cancelled():
+            task.exception()
+
+    async def _redis_get(self, key: str) -> Optional[Any]:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            self._stats['redis_errors'] += 1
+            logger.warning(f"Redis cache read failed: {e}")
+            return None
+
+    async def _redis_set(self, key: str, value: Any):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            self._stats['redis_errors'] += 1
+            logger.warning(f"Redis cache write failed: {e}")
+
+    def _record(self, outcome: str):
+        self._stats[outcome] += 1
+        metrics.OCR_CACHE_REQUESTS.labels(outcome=outcome).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['memory_hits'] + self._stats['redis_hits'] + self._stats['misses'] + self._stats['coalesced']
+        hits = lookups - self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'redis_enabled': self.redis is not None,
+        }
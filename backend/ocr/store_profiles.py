@@ -0,0 +1,97 @@
+"""
+Store Profiles
+Per-chain receipt grammars (column layout, quantity syntax and amount labels),
+chosen once the store is known so each line is read by that chain's patterns
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Pattern, Sequence, Tuple
+
+@dataclass
+class StoreProfile:
+    """How one chain prints its receipts; patterns are compiled once, when the profile is built"""
+    key: str
+    # Matches the store name line
+    store_pattern: str
+    # A whole item line: the name, then the price as the last column
+    item_pattern: str
+    # Quantity syntax on an item line; (?P<quantity>...) is read and the whole match dropped from the name
+    quantity_patterns: Sequence[str]
+    # (label, kind) for lines that are never items, matched at the start of the line.
+    # kind is total, subtotal, tax or header (payments, change, loyalty savings)
+    labels: Sequence[Tuple[str, str]]
+    store_regex: Pattern = field(init=False, repr=False)
+    item_regex: Pattern = field(init=False, repr=False)
+    quantity_regexes: List[Pattern] = field(init=False, repr=False)
+    label_regex: Pattern = field(init=False, repr=False)
+    label_kinds: List[str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.store_regex = re.compile(self.store_pattern)
+        self.item_regex = re.compile(self.item_pattern, re.IGNORECASE)
+        self.quantity_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.quantity_patterns]
+        # One alternation for every label; the group that matched gives the kind
+        self.label_regex = re.compile(
+            r'^\W*(?:' + '|'.join(f'({label})' for label, _ in self.labels) + r')(?!\w)', re.IGNORECASE
+        )
+        self.label_kinds = [kind for _, kind in self.labels]
+
+    def label_kind(self, line: str) -> Optional[str]:
+        """total, subtotal, tax or header when the line starts with one of the chain's labels"""
+        match = self.label_regex.match(line)
+        return self.label_kinds[match.lastindex - 1] if match else None
+
+# Name on the left, the line total in a right-hand column of its own (one decimal
+# when OCR drops the last digit). Discounts print as negative amounts ("-1.50" or
+# "1.50-") and never match.
+_ITEM_COLUMNS = r'^(?P<name>.*?[a-z].*?)\s*(?<!-)\$?\s*(?P<price>\d+\.\d{1,2})\s*$'
+# Discount and savings lines are labelled by their negative amount instead of a word
+_NEGATIVE_AMOUNT = r'.*(?:-\s*\$?\s*\d+\.\d{2}|\d+\.\d{2}\s*-)\s*$'
+
+def _grammar(quantity_patterns: Sequence[str], loyalty: str) -> dict:
+    """The columns and labels both chains print, plus each chain's quantity forms and loyalty lines"""
+    return dict(
+        item_pattern=_ITEM_COLUMNS,
+        quantity_patterns=(
+            r'^(?P<quantity>\d+)\s*x\s+',
+            *quantity_patterns,
+            r'\s(?P<quantity>\d+)\s*@\s*\$?\s*\d+\.\d{2}(?:\s*(?:ea|each))?',
+        ),
+        # Savings labels come before total, so "TOTAL SAVINGS 3.00" is not read as the receipt total
+        labels=(
+            ('sub\\s*total', 'subtotal'),
+            ('(?:total\\s+sav(?:ings?|ed)|savings|you\\s+saved|multibuy\\s+saving)', 'header'),
+            ('total', 'total'),
+            ('(?:gst|tax)', 'tax'),
+            ('(?:amount\\s+due|balance(?:\\s+due)?)', 'header'),
+            (loyalty, 'header'),
+            ('(?:eftpos|visa|mastercard|credit|debit|card|cash|change|rounding|tendered)', 'header'),
+            (_NEGATIVE_AMOUNT, 'header'),
+        ),
+    )
+
+# Countdown, Fresh Choice and Super Value (Woolworths NZ): "2 x NAME" or "NAME 2 @ $1.99"
+_WOOLWORTHS = _grammar((), loyalty='(?:onecard|everyday\\s+rewards|rewards)')
+
+# New World, Pak'nSave and Four Square (Foodstuffs): also "QTY 2 NAME"
+_FOODSTUFFS = _grammar((r'^qty:?\s*(?P<quantity>\d+)\s+',), loyalty='(?:clubcard|club\\s+deal|club\\s+price)')
+
+# In detection order; receipts from any other store are read with the parser's generic patterns
+STORE_PROFILES = (
+    StoreProfile(key='countdown', store_pattern=r'(?i)countdown|cd\s*$', **_WOOLWORTHS),
+    StoreProfile(key='new_world', store_pattern=r'(?i)new\s*world|nw\s*$', **_FOODSTUFFS),
+    StoreProfile(key='paknsave', store_pattern=r'(?i)pak\s*[\'n\s]*save|pns\s*$', **_FOODSTUFFS),
+    StoreProfile(key='four_square', store_pattern=r'(?i)four\s*square|4\s*square', **_FOODSTUFFS),
+    StoreProfile(key='fresh_choice', store_pattern=r'(?i)fresh\s*choice', **_WOOLWORTHS),
+    StoreProfile(key='super_value', store_pattern=r'(?i)super\s*value', **_WOOLWORTHS),
+)
+
+def profile_for(store_name: Optional[str], profiles: Sequence[StoreProfile] = STORE_PROFILES) -> Optional[StoreProfile]:
+    """The profile of the chain named on the store line; None means the generic grammar"""
+    if not store_name:
+        return None
+    for profile in profiles:
+        if profile.store_regex.search(store_name):
+            return profile
+    return None
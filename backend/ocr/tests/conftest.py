@@ -0,0 +1,48 @@
+import pytest
+
+class FakePool:
+    """Stands in for an asyncpg pool and its connections.
+
+    acquire() and transaction() are no-op context managers yielding the fake
+    itself; fetch, fetchrow, fetchval and execute call the handler given for them with
+    the query and its arguments. Every call's arguments are recorded in
+    ``queries``, one entry per round trip.
+    """
+
+    def __init__(self, fetch=None, fetchrow=None, fetchval=None, execute=None):
+        self.handlers = {'fetch': fetch, 'fetchrow': fetchrow, 'fetchval': fetchval, 'execute': execute}
+        self.queries = []
+
+    def acquire(self):
+        return self
+
+    def transaction(self, **options):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def _call(self, method, query, args):
+        self.queries.append(args)
+        handler = self.handlers[method]
+        return handler(query, *args) if handler else None
+
+    async def fetch(self, query, *args):
+        return self._call('fetch', query, args) or []
+
+    async def fetchrow(self, query, *args):
+        return self._call('fetchrow', query, args)
+
+    async def fetchval(self, query, *args):
+        return self._call('fetchval', query, args)
+
+    async def execute(self, query, *args):
+        return self._call('execute', query, args)
+
+@pytest.fixture
+def fake_pool():
+    """FakePool, for tests that answer database queries from Python"""
+    return FakePool
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from best_price_index import BestPriceIndex
+from price_intelligence import PriceIntelligenceService
+from receipt_parser import ReceiptItem
+
+TODAY = date.today()
+
+def row(name, store, price, points=1, days_ago=0):
+    return {'normalized_name': name, 'store_name': store, 'price': Decimal(price), 'confidence_score': Decimal('0.90'),
+            'date': TODAY - timedelta(days=days_ago), 'price_history_points': points}
+
+# pg_current_snapshot() of every read: transactions below 100 had committed, except 97
+SNAPSHOT = '95:100:97'
+
+def change(op, name, store, price, days_ago=0, store_active=True, old=None, xid=None):
+    """A payload as sent by the price_history trigger; old is the (store, price, days_ago) an update or delete replaced"""
+    c = {'op': op}
+    if xid is not None:
+        c['xid'] = str(xid)
+    if op != 'DELETE':
+        c.update({'normalized_name': name, 'store_name': store, 'price': Decimal(price),
+                  'confidence_score': Decimal('0.90'), 'date': (TODAY - timedelta(days=days_ago)).isoformat(),
+                  'store_active': store_active})
+    if op != 'INSERT':
+        old_store, old_price, old_days_ago = old or (store, price, days_ago)
+        c.update({'old_normalized_name': name, 'old_store_name': old_store, 'old_price': Decimal(old_price),
+                  'old_date': (TODAY - timedelta(days=old_days_ago)).isoformat(), 'old_store_active': True})
+    return c
+
+def payload(c):
+    """The JSON text of a change, numbers as postgres' jsonb writes them"""
+    return json.dumps({k: float(v) if isinstance(v, Decimal) else v for k, v in c.items()})
+
+def snapshot_pool(fake_pool, rows, during_fetch=None):
+    """fetch returns the snapshot, fetchrow one key's row; during_fetch runs inside either"""
+    def fetch(query, window_days):
+        if during_fetch:
+            during_fetch()
+        return rows
+    def fetchrow(query, window_days, key):
+        if during_fetch:
+            during_fetch()
+        return next((r for r in rows if r['normalized_name'] == key), None)
+    return fake_pool(fetch=fetch, fetchrow=fetchrow, fetchval=lambda query: SNAPSHOT)
+
+async def refreshed(index):
+    """Refresh without a listener connection"""
+    async def listen():
+        pass
+    index._listen = listen
+    await index.refresh()
+    return index
+
+async def loaded_index(fake_pool, rows):
+    index = BestPriceIndex('postgresql://unused')
+    index._pool = snapshot_pool(fake_pool, rows)
+    return await refreshed(index)
+
+@pytest.mark.asyncio
+async def test_cold_until_loaded(fake_pool):
+    """Test that lookups answer None before the first load and after the listener drops"""
+    index = BestPriceIndex()
+    assert index.lookup('milk') is None
+    assert index.stats()['cold'] == 1
+
+    index = await loaded_index(fake_pool, [row('milk', 'Pak\'nSave', '3.20', points=2)])
+    assert index.lookup('milk').price == Decimal('3.20')
+    index._on_listener_lost(None)
+    assert index.lookup('milk') is None
+    assert (index.stats()['hits'], index.stats()['cold']) == (1, 1)
+
+@pytest.mark.asyncio
+async def test_insert_applied_from_payload(fake_pool):
+    """Test that inserts add a price point and replace the best price only when cheaper"""
+    index = await loaded_index(fake_pool, [row('milk', 'Pak\'nSave', '3.20', points=2)])
+    assert index.apply_change(change('INSERT', 'milk', 'New World', '3.60')) == []
+    assert index.apply_change(change('INSERT', 'milk', 'Countdown', '2.90')) == []
+    entry = index.lookup('milk')
+    assert (entry.store_name, entry.price, entry.price_history_points) == ('Countdown', Decimal('2.90'), 4)
+
+    # New keys start with one point; inactive stores and rows outside the window are ignored
+    index.apply_change(change('INSERT', 'eggs', 'New World', '6.50'))
+    index.apply_change(change('INSERT', 'eggs', 'Closed Store', '1.00', store_active=False))
+    index.apply_change(change('INSERT', 'eggs', 'New World', '1.00', days_ago=40))
+    assert (index.lookup('eggs').price, index.lookup('eggs').price_history_points) == (Decimal('6.50'), 1)
+
+@pytest.mark.asyncio
+async def test_removing_best_row_reloads_key(fake_pool):
+    """Test that deleting the best row, or making it dearer, drops the key and reloads it from the database"""
+    rows = [row('milk', 'Pak\'nSave', '3.20', points=2)]
+    index = await loaded_index(fake_pool, rows)
+    rows[0] = row('milk', 'New World', '3.60', points=1)
+    index._on_notification(None, 0, 'price_history_changes', payload(change('DELETE', 'milk', 'Pak\'nSave', '3.20')))
+    assert index.lookup('milk') is None
+    await asyncio.sleep(0)
+    assert index._pool.queries[-1][-1] == 'milk'
+    assert index.lookup('milk').store_name == 'New World'
+    assert not index._reloading_keys
+
+    assert index.apply_change(change('UPDATE', 'milk', 'New World', '3.90', old=('New World', '3.60', 0))) == ['milk']
+
+@pytest.mark.asyncio
+async def test_updates_and_deletes_applied_in_place(fake_pool):
+    """Test that changes which leave the best row the cheapest never reload"""
+    index = await loaded_index(fake_pool, [row('milk', 'Pak\'nSave', '3.20', points=3)])
+
+    # Another row gets dearer, moves out of the key, or is deleted: one point fewer each time it leaves
+    assert index.apply_change(change('UPDATE', 'milk', 'New World', '3.90', old=('New World', '3.60', 0))) == []
+    assert index.apply_change(change('DELETE', 'milk', 'New World', '3.90')) == []
+    entry = index.lookup('milk')
+    assert (entry.store_name, entry.price, entry.price_history_points) == ('Pak\'nSave', Decimal('3.20'), 2)
+
+    # The best row itself gets cheaper
+    assert index.apply_change(change('UPDATE', 'milk', 'Pak\'nSave', '2.99', old=('Pak\'nSave', '3.20', 0))) == []
+    entry = index.lookup('milk')
+    assert (entry.price, entry.price_history_points) == (Decimal('2.99'), 2)
+
+    # Another row drops below the best
+    assert index.apply_change(change('UPDATE', 'milk', 'Countdown', '2.50', old=('Countdown', '3.40', 0))) == []
+    assert (index.lookup('milk').store_name, index.lookup('milk').price_history_points) == ('Countdown', 2)
+    # Only the load's snapshot and rows were read
+    assert index._pool.queries == [(), (30,)]
+
+@pytest.mark.asyncio
+async def test_stale_best_price_is_not_served(fake_pool):
+    """Test that a best price older than the window is a miss until reloaded"""
+    index = await loaded_index(fake_pool, [row('bread white', 'New World', '2.50', days_ago=31)])
+    assert index.lookup('bread white') is None
+    assert index.apply_change(change('INSERT', 'bread white', 'Countdown', '2.80')) == ['bread white']
+
+@pytest.mark.asyncio
+async def test_changes_during_load_are_replayed(fake_pool):
+    """Test that notifications arriving mid-load are applied on top of the snapshot"""
+    def notify():
+        index._on_notification(None, 0, 'price_history_changes', payload(change('INSERT', 'milk', 'Countdown', '2.90')))
+    index = BestPriceIndex('postgresql://unused')
+    index._pool = snapshot_pool(fake_pool, [row('milk', 'Pak\'nSave', '3.20', points=2)], during_fetch=notify)
+    await refreshed(index)
+    assert index.lookup('milk').price == Decimal('2.90')
+
+@pytest.mark.asyncio
+async def test_replay_skips_changes_the_snapshot_holds(fake_pool):
+    """Test that a buffered change whose transaction the load already saw is not counted twice"""
+    rows = [row('milk', 'Pak\'nSave', '3.20', points=2)]
+    def notify():
+        for xid in (94, 97, 99, 100):
+            index._on_notification(None, 0, 'price_history_changes',
+                                   payload(change('INSERT', 'milk', 'New World', '3.60', xid=xid)))
+    index = BestPriceIndex('postgresql://unused')
+    index._pool = snapshot_pool(fake_pool, rows, during_fetch=notify)
+    await refreshed(index)
+    # 97 was still running and 100 started after the snapshot; 94 and 99 are in the rows already
+    assert index.lookup('milk').price_history_points == 4
+
+@pytest.mark.asyncio
+async def test_changes_during_key_reload_are_replayed(fake_pool):
+    """Test that a change arriving while a key reloads is applied on top of the reloaded row"""
+    rows = [row('milk', 'Pak\'nSave', '3.20', points=2)]
+    index = await loaded_index(fake_pool, rows)
+    # The remaining rows: New World's, and a dearer one committed before the reload's snapshot
+    rows[0] = row('milk', 'New World', '3.60', points=2)
+    def notify():
+        index._on_notification(None, 0, 'price_history_changes',
+                               payload(change('INSERT', 'milk', 'Countdown', '2.90', xid=100)))
+        index._on_notification(None, 0, 'price_history_changes',
+                               payload(change('INSERT', 'milk', 'Countdown', '4.10', xid=96)))
+    index._pool = snapshot_pool(fake_pool, rows, during_fetch=notify)
+    index._handle(change('DELETE', 'milk', 'Pak\'nSave', '3.20'))
+    assert index._reloading_keys
+    await asyncio.sleep(0)
+
+    entry = index.lookup('milk')
+    assert (entry.store_name, entry.price, entry.price_history_points) == ('Countdown', Decimal('2.90'), 3)
+    assert not index._reloading_keys and not index._reload_buffers
+
+@pytest.mark.asyncio
+async def test_basket_analysis_skips_database_for_indexed_items(fake_pool):
+    """Test that only names the index does not hold are queried"""
+    index = await loaded_index(fake_pool, [row('milk', 'Pak\'nSave', '3.20', points=2)])
+    service = PriceIntelligenceService('postgresql://unused', best_prices=index)
+    service._pool = fake_pool()
+    analysis = await service.analyze_basket_savings(
+        [ReceiptItem(name='MILK', price=4.0), ReceiptItem(name='EGGS', price=6.0)], 'store-1')
+    assert analysis.savings_opportunities[0].best_price == Decimal('3.20')
+    # One best-price query for eggs only, then the cashback query
+    assert service._pool.queries[0][0] == ['eggs']
@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime, timedelta
+from correction_dictionary import CorrectionDictionary, dictionary_key
+
+T0 = datetime(2024, 12, 15, 9, 0)
+
+def row(id, raw_name, name, category=None, seconds=0):
+    return {'id': id, 'created_at': T0 + timedelta(seconds=seconds), 'raw_name': raw_name,
+            'corrected_name': name, 'corrected_category': category}
+
+def watermark_pool(fake_pool, rows):
+    """fetch returns the rows at or after the watermark it is given"""
+    return fake_pool(fetch=lambda query, watermark: [
+        r for r in rows if watermark is None or r['created_at'] >= watermark
+    ])
+
+def test_dictionary_key_ignores_case_and_spacing():
+    """Test that OCR spacing and case variants share an entry"""
+    assert dictionary_key('  MILK   2L ') == dictionary_key('milk 2l') == 'milk 2l'
+
+def test_most_confirmed_correction_wins():
+    """Test that the most confirmed pair wins and ties go to the latest confirmation"""
+    corrections = CorrectionDictionary()
+    corrections.add('ANCHR MLK 2L', 'Anchor Milk 2L', 'Dairy')
+    corrections.add('ANCHR MLK 2L', 'Anchor Blue Milk 2L', 'Dairy')
+    assert corrections.lookup('anchr mlk 2l').name == 'Anchor Blue Milk 2L'
+    
+    corrections.add('ANCHR MLK 2L', 'Anchor Milk 2L', 'Dairy')
+    entry = corrections.lookup('ANCHR MLK 2L')
+    assert (entry.name, entry.category, entry.confirmations) == ('Anchor Milk 2L', 'Dairy', 2)
+
+def test_min_confirmations():
+    """Test that a correction is only used once it has enough confirmations"""
+    corrections = CorrectionDictionary(min_confirmations=2)
+    corrections.add('BRD WHT', 'White Bread', 'Pantry')
+    assert corrections.lookup('BRD WHT') is None
+    corrections.add('BRD WHT', 'White Bread', 'Pantry')
+    assert corrections.lookup('BRD WHT').name == 'White Bread'
+
+def test_hit_rate():
+    """Test that lookups are counted towards the reported hit rate"""
+    corrections = CorrectionDictionary()
+    corrections.add('BRD WHT', 'White Bread', 'Pantry')
+    corrections.lookup('BRD WHT')
+    corrections.lookup('UNKNOWN')
+    stats = corrections.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate'], stats['entries']) == (1, 1, 0.5, 1)
+
+@pytest.mark.asyncio
+async def test_refresh_is_incremental(fake_pool):
+    """Test that refreshes fetch from the last seen correction and never count a row twice"""
+    rows = [row(1, 'BRD WHT', 'White Bread', 'Pantry'), row(2, 'MLK', 'Milk', 'Dairy')]
+    pool = watermark_pool(fake_pool, rows)
+    corrections = CorrectionDictionary()
+    corrections._pool = pool
+    
+    assert await corrections.refresh() == 2
+    rows.append(row(3, 'BRD WHT', 'White Bread', 'Pantry', seconds=60))
+    assert await corrections.refresh() == 1
+    assert await corrections.refresh() == 0
+    
+    overlap = corrections.overlap
+    assert pool.queries == [(None,), (T0 - overlap,), (T0 + timedelta(seconds=60) - overlap,)]
+    assert corrections.lookup('BRD WHT').confirmations == 2
+    assert corrections.stats()['corrections_loaded'] == 3
+
+@pytest.mark.asyncio
+async def test_refresh_picks_up_late_commits(fake_pool):
+    """Test that a correction committed after a newer one raised the watermark is still loaded, once"""
+    rows = [row(1, 'BRD WHT', 'White Bread', 'Pantry', seconds=60)]
+    corrections = CorrectionDictionary(overlap_seconds=300)
+    corrections._pool = watermark_pool(fake_pool, rows)
+    assert await corrections.refresh() == 1
+
+    # Written before row 1 but committed after the first refresh
+    rows.append(row(2, 'MLK', 'Milk', 'Dairy', seconds=30))
+    assert await corrections.refresh() == 1
+    assert await corrections.refresh() == 0
+    assert corrections.lookup('MLK').name == 'Milk'
+    assert corrections.lookup('BRD WHT').confirmations == 1
+
+    # Ids older than the overlap are forgotten; the fetch no longer returns them
+    rows.append(row(3, 'EGGS', 'Eggs', 'Dairy', seconds=1000))
+    assert await corrections.refresh() == 1
+    assert set(corrections._seen) == {3}
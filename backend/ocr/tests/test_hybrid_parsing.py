@@ -0,0 +1,169 @@
+import asyncio
+import pytest
+from hybrid_parsing import ParseOutcome, race_parsers, is_acceptable, escalation_decision, ai_first, ocr_first
+from receipt_parser import ReceiptData, ReceiptItem
+from result_cache import ResultCache
+
+GOOD = {'is_valid': True, 'confidence_score': 0.8}
+WEAK = {'is_valid': True, 'confidence_score': 0.3}
+
+def path(delay, validation=None, error=None):
+    """Parser stand-in that finishes after `delay` seconds"""
+    state = {'cancelled': False}
+
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            state['cancelled'] = True
+            raise
+        if error:
+            raise error
+        return ParseOutcome(receipt=delay, validation=validation)
+
+    return run, state
+
+def test_is_acceptable():
+    """Test that both validity and confidence are required"""
+    assert is_acceptable(GOOD, 0.6)
+    assert not is_acceptable(WEAK, 0.6)
+    assert not is_acceptable({'is_valid': False, 'confidence_score': 0.9}, 0.6)
+
+@pytest.mark.asyncio
+async def test_race_returns_first_acceptable_and_cancels_loser():
+    """Test that the faster acceptable path wins and the slower one is cancelled"""
+    ocr, _ = path(0.01, GOOD)
+    ai, ai_state = path(1.0, GOOD)
+    race = await race_parsers({'ocr': ocr, 'ai': ai}, {'ocr': 5, 'ai': 5}, 0.6)
+    await asyncio.sleep(0.01)
+    assert race.winner == 'ocr'
+    assert race.paths['ocr']['outcome'] == 'won'
+    assert race.paths['ai']['outcome'] == 'cancelled'
+    assert ai_state['cancelled']
+
+@pytest.mark.asyncio
+async def test_lost_race_does_not_fail_concurrent_ocr_of_same_image():
+    """Test that cancelling the losing OCR path leaves the cached OCR job running for other requests"""
+    cache = ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ['MILK 2L']
+
+    async def ocr():
+        return ParseOutcome(receipt=await cache.get_or_compute(b'image', compute, {}), validation=GOOD)
+
+    ai, _ = path(0.01, GOOD)
+    other = asyncio.ensure_future(cache.get_or_compute(b'image', compute, {}))
+    race = await race_parsers({'ocr': ocr, 'ai': ai}, {'ocr': 5, 'ai': 5}, 0.6)
+    assert race.winner == 'ai'
+    assert await other == ['MILK 2L']
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_race_waits_past_low_confidence_result():
+    """Test that a fast but weak result does not end the race"""
+    ocr, _ = path(0.01, WEAK)
+    ai, _ = path(0.05, GOOD)
+    race = await race_parsers({'ocr': ocr, 'ai': ai}, {'ocr': 5, 'ai': 5}, 0.6)
+    assert race.winner == 'ai'
+    assert race.paths['ocr']['outcome'] == 'rejected'
+
+@pytest.mark.asyncio
+async def test_race_falls_back_when_other_path_times_out():
+    """Test that a weak result is returned when the other path misses its deadline"""
+    ocr, _ = path(0.01, WEAK)
+    ai, _ = path(1.0, GOOD)
+    race = await race_parsers({'ocr': ocr, 'ai': ai}, {'ocr': 5, 'ai': 0.05}, 0.6)
+    assert race.winner == 'ocr'
+    assert race.paths['ocr']['outcome'] == 'fallback'
+    assert race.paths['ai']['outcome'] == 'timeout'
+
+@pytest.mark.asyncio
+async def test_race_raises_first_path_error_when_all_fail():
+    """Test that the first contender's error surfaces when no path finishes"""
+    ocr, _ = path(0.02, error=KeyError('ocr'))
+    ai, _ = path(0.01, error=ValueError('ai'))
+    with pytest.raises(KeyError):
+        await race_parsers({'ocr': ocr, 'ai': ai}, {'ocr': 5, 'ai': 5}, 0.6)
+
+def make_receipt(total=7.0, subtotal=None, confidence=0.9):
+    items = [ReceiptItem(name='MILK 2L', price=3.5, confidence=confidence), ReceiptItem(name='BREAD', price=3.5, confidence=confidence)]
+    return ReceiptData(store_name='Countdown', total=total, subtotal=subtotal, items=items)
+
+def test_escalation_accepts_consistent_receipt():
+    """Test that a valid receipt whose items add up is not escalated"""
+    decision = escalation_decision(make_receipt(), GOOD, {'is_valid': True})
+    assert not decision.escalate
+    assert decision.total_gap == 0
+
+def test_escalation_allows_items_matching_subtotal():
+    """Test that items summing to the pre-tax subtotal are not a mismatch"""
+    assert not escalation_decision(make_receipt(total=8.05, subtotal=7.0), GOOD, {'is_valid': True}).escalate
+
+def test_escalation_reasons():
+    """Test that each doubtful signal is reported"""
+    assert escalation_decision(make_receipt(total=12.0), GOOD, {'is_valid': True}).reasons == ['total_mismatch']
+    assert escalation_decision(make_receipt(confidence=0.4), GOOD, {'is_valid': True}).reasons == ['low_confidence_items']
+    assert escalation_decision(make_receipt(), WEAK, {'is_valid': False}).reasons == ['low_confidence', 'parser_invalid']
+
+@pytest.mark.asyncio
+async def test_ocr_first_skips_ai_for_confident_receipt():
+    """Test that the AI is not called when the OCR result passes"""
+    async def ocr():
+        return ParseOutcome(receipt=make_receipt(), validation=GOOD)
+    ai, _ = path(0.01, GOOD)
+    calls = []
+
+    async def counting_ai():
+        calls.append(1)
+        return await ai()
+
+    result, decision = await ocr_first(ocr, counting_ai, lambda receipt: {'is_valid': True})
+    assert result.winner == 'ocr'
+    assert not decision.escalate
+    assert not calls
+
+@pytest.mark.asyncio
+async def test_ocr_first_escalates_and_falls_back_on_ai_failure():
+    """Test that doubtful receipts go to the AI, and OCR is returned if the AI fails"""
+    async def ocr():
+        return ParseOutcome(receipt=make_receipt(total=12.0), validation=GOOD)
+    ai, _ = path(0.01, GOOD)
+    result, decision = await ocr_first(ocr, ai, lambda receipt: {'is_valid': True})
+    assert decision.escalate
+    assert result.winner == 'ai'
+    assert result.paths['ocr']['outcome'] == 'rejected'
+
+    failing_ai, _ = path(0.01, error=RuntimeError('ai down'))
+    result, _ = await ocr_first(ocr, failing_ai, lambda receipt: {'is_valid': True})
+    assert result.winner == 'ocr'
+    assert result.paths['ai']['outcome'] == 'failed'
+
+@pytest.mark.asyncio
+async def test_ai_first_runs_ocr_only_when_ai_fails():
+    """Test that OCR is skipped while the AI answers, and is the fallback when it does not"""
+    ai, _ = path(0.01, GOOD)
+    calls = []
+
+    async def ocr():
+        calls.append(1)
+        return ParseOutcome(receipt=make_receipt(), validation=WEAK)
+
+    result = await ai_first(ai, ocr)
+    assert (result.winner, list(result.paths), calls) == ('ai', ['ai'], [])
+
+    failing_ai, _ = path(0.01, error=RuntimeError('ai down'))
+    result = await ai_first(failing_ai, ocr)
+    assert result.winner == 'ocr'
+    assert (result.paths['ai']['outcome'], result.paths['ocr']['outcome']) == ('failed', 'fallback')
+
+@pytest.mark.asyncio
+async def test_ai_first_has_no_ai_deadline(monkeypatch):
+    """Test that a slow AI answer is waited for rather than cut off by HYBRID_AI_TIMEOUT"""
+    monkeypatch.setattr('hybrid_parsing.HYBRID_AI_TIMEOUT', 0.01)
+    ai, _ = path(0.05, GOOD)
+    ocr, _ = path(0.01, error=RuntimeError('ocr should not run'))
+    assert (await ai_first(ai, ocr)).winner == 'ai'
@@ -0,0 +1,57 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from image_ingest import ImageDecodeError, decode_grayscale, probe_image, reduced_decode_factor, text_safe_decode_factor
+
+def encode_jpeg(width, height, orientation=None):
+    img = Image.fromarray(np.full((height, width, 3), 200, dtype=np.uint8))
+    exif = img.getexif()
+    if orientation:
+        exif[0x0112] = orientation
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', exif=exif)
+    return buf.getvalue()
+
+def test_probe_reads_header():
+    """Test that size and format come from the header"""
+    metadata = probe_image(encode_jpeg(800, 400))
+    assert (metadata.width, metadata.height, metadata.format) == (800, 400, 'JPEG')
+
+def test_probe_applies_exif_rotation():
+    """Test that a 90 degree EXIF rotation swaps the reported size"""
+    metadata = probe_image(encode_jpeg(800, 400, orientation=6))
+    assert (metadata.width, metadata.height, metadata.orientation) == (400, 800, 6)
+
+def test_probe_rejects_garbage():
+    """Test that non-image bytes raise ImageDecodeError"""
+    with pytest.raises(ImageDecodeError):
+        probe_image(b'not an image')
+
+def test_reduced_decode_factor():
+    """Test that the decode is reduced only while the long edge stays above target"""
+    assert reduced_decode_factor(4000, 2000) == 2
+    assert reduced_decode_factor(8000, 2000) == 4
+    assert reduced_decode_factor(3999, 2000) == 1
+    assert reduced_decode_factor(20000, 2000) == 8
+    assert reduced_decode_factor(4000, None) == 1
+
+def test_text_safe_decode_factor():
+    """Test stepping down from a reduction that left text too small"""
+    # 10 px at 4x is 40 px in full: 2x keeps 20 px
+    assert text_safe_decode_factor(4, 10, 16) == 2
+    # 10 px at 2x is 20 px in full: only a full decode keeps 16 px
+    assert text_safe_decode_factor(2, 10, 16) == 1
+    assert text_safe_decode_factor(8, 5, 16) == 2
+
+def test_decode_grayscale_reduces_and_orients():
+    """Test one oriented, reduced grayscale decode of an oversized photo"""
+    image_bytes = encode_jpeg(1600, 800, orientation=6)
+    gray = decode_grayscale(image_bytes, probe_image(image_bytes), target_long_edge=400)
+    assert gray.ndim == 2
+    # Portrait after EXIF rotation, reduced 4x
+    assert gray.shape == (400, 200)
+
+def test_decode_grayscale_full_resolution():
+    """Test that no target keeps the original resolution"""
+    assert decode_grayscale(encode_jpeg(640, 480)).shape == (480, 640)
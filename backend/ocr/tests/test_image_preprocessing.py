@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+import pytest
+from image_preprocessing import (
+    estimate_text_height, resample_to_working_resolution, preprocess_image, decode_for_text,
+    run_pipeline, parse_skip_stages, preprocessing_fingerprint, STAGE_NAMES
+)
+
+def render_text_page(width, height, font_scale, lines=12):
+    """White page with rows of black text"""
+    img = np.full((height, width), 255, dtype=np.uint8)
+    step = height // (lines + 1)
+    for i in range(lines):
+        cv2.putText(img, 'BREAD WHT 700G 3.50', (20, (i + 1) * step), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, 2)
+    return img
+
+def glyph_height(font_scale):
+    (_, height), _ = cv2.getTextSize('B', cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)
+    return height
+
+@pytest.fixture
+def large_page():
+    return render_text_page(1000, 1500, 1.6)
+
+def test_estimate_text_height(large_page):
+    """Test that the estimate is close to the rendered glyph height"""
+    estimate = estimate_text_height(large_page)
+    assert estimate == pytest.approx(glyph_height(1.6), rel=0.35)
+
+def test_estimate_text_height_blank_page():
+    """Test that a page without text gives no estimate"""
+    assert estimate_text_height(np.full((500, 400), 255, dtype=np.uint8)) is None
+
+def test_resample_caps_long_edge(large_page):
+    """Test that large images are shrunk to the long-edge cap"""
+    resampled = resample_to_working_resolution(large_page, max_long_edge=900, target_text_height=200)
+    assert max(resampled.shape) == pytest.approx(900, abs=2)
+
+def test_resample_targets_text_height(large_page):
+    """Test that oversized text is shrunk towards the target height"""
+    resampled = resample_to_working_resolution(large_page, max_long_edge=5000, target_text_height=16)
+    assert estimate_text_height(resampled) == pytest.approx(16, rel=0.35)
+
+def test_resample_keeps_small_images(large_page):
+    """Test that images already at working resolution are not touched"""
+    small = render_text_page(400, 600, 0.6)
+    assert resample_to_working_resolution(small, max_long_edge=2000) is small
+
+def test_decode_keeps_small_text_at_full_resolution():
+    """Test that a reduced decode is redone at full size when it would shrink text below 16 px"""
+    small_text = cv2.imencode('.jpg', render_text_page(2000, 4000, 0.9))[1].tobytes()
+    assert decode_for_text(small_text, target_long_edge=2000).shape == (4000, 2000)
+
+    large_text = cv2.imencode('.jpg', render_text_page(2000, 4000, 3.0, lines=20))[1].tobytes()
+    assert decode_for_text(large_text, target_long_edge=2000).shape == (2000, 1000)
+
+def test_preprocess_modes_output_size(large_page):
+    """Test that adaptive mode works at a lower resolution than full mode"""
+    image_bytes = cv2.imencode('.png', large_page)[1].tobytes()
+    assert preprocess_image(image_bytes, mode='full').shape == large_page.shape
+    assert max(preprocess_image(image_bytes, mode='adaptive').shape) < max(large_page.shape)
+
+def test_run_pipeline_times_each_stage(large_page):
+    """Test that every stage that runs reports a timing, in pipeline order"""
+    image_bytes = cv2.imencode('.png', large_page)[1].tobytes()
+    timings = run_pipeline(image_bytes, profile='full').stage_timings
+    assert list(timings) == [name for name in STAGE_NAMES if name != 'classify']
+    assert all(seconds >= 0 for seconds in timings.values())
+
+def test_run_pipeline_skips_stages(large_page):
+    """Test that skipped stages are neither run nor timed"""
+    image_bytes = cv2.imencode('.png', large_page)[1].tobytes()
+    result = run_pipeline(image_bytes, frozenset({'resample', 'threshold', 'denoise', 'morph'}), profile='full')
+    assert 'denoise' not in result.stage_timings
+    assert 'clahe' in result.stage_timings
+    assert result.image.shape == large_page.shape
+
+def test_parse_skip_stages():
+    """Test parsing and validation of skip lists"""
+    assert parse_skip_stages(None) == frozenset()
+    assert parse_skip_stages(' Denoise, morph ') == {'denoise', 'morph'}
+    with pytest.raises(ValueError):
+        parse_skip_stages('sharpen')
+    with pytest.raises(ValueError):
+        parse_skip_stages('decode')
+
+def test_fingerprint_depends_on_skipped_stages():
+    """Test that cached results for different stage selections do not collide"""
+    assert preprocessing_fingerprint(frozenset({'denoise'})) != preprocessing_fingerprint()
+
+def test_auto_profile_skips_stages_for_clean_scans(large_page):
+    """Test that a clean scan gets the light profile and skips the expensive stages"""
+    image_bytes = cv2.imencode('.png', large_page)[1].tobytes()
+    result = run_pipeline(image_bytes, profile='auto')
+    assert result.profile == 'light'
+    assert 'classify' in result.stage_timings
+    assert 'denoise' not in result.stage_timings
+    assert 'denoise' in result.profile_skipped
+    assert result.megapixels > 0
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+import pytest
+from image_quality import assess_quality, estimate_noise, histogram_bimodality, detect_receipt_quad
+from image_preprocessing import apply_perspective_correction
+
+@pytest.fixture
+def clean_scan():
+    """Flat black-on-white receipt, like a scan or e-receipt screenshot"""
+    img = np.full((1200, 800), 255, dtype=np.uint8)
+    for i in range(20):
+        cv2.putText(img, f'ITEM {i:02d} MILK 2L  4.20', (40, 60 + i * 55), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2, cv2.LINE_AA)
+    return img
+
+def test_clean_scan_gets_light_profile(clean_scan):
+    """Test that clean, flat images skip most preprocessing"""
+    assessment = assess_quality(clean_scan)
+    assert assessment.profile == 'light'
+    assert not assessment.has_quad
+
+def phone_photo(clean_scan, sigma, quality=90):
+    """The scan shaded like photographed paper, with sensor grain and the phone's JPEG encode"""
+    np.random.seed(0)
+    photo = 40 + clean_scan.astype(np.float32) * (215 - 40) / 255
+    photo = np.clip(photo + np.random.normal(0, sigma, photo.shape), 0, 255).astype(np.uint8)
+    return cv2.imdecode(cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_GRAYSCALE)
+
+def test_clean_phone_photo_gets_light_profile(clean_scan):
+    """Test that daylight sensor grain on grey paper does not bring back denoising"""
+    for sigma in (1, 2, 3):
+        assessment = assess_quality(phone_photo(clean_scan, sigma))
+        assert assessment.noise < 3.0
+        assert assessment.profile == 'light'
+
+def test_low_light_photo_gets_full_profile(clean_scan):
+    """Test that low-light grain survives the JPEG encode and keeps denoising"""
+    assert assess_quality(phone_photo(clean_scan, 8)).profile == 'full'
+
+def test_noisy_photo_gets_full_profile(clean_scan):
+    """Test that visible sensor noise keeps denoising"""
+    np.random.seed(0)
+    noisy = np.clip(clean_scan + np.random.normal(0, 12, clean_scan.shape), 0, 255).astype(np.uint8)
+    assert estimate_noise(noisy) > estimate_noise(clean_scan)
+    assert assess_quality(noisy).profile == 'full'
+
+def test_blurry_photo_gets_full_profile(clean_scan):
+    """Test that out-of-focus images run the whole pipeline"""
+    assert assess_quality(cv2.GaussianBlur(clean_scan, (9, 9), 0)).profile == 'full'
+
+def test_receipt_on_background_gets_medium_profile(clean_scan):
+    """Test that a photographed receipt outline keeps perspective correction"""
+    photo = np.full((1600, 1200), 70, dtype=np.uint8)
+    photo[200:1400, 200:1000] = clean_scan
+    assessment = assess_quality(photo)
+    assert assessment.has_quad
+    assert assessment.profile == 'medium'
+    assert assessment.quad_confidence > 0.8
+
+def test_histogram_bimodality(clean_scan):
+    """Test that two-tone images score higher than a smooth gradient"""
+    gradient = np.tile(np.arange(256, dtype=np.uint8), (100, 1))
+    assert histogram_bimodality(clean_scan) > 0.9
+    assert histogram_bimodality(gradient) < 0.8
+    assert histogram_bimodality(np.zeros((10, 10), dtype=np.uint8)) == 0.0
+
+def test_quad_corners_scaled_back_from_proxy(clean_scan):
+    """Test that corners found on the proxy land on the full-resolution outline"""
+    photo = np.full((3000, 2400), 70, dtype=np.uint8)
+    photo[400:2800, 600:2200] = cv2.resize(clean_scan, (1600, 2400))
+
+    quad = detect_receipt_quad(photo, proxy_long_edge=400)
+
+    assert quad.confidence > 0.8
+    np.testing.assert_allclose(quad.corners, [[600, 400], [2200, 400], [2200, 2800], [600, 2800]], atol=20)
+
+def test_low_confidence_quad_is_not_warped():
+    """Test that a skewed sliver is not mistaken for a receipt outline"""
+    img = np.full((1000, 800), 255, dtype=np.uint8)
+    sliver = np.array([[100, 100], [700, 160], [690, 220], [90, 170]], dtype=np.int32)
+    cv2.fillPoly(img, [sliver], 0)
+
+    quad = detect_receipt_quad(img)
+
+    assert quad is not None and quad.confidence < 0.5
+    assert apply_perspective_correction(img) is img
@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+import pytest
+from ocr_pool import OCRWorkerPool, OCRQueueFullError, ocr_results_from_prediction
+
+class SlowFakeOCR:
+    """Stands in for PaddleOCR inside the worker processes"""
+    def predict(self, img):
+        time.sleep(0.3)
+        return [{
+            'rec_texts': ['MILK 2L', '$4.20'],
+            'rec_scores': [0.9, 0.95],
+            'rec_boxes': [np.array([[0, 0, 100, 20]]), np.array([[160, 0, 200, 20]])],
+        }]
+
+def make_fake_ocr():
+    return SlowFakeOCR()
+
+class BandOCR:
+    """Reads each dark horizontal band as one line named after its grey level"""
+    def predict(self, img):
+        dark_rows = img.min(axis=1) < 200
+        texts, scores, boxes = [], [], []
+        row = 0
+        while row < len(dark_rows):
+            if dark_rows[row]:
+                end = row
+                while end < len(dark_rows) and dark_rows[end]:
+                    end += 1
+                texts.append(f'LINE {int(img[row:end].min())}')
+                scores.append(0.9)
+                boxes.append(np.array([[0, row, img.shape[1], end]]))
+                row = end
+            row += 1
+        return [{'rec_texts': texts, 'rec_scores': scores, 'rec_boxes': boxes}]
+
+def make_band_ocr():
+    return BandOCR()
+
+@pytest.fixture
+def image_bytes():
+    img = np.full((120, 200, 3), 255, dtype=np.uint8)
+    cv2.putText(img, 'MILK 4.20', (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return cv2.imencode('.png', img)[1].tobytes()
+
+@pytest.fixture
+def pool():
+    pool = OCRWorkerPool(workers=1, queue_size=1, engine_factory=make_fake_ocr)
+    yield pool
+    pool.shutdown()
+
+def test_ocr_results_from_prediction():
+    """Test conversion of PaddleOCR output into parser input"""
+    results = ocr_results_from_prediction(make_fake_ocr().predict(None))
+    assert results[0] == {'text': 'MILK 2L', 'bbox': [[0, 0, 100, 20]], 'confidence': 0.9}
+    assert ocr_results_from_prediction([]) == []
+
+@pytest.mark.asyncio
+async def test_run_returns_results(pool, image_bytes):
+    """Test that a job runs on a worker and its results come back"""
+    job = await pool.run(image_bytes)
+
+    assert [r['text'] for r in job['results']] == ['MILK 2L', '$4.20']
+    assert {'decode', 'classify', 'ocr'} <= set(job['stage_timings'])
+    assert job['preprocess_profile'] in ('light', 'medium', 'full')
+    assert pool.stats()['preprocess_profiles'] == {job['preprocess_profile']: 1}
+    stats = pool.stats()
+    assert stats['jobs_completed'] == 1
+    assert stats['inflight'] == 0
+
+def test_running_follows_start_and_shutdown():
+    """Test that the pool only reports itself running between start and shutdown"""
+    pool = OCRWorkerPool(workers=1, queue_size=1, engine_factory=make_fake_ocr)
+    assert not pool.running
+    pool.start()
+    assert pool.running
+    pool.shutdown()
+    assert not pool.running
+
+@pytest.mark.asyncio
+async def test_dead_worker_marks_pool_broken_until_next_job(pool, image_bytes):
+    """Test that a job failing with BrokenProcessPool stops the pool reporting itself running"""
+    with pytest.raises(BrokenProcessPool):
+        await pool._submit(os._exit, 1)
+    await asyncio.sleep(0)
+    assert not pool.running
+    assert pool.stats()['inflight'] == 0
+
+    job = await pool.run(image_bytes)
+    assert job['results'] and pool.running
+
+@pytest.mark.asyncio
+async def test_queue_full_rejects_with_retry_after(pool, image_bytes):
+    """Test that jobs beyond workers + queue_size are rejected instead of queued"""
+    running = [asyncio.ensure_future(pool.run(image_bytes)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert pool.stats()['queue_depth'] == 1
+    assert pool.stats()['utilisation'] == 1.0
+
+    with pytest.raises(OCRQueueFullError) as exc_info:
+        await pool.run(image_bytes)
+    assert exc_info.value.retry_after >= 1
+    assert pool.stats()['jobs_rejected'] == 1
+
+    await asyncio.gather(*running)
+    assert pool.stats()['inflight'] == 0
+
+@pytest.mark.asyncio
+async def test_run_skips_requested_stages(pool, image_bytes):
+    """Test that skipped stages are not run or timed on the worker"""
+    job = await pool.run(image_bytes, frozenset({'classify', 'denoise', 'morph'}))
+
+    assert 'denoise' not in job['stage_timings']
+    assert 'morph' not in job['stage_timings']
+    assert 'threshold' in job['stage_timings']
+
+@pytest.mark.asyncio
+async def test_tall_image_is_tiled_and_merged():
+    """Test that a tall receipt is recognised in strips and merged without duplicates"""
+    img = np.full((1500, 200), 255, dtype=np.uint8)
+    for i in range(20):
+        img[40 + i * 70:60 + i * 70, 20:180] = 10 + i * 5
+    image_bytes = cv2.imencode('.png', img)[1].tobytes()
+    # Keep the raw grey levels so the fake engine can tell the bands apart
+    raw = frozenset({'resample', 'classify', 'perspective', 'clahe', 'threshold', 'denoise', 'morph'})
+
+    pool = OCRWorkerPool(workers=2, queue_size=0, engine_factory=make_band_ocr)
+    try:
+        job = await pool.run(image_bytes, raw)
+    finally:
+        pool.shutdown()
+
+    assert job['strip_count'] > 1
+    assert [r['text'] for r in job['results']] == [f'LINE {10 + i * 5}' for i in range(20)]
+    assert job['results'][-1]['bbox'][0][1] == 40 + 19 * 70
+    assert pool.stats()['jobs_completed'] == 1
@@ -0,0 +1,46 @@
+import math
+from ocr_rows import group_rows
+
+def quad(x1, y1, x2, y2, angle=0.0, origin=(0, 0)):
+    """Corner points of a box rotated by angle degrees about origin, clockwise from top-left"""
+    a = math.radians(angle)
+    points = []
+    for x, y in [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]:
+        dx, dy = x - origin[0], y - origin[1]
+        points.append([origin[0] + dx * math.cos(a) - dy * math.sin(a), origin[1] + dx * math.sin(a) + dy * math.cos(a)])
+    return points
+
+def receipt_boxes(angle=0.0):
+    rows = [('BREAD WHT 700G', '$3.50'), ('MILK 2L', '$4.20'), ('APPLE RED 1KG', '$5.99'), ('TOTAL', '$13.69')]
+    results = []
+    for i, (name, price) in enumerate(rows):
+        top = 50 + i * 30
+        results.append({'text': price, 'bbox': quad(520, top, 590, top + 20, angle), 'confidence': 0.95})
+        results.append({'text': name, 'bbox': quad(10, top, 200, top + 20, angle), 'confidence': 0.85})
+    return results
+
+def test_group_rows_joins_name_and_price():
+    """Test that separate name and price boxes become one line, left to right"""
+    rows = group_rows(receipt_boxes())
+    assert [row['text'] for row in rows] == ['BREAD WHT 700G  $3.50', 'MILK 2L  $4.20', 'APPLE RED 1KG  $5.99', 'TOTAL  $13.69']
+    assert rows[0]['confidence'] == 0.85
+
+def test_group_rows_handles_skew():
+    """Test that rows stay together when the photo is rotated by more than a line height across the page"""
+    rows = group_rows(receipt_boxes(angle=5))
+    assert [row['text'] for row in rows][:2] == ['BREAD WHT 700G  $3.50', 'MILK 2L  $4.20']
+    assert len(rows) == 4
+
+def test_group_rows_axis_aligned_boxes():
+    """Test the [x1, y1, x2, y2] box layout PaddleOCR uses for rec_boxes"""
+    results = [
+        {'text': '$4.50', 'bbox': [300, 52, 360, 70], 'confidence': 0.9},
+        {'text': 'MILK', 'bbox': [[10, 50, 100, 70]], 'confidence': 0.9},
+        {'text': 'STORE NAME', 'bbox': [10, 10, 150, 30], 'confidence': 0.9},
+    ]
+    assert [row['text'] for row in group_rows(results)] == ['STORE NAME', 'MILK  $4.50']
+
+def test_group_rows_without_boxes_keeps_order():
+    """Test that results without boxes are passed through unchanged"""
+    results = [{'text': 'MILK $4.50'}, {'text': 'BREAD $3.00'}]
+    assert group_rows(results) == results
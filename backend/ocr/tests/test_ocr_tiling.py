@@ -0,0 +1,49 @@
+import numpy as np
+from ocr_tiling import plan_strips, merge_strip_predictions, offset_box, box_bounds
+
+def test_plan_strips_leaves_normal_images_whole():
+    """Test that images below the aspect threshold are not tiled"""
+    assert plan_strips(1200, 800) == [(0, 1200)]
+    assert plan_strips(6000, 500, min_aspect=0) == [(0, 6000)]
+
+def test_plan_strips_covers_tall_images_with_overlap():
+    """Test that strips cover every row and neighbours share the overlap"""
+    strips = plan_strips(3000, 500, min_aspect=3, strip_aspect=1.5, overlap=100)
+    assert len(strips) > 1
+    assert strips[0][0] == 0
+    assert strips[-1][1] == 3000
+    for (_, end), (start, _) in zip(strips, strips[1:]):
+        assert end - start == 100
+
+def test_offset_box_keeps_layout():
+    """Test that flat, nested and corner-point boxes are shifted in place"""
+    assert offset_box([10, 5, 50, 25], 100).tolist() == [10, 105, 50, 125]
+    assert offset_box([[10, 5, 50, 25]], 100).tolist() == [[10, 105, 50, 125]]
+    corners = [[10, 5], [50, 5], [50, 25], [10, 25]]
+    assert box_bounds(offset_box(corners, 100)) == (10, 105, 50, 125)
+
+def test_merge_deduplicates_overlap():
+    """Test that a line seen by both strips is kept once, at full-image coordinates"""
+    strips = [(0, 300), (200, 500)]
+    predictions = [
+        {'rec_texts': ['MILK 2L', 'BREAD'], 'rec_scores': [0.9, 0.8], 'rec_boxes': [[10, 50, 200, 70], [10, 230, 150, 250]]},
+        {'rec_texts': ['BREAD', 'TOTAL'], 'rec_scores': [0.95, 0.9], 'rec_boxes': [[10, 30, 150, 50], [10, 200, 150, 220]]},
+    ]
+
+    merged = merge_strip_predictions(strips, predictions)
+
+    assert merged['rec_texts'] == ['MILK 2L', 'BREAD', 'TOTAL']
+    assert [box_bounds(box)[1] for box in merged['rec_boxes']] == [50, 230, 400]
+
+def test_merge_resolves_straddling_duplicates_by_confidence():
+    """Test that duplicates not settled by ownership keep the more confident reading"""
+    strips = [(0, 300), (200, 500)]
+    predictions = [
+        {'rec_texts': ['EGGS 12PK'], 'rec_scores': [0.7], 'rec_boxes': [np.array([10, 240, 150, 258])]},
+        {'rec_texts': ['EGGS 12PK'], 'rec_scores': [0.9], 'rec_boxes': [np.array([10, 45, 150, 62])]},
+    ]
+
+    merged = merge_strip_predictions(strips, predictions)
+
+    assert merged['rec_texts'] == ['EGGS 12PK']
+    assert merged['rec_scores'] == [0.9]
@@ -0,0 +1,127 @@
+import pytest
+from decimal import Decimal
+from difflib import SequenceMatcher
+from item_names import item_key_sql, normalize_item_name
+from price_intelligence import PriceIntelligenceService
+from receipt_parser import ReceiptData, ReceiptItem
+
+# (store, normalized_name, price, confidence) seen in the last 30 days at active stores
+PRICE_HISTORY = [
+    ('Pak\'nSave', 'milk', Decimal('3.20'), Decimal('0.90')),
+    ('New World', 'milk', Decimal('3.60'), Decimal('0.80')),
+    ('Countdown', 'milk chocolate', Decimal('1.00'), Decimal('0.90')),
+    ('New World', 'bread white', Decimal('2.50'), Decimal('0.95')),
+    ('Countdown', 'bread white', Decimal('2.80'), Decimal('0.95')),
+]
+# (item_name or None for store-wide, discount_amount, discount_percentage)
+CASHBACK_OFFERS = [('milk', Decimal('0.50'), None), ('bread white toast', None, Decimal('10.00'))]
+
+def ilike(value, pattern):
+    return pattern.strip('%').lower() in value.lower()
+
+def item_key(name):
+    """The stored key itself, else the most similar one, like item_key_sql"""
+    keys = {p[1] for p in PRICE_HISTORY}
+    if name in keys:
+        return name
+    scored = [(SequenceMatcher(None, key, name).ratio(), key) for key in sorted(keys)]
+    score, key = max(scored)
+    return key if score >= 0.5 else None
+
+def basket_fetch(query, *args):
+    """Answers the best-price and cashback queries from the tables above"""
+    if 'cashback_offers' in query:
+        patterns, _, prices = args
+        rows = []
+        for idx, (pattern, price) in enumerate(zip(patterns, prices), 1):
+            offers = [o for o in CASHBACK_OFFERS if o[0] is None or ilike(o[0], pattern)]
+            if offers:
+                _, amount, percentage = max(offers, key=lambda o: o[1] if o[1] is not None else price * o[2] / 100)
+                rows.append({'idx': idx, 'discount_amount': amount, 'discount_percentage': percentage})
+        return rows
+
+    rows = []
+    for name in args[0]:
+        matches = [p for p in PRICE_HISTORY if p[1] == item_key(name)]
+        if matches:
+            store, _, price, confidence = min(matches, key=lambda p: p[2])
+            rows.append({'name': name, 'store_name': store, 'price': price,
+                         'confidence_score': confidence, 'price_history_points': len(matches),
+                         'date': None})
+    return rows
+
+@pytest.fixture
+def service(fake_pool):
+    service = PriceIntelligenceService('postgresql://unused')
+    service._pool = fake_pool(fetch=basket_fetch, fetchrow=lambda query, user_id: {'anonymized_id': 'anon-1'})
+    return service
+
+@pytest.mark.asyncio
+async def test_basket_analysis_uses_two_queries(service):
+    """Test that a basket of any size is answered by one best-price and one cashback query"""
+    items = [ReceiptItem(name=f'MILK {i}', price=4.0) for i in range(40)]
+    analysis = await service.analyze_basket_savings(items, 'store-1')
+    assert len(service._pool.queries) == 2
+    # Every item shares the normalized name, so it is looked up once
+    assert service._pool.queries[0] == (['milk'],)
+    assert len(analysis.savings_opportunities) == 40
+
+@pytest.mark.asyncio
+async def test_basket_analysis_results(service):
+    """Test savings, store recommendation and cashback per item, in basket order"""
+    items = [
+        ReceiptItem(name='MILK', price=4.0),
+        ReceiptItem(name='BREAD WHITE', price=3.0),
+        ReceiptItem(name='EGGS', price=6.0),
+        ReceiptItem(name='MILK', price=3.0),
+        ReceiptItem(name='BREAD WHTE', price=3.0),
+    ]
+    analysis = await service.analyze_basket_savings(items, 'store-1')
+    assert [(o.item_name, o.best_price, o.savings, o.store_name, o.price_history_points)
+            for o in analysis.savings_opportunities] == [
+        ('MILK', Decimal('3.20'), Decimal('0.80'), 'Pak\'nSave', 2),
+        ('BREAD WHITE', Decimal('2.50'), Decimal('0.50'), 'New World', 2),
+        # No exact key, so the most similar one stands in
+        ('BREAD WHTE', Decimal('2.50'), Decimal('0.50'), 'New World', 2),
+    ]
+    assert analysis.total_savings == Decimal('1.80')
+    assert analysis.store_recommendation == 'New World'
+    # 0.50 on each milk plus 10% of the bread; eggs have no offer
+    assert analysis.cashback_available == Decimal('1.30')
+
+@pytest.mark.asyncio
+async def test_store_receipt_prices_round_trips(service):
+    """Test that a receipt is one upsert plus the snapshot, and the anonymized id is looked up once per user"""
+    items = [ReceiptItem(name=f'ITEM {i:03d}', price=1.5, confidence=0.9) for i in range(50)]
+    items.append(ReceiptItem(name='item 000', price=2.0, confidence=0.8))
+    receipt = ReceiptData(store_name='New World', items=items)
+
+    assert await service.store_receipt_prices(receipt, 'store-1', 'user-1')
+    upsert, lookup, snapshot = service._pool.queries
+    # A repeated name keeps its last price, as one statement cannot upsert a row twice
+    assert len(upsert[1]) == 50 and upsert[2][0] == Decimal('2.0')
+    assert lookup == ('user-1',) and snapshot[0] == 'anon-1'
+
+    service._pool.queries.clear()
+    assert await service.store_receipt_prices(receipt, 'store-1', 'user-1')
+    assert len(service._pool.queries) == 2
+
+@pytest.mark.asyncio
+async def test_anonymized_ids_are_bounded(service, monkeypatch):
+    """Test that the least recently used user's anonymized id is dropped past the cap"""
+    monkeypatch.setattr('price_intelligence.ANONYMIZED_ID_CACHE_SIZE', 2)
+    receipt = ReceiptData(store_name='New World', items=[ReceiptItem(name='MILK', price=4.0, confidence=0.9)])
+    for user_id in ('user-1', 'user-2', 'user-1', 'user-3'):
+        assert await service.store_receipt_prices(receipt, 'store-1', user_id)
+    assert list(service._anonymized_ids) == ['user-1', 'user-3']
+
+def test_normalize_item_name():
+    """Test the key every writer stores: lowercase, no stop words or short words"""
+    assert normalize_item_name('  The MILK of 2L  Anchor ') == 'milk anchor'
+    assert normalize_item_name(normalize_item_name('Bread  and Butter')) == 'bread butter'
+
+def test_item_key_sql_exact_before_trigram():
+    """Test that the key query tries the exact key first and escapes % for psycopg2"""
+    sql = item_key_sql('$1')
+    assert sql.index('normalized_name = $1') < sql.index('normalized_name % $1')
+    assert 'normalized_name %% %(key)s' in item_key_sql('%(key)s', percent='%%')
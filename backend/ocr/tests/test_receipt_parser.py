@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime
-from receipt_parser import ReceiptParser, ReceiptData, ReceiptItem
+from receipt_parser import ReceiptParser, ReceiptData, ReceiptItem, CategoryIndex
+from correction_dictionary import CorrectionDictionary
 
 @pytest.fixture
 def parser():
@@ -110,6 +111,31 @@ def test_extract_receipt_number(parser):
     receipt_number = parser._extract_receipt_number(lines)
     assert receipt_number == '12345'
 
+def test_tokenize_classifies_each_line(parser):
+    """Test that the lexer assigns one kind per line and captures its fields"""
+    tokens = parser.tokenize([
+        'COUNTDOWN MT ALBERT',
+        '15/12/2024',
+        '2 x BREAD WHT 700G $7.00',
+        'SUBTOTAL $7.00',
+        'GST $1.05',
+        'TOTAL $8.05',
+        'Receipt #12345'
+    ])
+    assert [t.kind for t in tokens] == ['text', 'date', 'item', 'subtotal', 'tax', 'total', 'header']
+    assert tokens[1].date == datetime(2024, 12, 15)
+    assert (tokens[2].name, tokens[2].price, tokens[2].quantity) == ('BREAD WHT 700G', 7.00, 2)
+    assert tokens[5].amount == 8.05
+    assert tokens[6].receipt_number == '12345'
+
+def test_extractors_accept_tokens(parser):
+    """Test that extractors give the same answer for raw lines and a token stream"""
+    lines = ['COUNTDOWN MT ALBERT', '15/12/2024', 'MILK 2L $4.20', 'TOTAL $4.20']
+    tokens = parser.tokenize(lines)
+    assert parser._extract_items(tokens) == parser._extract_items(lines)
+    assert parser._extract_totals(tokens) == parser._extract_totals(lines)
+    assert parser._extract_date(tokens) == parser._extract_date(lines)
+
 def test_categorize_item(parser):
     """Test item categorization"""
     assert parser._categorize_item('BREAD WHT 700G') == 'Pantry'
@@ -118,6 +144,26 @@ def test_categorize_item(parser):
     assert parser._categorize_item('CHICKEN BREAST 500G') == 'Meat'
     assert parser._categorize_item('UNKNOWN ITEM') is None
 
+def test_category_index_first_keyword_wins():
+    """Test that the earliest contained keyword wins, and fuzzy matches need a score above the cutoff"""
+    index = CategoryIndex({'Dairy': ['milk'], 'Beverages': ['milk shake', 'coffee']})
+    assert index.lookup('milk shake 1l') == 'Dairy'
+    assert index.lookup('cofee beans') == 'Beverages'
+    assert index.lookup('zzz') is None
+
+def test_category_index_lookup_many_matches_lookup():
+    """Test that the batched lookup picks the same category as one lookup per name"""
+    index = CategoryIndex({'Dairy': ['milk'], 'Beverages': ['milk shake', 'coffee']})
+    names = ['milk shake 1l', 'cofee beans', 'zzz', '']
+    assert index.lookup_many(names) == [index.lookup(name) for name in names]
+    assert index.lookup_many([]) == []
+
+def test_categorize_item_is_memoised(parser):
+    """Test that repeated item names skip the keyword search"""
+    parser._categorize_item('MILK 2L')
+    parser._categorize_item('milk 2l')
+    assert parser._category_memo.cache_info().hits == 1
+
 def test_is_header_line(parser):
     """Test header line detection"""
     assert parser._is_header_line('RECEIPT') == True
@@ -152,6 +198,54 @@ def test_parse_ocr_results(parser, sample_ocr_results):
     assert receipt.items[2].price == 5.99
     assert receipt.items[2].category == 'Fresh Produce'
 
+def test_parse_many_matches_parse_ocr_results(parser, sample_ocr_results):
+    """Test that batch parsing returns the same receipts, in order, with stats"""
+    other = [{'text': 'NEW WORLD', 'bbox': None, 'confidence': 0.9}, {'text': 'COKE CAN $2.50', 'bbox': None, 'confidence': 0.9}]
+    batch = parser.parse_many([sample_ocr_results, other, sample_ocr_results])
+    
+    assert batch.receipts == [parser.parse_ocr_results(results) for results in (sample_ocr_results, other, sample_ocr_results)]
+    assert batch.receipts[1].items[0].category == 'Beverages'
+    assert batch.errors == {}
+    assert batch.stats['receipts'] == 3
+    assert batch.stats['items'] == 7
+    assert batch.stats['unique_item_names'] == 4
+
+def test_parse_many_categorises_only_in_batch(parser, sample_ocr_results, monkeypatch):
+    """Test that parse_many scores and categorises items from one lookup_many call, never per item"""
+    expected = parser.parse_ocr_results(sample_ocr_results)
+    def categorize_item(item_name):
+        raise AssertionError(f'_categorize_item called for {item_name!r}')
+    monkeypatch.setattr(parser, '_categorize_item', categorize_item)
+    
+    batch = parser.parse_many([sample_ocr_results])
+    assert batch.receipts == [expected]
+    assert [item.confidence for item in batch.receipts[0].items] == [item.confidence for item in expected.items]
+
+def test_parse_many_keeps_failures_in_place(parser, sample_ocr_results):
+    """Test that one malformed result set does not fail the rest of the batch"""
+    batch = parser.parse_many([[{'bbox': None}], sample_ocr_results])
+    
+    assert batch.receipts[0] is None
+    assert 'KeyError' in batch.errors[0]
+    assert batch.receipts[1].total == 13.69
+    assert batch.stats['failed'] == 1
+
+def test_corrections_applied_before_categorisation(sample_ocr_results):
+    """Test that confirmed corrections rename and categorise items, in single and batch parsing"""
+    corrections = CorrectionDictionary()
+    corrections.add('BREAD WHT 700G', 'Tip Top White Bread 700g', 'Bakery')
+    corrections.add('MILK 2L', 'Anchor Blue Milk 2L')
+    parser = ReceiptParser(corrections=corrections)
+    
+    for receipt in (parser.parse_ocr_results(sample_ocr_results), parser.parse_many([sample_ocr_results]).receipts[0]):
+        assert [(item.name, item.category) for item in receipt.items] == [
+            ('Tip Top White Bread 700g', 'Bakery'),
+            ('Anchor Blue Milk 2L', 'Dairy'),
+            ('APPLE RED 1KG', 'Fresh Produce'),
+        ]
+    assert corrections.stats()['hits'] == 4
+    assert corrections.stats()['misses'] == 2
+
 def test_validate_receipt_valid(parser, sample_ocr_results):
     """Test receipt validation with valid data"""
     receipt = parser.parse_ocr_results(sample_ocr_results)
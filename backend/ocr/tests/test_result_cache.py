@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from result_cache import ResultCache, LRUCache, cache_key
+
+class FakeRedis:
+    """In-process stand-in for redis.asyncio.Redis"""
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+class CountingOCR:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return [{'text': 'MILK 2L', 'bbox': [[0, 0, 100, 20]], 'confidence': 0.9}]
+
+FINGERPRINT = {'pipeline_version': '1'}
+
+def test_cache_key_depends_on_bytes_and_fingerprint():
+    """Test that the key changes with the image content and pipeline params"""
+    assert cache_key(b'abc', FINGERPRINT) == cache_key(b'abc', FINGERPRINT)
+    assert cache_key(b'abc', FINGERPRINT) != cache_key(b'abd', FINGERPRINT)
+    assert cache_key(b'abc', FINGERPRINT) != cache_key(b'abc', {'pipeline_version': '2'})
+
+def test_lru_evicts_least_recently_used():
+    """Test LRU eviction order"""
+    lru = LRUCache(max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    assert lru.get('c') == 3
+
+@pytest.mark.asyncio
+async def test_repeat_request_hits_memory():
+    """Test that a retried upload is served from memory"""
+    cache = ResultCache()
+    ocr = CountingOCR()
+
+    first = await cache.get_or_compute(b'image', ocr, FINGERPRINT)
+    second = await cache.get_or_compute(b'image', ocr, FINGERPRINT)
+
+    assert first == second
+    assert ocr.calls == 1
+    assert cache.stats()['memory_hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced():
+    """Test that identical in-flight requests share one computation"""
+    cache = ResultCache()
+    ocr = CountingOCR()
+
+    results = await asyncio.gather(*[cache.get_or_compute(b'image', ocr, FINGERPRINT) for _ in range(5)])
+
+    assert ocr.calls == 1
+    assert all(result == results[0] for result in results)
+    assert cache.stats()['coalesced'] == 4
+
+@pytest.mark.asyncio
+async def test_redis_tier_shared_between_caches():
+    """Test that a second process-local cache reuses results through Redis"""
+    redis = FakeRedis()
+    ocr = CountingOCR()
+
+    await ResultCache(redis_client=redis).get_or_compute(b'image', ocr, FINGERPRINT)
+    other = ResultCache(redis_client=redis)
+    result = await other.get_or_compute(b'image', ocr, FINGERPRINT)
+
+    assert ocr.calls == 1
+    assert result[0]['text'] == 'MILK 2L'
+    assert other.stats()['redis_hits'] == 1
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    """Test that an exception propagates and the next request recomputes"""
+    cache = ResultCache()
+
+    async def failing():
+        raise ValueError('decode failed')
+
+    with pytest.raises(ValueError):
+        await cache.get_or_compute(b'image', failing, FINGERPRINT)
+
+    ocr = CountingOCR()
+    await cache.get_or_compute(b'image', ocr, FINGERPRINT)
+    assert ocr.calls == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    """Test that a follower still gets the result when the caller that started the computation is cancelled"""
+    cache = ResultCache()
+    ocr = CountingOCR()
+
+    leader = asyncio.create_task(cache.get_or_compute(b'image', ocr, FINGERPRINT))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_compute(b'image', ocr, FINGERPRINT))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    result = await follower
+    assert leader.cancelled()
+    assert result[0]['text'] == 'MILK 2L'
+    assert ocr.calls == 1
+    assert cache.memory.get(cache_key(b'image', FINGERPRINT)) == result
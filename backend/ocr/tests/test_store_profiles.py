@@ -0,0 +1,65 @@
+import pytest
+from receipt_parser import ReceiptParser
+from store_profiles import STORE_PROFILES, profile_for
+
+@pytest.fixture
+def parser():
+    return ReceiptParser()
+
+def ocr_lines(lines):
+    """One OCR result per line, stacked top to bottom"""
+    return [
+        {'text': text, 'bbox': [[0, i * 30], [400, i * 30], [400, i * 30 + 24], [0, i * 30 + 24]], 'confidence': 0.95}
+        for i, text in enumerate(lines)
+    ]
+
+def test_profile_for_dispatches_by_store_line():
+    """Test that the store line picks the chain's profile and unknown stores get the generic grammar"""
+    assert profile_for('COUNTDOWN MT ALBERT').key == 'countdown'
+    assert profile_for("PAK'NSAVE ALBANY").key == 'paknsave'
+    assert profile_for('4 SQUARE OHAKUNE').key == 'four_square'
+    assert profile_for('CORNER DAIRY') is None
+    assert profile_for(None) is None
+
+def test_store_patterns_come_from_profiles(parser):
+    """Test that /stores still lists one pattern per chain"""
+    assert list(parser.store_patterns) == [profile.key for profile in STORE_PROFILES]
+
+def test_profile_skips_payment_and_savings_lines(parser):
+    """Test that lines the generic patterns read as items are not items under a chain profile"""
+    receipt = parser.parse_ocr_results(ocr_lines([
+        'COUNTDOWN MT ALBERT', 'PH 09 555 1234', '15/12/2024',
+        'BREAD WHT 700G   $3.50', 'MILK 2L   $4.20', 'MULTIBUY SAVING   -$1.50',
+        'SUBTOTAL   $7.70', 'GST INCLUDED IN TOTAL   $1.00', 'TOTAL   $7.70', 'EFTPOS   $7.70',
+    ]))
+    assert [(item.name, item.price) for item in receipt.items] == [('BREAD WHT 700G', 3.5), ('MILK 2L', 4.2)]
+    assert (receipt.total, receipt.subtotal, receipt.tax) == (7.7, 7.7, 1.0)
+
+def test_total_savings_line_does_not_replace_total(parser):
+    """Test that a TOTAL SAVINGS line after TOTAL is not read as the receipt total"""
+    for store in ('COUNTDOWN MT ALBERT', 'NEW WORLD VICTORIA PARK'):
+        receipt = parser.parse_ocr_results(ocr_lines([
+            store, '15/12/2024', 'BREAD WHT 700G   $3.50', 'MILK 2L   $4.20',
+            'TOTAL   $7.70', 'TOTAL SAVINGS   3.00', 'YOU SAVED   $3.00',
+        ]))
+        assert receipt.total == 7.7
+        assert [item.name for item in receipt.items] == ['BREAD WHT 700G', 'MILK 2L']
+
+def test_profile_quantity_syntax(parser):
+    """Test each chain's quantity forms, with the line total as the price"""
+    countdown = parser.tokenize(['MILK 2L 2 @ $3.50   7.00', '3 x BANANAS   $2.97'], profile_for('COUNTDOWN'))
+    assert [(t.name, t.quantity, t.price) for t in countdown] == [('MILK 2L', 2, 7.0), ('BANANAS', 3, 2.97)]
+
+    new_world = parser.tokenize(['QTY 2 BREAD WHT   $7.00'], profile_for('NEW WORLD'))
+    assert (new_world[0].name, new_world[0].quantity, new_world[0].price) == ('BREAD WHT', 2, 7.0)
+
+def test_profile_skips_card_and_tax_lines(parser):
+    """Test that card and tax lines are not items under a chain profile, as with the generic grammar"""
+    lines = ['MILK 2L 3.50', 'BREAD 2.80', 'TOTAL 6.30', 'CARD 6.30', 'TAX 0.82']
+    for store in ('COUNTDOWN', 'PAK\'NSAVE', 'CORNER DAIRY'):
+        receipt = parser.parse_ocr_results(ocr_lines([store] + lines))
+        assert [(item.name, item.price) for item in receipt.items] == [('MILK 2L', 3.5), ('BREAD', 2.8)]
+        assert (receipt.total, receipt.tax) == (6.3, 0.82)
+
+    for store in ('COUNTDOWN', 'NEW WORLD'):
+        assert parser.tokenize(['DEBIT 6.30'], profile_for(store))[0].kind == 'header'